@@ -0,0 +1,242 @@
+# File: async_pipeline.py
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+import pg_bulk_load
+import pg_dbconnect
+from excel_to_dictionary import iter_sheet_rows
+
+DEFAULT_QUEUE_SIZE = 4
+
+# Marks the end of a queue
+END = None
+
+class StageTimer:
+    """Busy time of one pipeline stage, to show which stage limits throughput."""
+
+    def __init__(self, name):
+        self.name = name
+        self.busy_seconds = 0.0
+        self.items = 0
+
+    def add(self, seconds):
+        self.busy_seconds += seconds
+        self.items += 1
+
+async def read_stage(loop, executor, excel_file_path, sheets, raw_queue, chunk_size, engine, timer, aborted):
+    """
+    Reader stage: parse the workbook in an executor thread and put chunks of
+    (sheet_name, row) records on raw_queue. The thread blocks while the
+    queue is full, so parsing never runs far ahead of the database.
+    """
+    def produce():
+        chunk = []
+        start_time = time.perf_counter()
+        for record in iter_sheet_rows(excel_file_path, sheet=sheets, engine=engine):
+            if aborted.is_set():
+                return
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                timer.add(time.perf_counter() - start_time)
+                instrumentation.check_memory(f"Reading {excel_file_path}")
+                asyncio.run_coroutine_threadsafe(raw_queue.put(chunk), loop).result()
+                chunk = []
+                start_time = time.perf_counter()
+        if chunk:
+            timer.add(time.perf_counter() - start_time)
+            asyncio.run_coroutine_threadsafe(raw_queue.put(chunk), loop).result()
+
+    try:
+        await loop.run_in_executor(executor, produce)
+    except Exception as e:
+        logging.error("Reading %s failed: %s", excel_file_path, e)
+        aborted.set()
+    finally:
+        await raw_queue.put(END)
+
+async def clean_stage(raw_queue, write_queues, sheet_tables, timer, aborted):
+    """
+    Clean stage: clean each record for loading and pass the rows on to the
+    write queue of their table. Waits when a write queue is full.
+
+    If cleaning fails, the run is aborted and the rest of raw_queue is
+    drained, so the reader is never left blocked on a full queue, and the
+    writers still get END and roll back.
+    """
+    try:
+        while True:
+            records = await raw_queue.get()
+            if records is END:
+                break
+            start_time = time.perf_counter()
+            table_chunks = {}
+            for sheet_name, raw_row in records:
+                row = pg_bulk_load.prepare_load_row(sheet_name, raw_row)
+                if row:
+                    table_chunks.setdefault(sheet_tables[sheet_name], []).append(row)
+            timer.add(time.perf_counter() - start_time)
+            for table_name, chunk in table_chunks.items():
+                await write_queues[table_name].put(chunk)
+    except Exception as e:
+        logging.error("Cleaning rows failed: %s", e)
+        aborted.set()
+        while await raw_queue.get() is not END:
+            pass
+
+    for write_queue in write_queues.values():
+        await write_queue.put(END)
+
+async def write_stage(loop, executor, table_name, write_queue, method, isolate_bad_rows, timer, aborted):
+    """
+    Writer stage of one table: take one pooled connection and hold it
+    until the end of the table, loading every chunk in one transaction.
+    The blocking psycopg2 calls run in executor threads so the event loop
+    keeps the other stages moving.
+
+    Returns:
+        dict: Load summary with table, rows, quarantined, seconds, rows_per_sec and success.
+    """
+    summary = {'table': table_name, 'method': method, 'rows': 0, 'quarantined': 0,
+               'seconds': 0.0, 'rows_per_sec': 0.0, 'success': False}
+    load_bucket = pg_bulk_load.get_bucket_loader(table_name, method)
+    conn = await loop.run_in_executor(executor, pg_dbconnect.get_pooled_connection)
+    cursor = conn.cursor() if conn else None
+    failed = conn is None
+    if failed:
+        logging.error("Failed to create a database connection.")
+    start_time = time.perf_counter()
+
+    try:
+        while True:
+            chunk = await write_queue.get()
+            if chunk is END:
+                break
+            if failed:
+                # Keep draining so the clean stage is never blocked by a failed table
+                continue
+            chunk_start = time.perf_counter()
+            try:
+                loaded, quarantined = await loop.run_in_executor(
+                    executor, pg_bulk_load.load_chunk, cursor, table_name, chunk, load_bucket, isolate_bad_rows)
+            except Exception as e:
+                logging.error("Loading table '%s' with method '%s' failed: %s", table_name, method, e)
+                failed = True
+                continue
+            timer.add(time.perf_counter() - chunk_start)
+            summary['rows'] += loaded
+            summary['quarantined'] += quarantined
+
+        if failed or aborted.is_set():
+            logging.error("Rolling back the transaction of table '%s' due to error.", table_name)
+            if conn:
+                await loop.run_in_executor(executor, conn.rollback)
+            summary['rows'] = 0
+        else:
+            await loop.run_in_executor(executor, conn.commit)
+            summary['success'] = True
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn:
+            pg_dbconnect.release_connection(conn)
+
+    summary['seconds'] = time.perf_counter() - start_time
+    if summary['seconds'] > 0:
+        summary['rows_per_sec'] = summary['rows'] / summary['seconds']
+    return summary
+
+async def run_stages(loop, excel_file_path, sheet_tables, method, chunk_size, queue_size, isolate_bad_rows,
+                     engine, timers):
+    """
+    Run the reader, clean and writer stages once, for the given sheets.
+
+    Returns:
+        list: Load summary of each table.
+    """
+    table_names = list(dict.fromkeys(sheet_tables.values()))
+    raw_queue = asyncio.Queue(maxsize=queue_size)
+    write_queues = {table_name: asyncio.Queue(maxsize=queue_size) for table_name in table_names}
+    aborted = asyncio.Event()
+
+    # One thread for the reader and one per table writer
+    with ThreadPoolExecutor(max_workers=len(table_names) + 1, thread_name_prefix="pipeline") as executor:
+        results = await asyncio.gather(
+            read_stage(loop, executor, excel_file_path, list(sheet_tables), raw_queue, chunk_size, engine,
+                       timers["read"], aborted),
+            clean_stage(raw_queue, write_queues, sheet_tables, timers["clean"], aborted),
+            *[write_stage(loop, executor, table_name, write_queues[table_name], method, isolate_bad_rows,
+                          timers["write"], aborted)
+              for table_name in table_names],
+        )
+    return results[2:]
+
+async def run_pipeline(excel_file_path, sheet_tables, method="copy", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE,
+                       queue_size=DEFAULT_QUEUE_SIZE, isolate_bad_rows=False, engine="openpyxl", max_writers=None):
+    """
+    Load sheets into their tables with a reader, a clean and a writer stage
+    running at the same time, connected by bounded queues.
+
+    Each queue holds at most queue_size chunks, so a slow stage makes the
+    stages before it wait (backpressure) and memory stays bounded. As the
+    stages overlap, the total time is close to that of the slowest stage
+    rather than the sum of all stages.
+
+    Every writer holds a pooled connection until its table is done. A
+    writer waiting for a connection would stop draining its queue and block
+    the clean stage, so at most max_writers tables are loaded at a time:
+    with more tables, the stages run again for each round of tables, and
+    each round reads only the sheets of its own tables.
+
+    psycopg2 has no async API, so the writers run its blocking calls in
+    executor threads; psycopg2 releases the GIL while waiting on the server.
+
+    Args:
+        excel_file_path (str): Path to the Excel file.
+        sheet_tables (dict): Dictionary mapping sheet names to the table they are loaded into.
+        method (str): "copy" or "batch", see pg_bulk_load.get_bucket_loader.
+        chunk_size (int): Number of rows per chunk.
+        queue_size (int): Maximum number of chunks waiting between two stages.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting a table.
+        engine (str): "openpyxl" or "xml", the workbook reader.
+        max_writers (int): Maximum number of tables loaded at a time (if None,
+            uses the size of the connection pool).
+
+    Returns:
+        dict: Dictionary mapping table names to their load summary.
+    """
+    loop = asyncio.get_running_loop()
+    table_names = list(dict.fromkeys(sheet_tables.values()))
+    if max_writers is None:
+        max_writers = pg_dbconnect.get_pool_size()
+    max_writers = max(1, max_writers)
+    rounds = [table_names[start:start + max_writers] for start in range(0, len(table_names), max_writers)]
+    if len(rounds) > 1:
+        logging.info("Pipeline loads %s tables in %s rounds of at most %s writers", len(table_names), len(rounds),
+                     max_writers)
+    timers = {name: StageTimer(name) for name in ("read", "clean", "write")}
+
+    start_time = time.perf_counter()
+    results = []
+    for round_tables in rounds:
+        round_sheet_tables = {sheet: table for sheet, table in sheet_tables.items() if table in round_tables}
+        results += await run_stages(loop, excel_file_path, round_sheet_tables, method, chunk_size, queue_size,
+                                    isolate_bad_rows, engine, timers)
+    elapsed = time.perf_counter() - start_time
+
+    table_summaries = {}
+    for summary in results:
+        summary['sheets'] = [sheet for sheet, table in sheet_tables.items() if table == summary['table']]
+        summary['success'] = summary['success'] and summary['quarantined'] == 0
+        table_summaries[summary['table']] = summary
+
+    total_rows = sum(summary['rows'] for summary in table_summaries.values())
+    logging.info("Pipeline loaded %s rows into %s tables in %.2fs (%.0f rows/sec)", total_rows, len(table_summaries),
+                 elapsed, total_rows / elapsed if elapsed > 0 else 0.0)
+    for timer in timers.values():
+        logging.info("Pipeline stage '%s': busy %.2fs over %s chunks", timer.name, timer.busy_seconds, timer.items)
+        instrumentation.count("pipeline_busy_seconds", timer.busy_seconds, stage=timer.name)
+        instrumentation.count("pipeline_chunks", timer.items, stage=timer.name)
+    return table_summaries
@@ -0,0 +1,278 @@
+# File: batch_ingest.py
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ingest_manifest
+import pg_bulk_load
+import pg_dbconnect
+import workbook_inspector
+from excel_to_database import create_table_in_db, ingest_changed_sheets
+
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+DEFAULT_STATE_FILE = "batch_ingest_state.json"
+
+# Status of a workbook in the state file
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+def collect_workbooks(sources):
+    """
+    Expand directories, glob patterns and manifest files into workbook paths.
+
+    A directory contributes every .xlsx/.xlsm file in it (recursively), a
+    manifest is a .txt file with one path per line or a .json list of
+    paths, and anything else is used as a glob pattern. Excel's "~$" lock
+    files are skipped.
+
+    Args:
+        sources (list): Directories, glob patterns or manifest files.
+
+    Returns:
+        list: Unique absolute workbook paths, in the order found.
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            found = sorted(glob.glob(os.path.join(source, "**", "*"), recursive=True))
+        elif source.endswith(".json") and os.path.isfile(source):
+            with open(source, encoding="utf-8") as manifest_file:
+                found = [os.path.join(os.path.dirname(source), path) for path in json.load(manifest_file)]
+        elif source.endswith(".txt") and os.path.isfile(source):
+            with open(source, encoding="utf-8") as manifest_file:
+                found = [os.path.join(os.path.dirname(source), line.strip())
+                         for line in manifest_file if line.strip() and not line.startswith("#")]
+        else:
+            found = sorted(glob.glob(source, recursive=True))
+            if not found:
+                logging.warning("No workbooks match %s", source)
+
+        for path in found:
+            name = os.path.basename(path)
+            if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$") and os.path.isfile(path):
+                paths.append(os.path.abspath(path))
+    return list(dict.fromkeys(paths))
+
+class BatchState:
+    """
+    Per-workbook status of a batch, saved to a JSON file after every change
+    so a crashed or partly failed batch can be resumed.
+
+    The file also holds the schema registry, so later batches keep loading
+    identical sheets into the same tables.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.files = {}
+        self.schemas = {}
+        if os.path.exists(state_file):
+            with open(state_file, encoding="utf-8") as file:
+                state = json.load(file)
+            self.files = state.get("files", {})
+            self.schemas = state.get("schemas", {})
+
+    def save(self):
+        """Write the state atomically (write a temporary file, then rename it)."""
+        with self.lock:
+            temp_file = self.state_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as file:
+                json.dump({"files": self.files, "schemas": self.schemas}, file, indent=4)
+            os.replace(temp_file, self.state_file)
+
+    def update(self, file_path, **fields):
+        """Update the entry of a workbook and save the state."""
+        with self.lock:
+            entry = self.files.setdefault(file_path, {"status": PENDING, "attempts": 0})
+            entry.update(fields, updated_at=datetime.datetime.now().isoformat(timespec="seconds"))
+        self.save()
+
+    def is_done(self, file_path):
+        """True if the workbook was ingested and has not been modified since."""
+        entry = self.files.get(file_path)
+        if entry is None or entry["status"] != DONE:
+            return False
+        stat = os.stat(file_path)
+        return entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("file_size") == stat.st_size
+
+    def failed_files(self):
+        """Workbooks whose last attempt failed."""
+        return [file_path for file_path, entry in self.files.items() if entry["status"] == FAILED]
+
+class SchemaRegistry:
+    """
+    Schema signature -> table registry shared by every workbook of a batch,
+    so sheets with identical schemas land in the same table whichever file
+    they come from. Tables are created the first time a schema is seen.
+    """
+
+    def __init__(self, state, base_table_name):
+        self.state = state
+        self.base_table_name = base_table_name
+        self.lock = threading.Lock()
+
+    def table_for_group(self, schema_key, group_info):
+        """
+        Get the table of a schema group, creating it if the schema is new.
+
+        Returns:
+            str: The table name, or None if the table could not be created.
+        """
+        with self.lock:
+            table_name = self.state.schemas.get(schema_key)
+            if table_name is not None:
+                return table_name
+            table_name = f"{self.base_table_name}_schema_{len(self.state.schemas) + 1}"
+            logging.info("Creating table '%s' for new schema: %s", table_name,
+                         [col[0] for col in group_info['schema']])
+            if not create_table_in_db(group_info['sample_data'], table_name, group_info.get('column_types'),
+                                      source_file_column=True):
+                logging.error("Failed to create table '%s' for sheets: %s", table_name, group_info['sheets'])
+                return None
+            with self.state.lock:
+                self.state.schemas[schema_key] = table_name
+        self.state.save()
+        return table_name
+
+    def tables_for_groups(self, schema_groups):
+        """
+        Get the tables of the schema groups of one workbook.
+
+        Returns:
+            dict: Dictionary mapping schema groups to table names.
+        """
+        table_mapping = {}
+        for schema_key, group_info in schema_groups.items():
+            table_name = self.table_for_group(schema_key, group_info)
+            if table_name is not None:
+                table_mapping[schema_key] = table_name
+        return table_mapping
+
+def ingest_workbook(file_path, state, registry, method="copy", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE,
+                    isolate_bad_rows=False, sheet_workers=1):
+    """
+    Ingest one workbook of a batch and record its status.
+
+    Sheets are loaded through ingest_changed_sheets, so each sheet replaces
+    its own (source_file, source_sheet) slice in one transaction: retrying
+    a failed workbook never duplicates rows, and sheets that were loaded
+    before the failure are skipped as unchanged. The workbook is only DONE
+    once every sheet has a manifest entry, so a retry that finds nothing to
+    load does not hide a sheet that was never loaded.
+
+    Returns:
+        str: The new status, DONE or FAILED.
+    """
+    stat = os.stat(file_path)
+    attempts = state.files.get(file_path, {}).get("attempts", 0) + 1
+    state.update(file_path, status=RUNNING, attempts=attempts, error=None)
+    try:
+        table_summaries = ingest_changed_sheets(file_path, registry.base_table_name, max_workers=sheet_workers,
+                                                method=method, chunk_size=chunk_size,
+                                                isolate_bad_rows=isolate_bad_rows, schema_registry=registry)
+    except Exception as e:
+        logging.error("Ingesting %s failed: %s", file_path, e)
+        state.update(file_path, status=FAILED, error=str(e))
+        return FAILED
+
+    rows = sum(summary['rows'] for summary in table_summaries.values())
+    failed_tables = [table for table, summary in table_summaries.items()
+                     if not summary['success'] and summary['quarantined'] == 0]
+    if failed_tables:
+        state.update(file_path, status=FAILED, rows=rows, error=f"Loading tables {failed_tables} failed")
+        return FAILED
+    try:
+        unloaded = ingest_manifest.missing_sheets(file_path)
+    except Exception as e:
+        logging.error("Checking the manifest of %s failed: %s", file_path, e)
+        state.update(file_path, status=FAILED, rows=rows, error=str(e))
+        return FAILED
+    if unloaded:
+        logging.error("Sheets %s of %s were not loaded", unloaded, file_path)
+        state.update(file_path, status=FAILED, rows=rows, error=f"Sheets {unloaded} were not loaded")
+        return FAILED
+    state.update(file_path, status=DONE, rows=rows, mtime_ns=stat.st_mtime_ns, file_size=stat.st_size,
+                 quarantined=sum(summary['quarantined'] for summary in table_summaries.values()))
+    return DONE
+
+def run_batch(sources, state_file=DEFAULT_STATE_FILE, base_table_name="invoice_data", workers=4,
+              retry_failed=False, method="copy", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False):
+    """
+    Ingest many workbooks on a pool of worker threads, largest first.
+
+    Workbooks already done (and unchanged since) are skipped, so re-running
+    the same command resumes a crashed batch. With retry_failed, only the
+    workbooks whose last attempt failed are run.
+
+    Args:
+        sources (list): Directories, glob patterns or manifest files (see collect_workbooks).
+        state_file (str): JSON file with the per-workbook status and the schema registry.
+        base_table_name (str): Base name of the tables created for new schemas.
+        workers (int): Number of workbooks ingested at the same time.
+        retry_failed (bool): Only run the workbooks that failed last time.
+        method (str): Load method for pg_bulk_load.load_data_to_db ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting a load.
+
+    Returns:
+        dict: Dictionary mapping workbook paths to their status.
+    """
+    state = BatchState(state_file)
+    registry = SchemaRegistry(state, base_table_name)
+
+    if retry_failed:
+        file_paths = state.failed_files()
+    else:
+        file_paths = [file_path for file_path in collect_workbooks(sources) if not state.is_done(file_path)]
+    # Largest files first, so a big workbook does not start last and hold up the end of the batch
+    sizes = {file_path: workbook_inspector.parse_size(file_path) for file_path in file_paths}
+    file_paths.sort(key=lambda file_path: sizes[file_path], reverse=True)
+    for file_path in file_paths:
+        if file_path not in state.files or state.files[file_path]["status"] == RUNNING:
+            state.update(file_path, status=PENDING, estimated_size=sizes[file_path])
+    logging.info("Batch of %s workbooks with %s workers", len(file_paths), workers)
+
+    statuses = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(ingest_workbook, file_path, state, registry, method, chunk_size,
+                                   isolate_bad_rows): file_path
+                   for file_path in file_paths}
+        for future in as_completed(futures):
+            statuses[futures[future]] = future.result()
+            logging.info("Workbook %s: %s", futures[future], statuses[futures[future]])
+
+    logging.info("Batch finished: %s done, %s failed", list(statuses.values()).count(DONE),
+                 list(statuses.values()).count(FAILED))
+    return statuses
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest many Excel workbooks into PostgreSQL.")
+    parser.add_argument("sources", nargs="*", help="directories, glob patterns or manifest files (.txt/.json)")
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE, help="state file (default: %(default)s)")
+    parser.add_argument("--table", default="invoice_data", help="base table name (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="workbooks ingested at once (default: 4)")
+    parser.add_argument("--retry-failed", action="store_true", help="only run the workbooks that failed last time")
+    parser.add_argument("--method", choices=("copy", "batch"), default="copy", help="load method (default: copy)")
+    parser.add_argument("--isolate-bad-rows", action="store_true", help="quarantine failing rows")
+    args = parser.parse_args()
+    if not args.sources and not args.retry_failed:
+        parser.error("give at least one source, or --retry-failed")
+
+    logging.basicConfig(filename='batch_ingest.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        pg_dbconnect.create_pool()
+        statuses = run_batch(args.sources, state_file=args.state, base_table_name=args.table, workers=args.workers,
+                             retry_failed=args.retry_failed, method=args.method,
+                             isolate_bad_rows=args.isolate_bad_rows)
+        for file_path, status in statuses.items():
+            print(f"{status:8} {file_path}")
+    finally:
+        pg_dbconnect.close_pool()
@@ -0,0 +1,277 @@
+# File: benchmark.py
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import pg_dbconnect
+from excel_to_database import (clean_data_for_insert, create_tables_for_schema_groups, group_sheets_by_schema,
+                               insert_data_to_db)
+from excel_to_dictionary import excel_to_dictionary
+from export_dict_to_json_file import export_to_json
+from instrumentation import peak_rss_mb
+from synthetic_workbook import generate_workbook, parse_type_mix
+
+DEFAULT_BASELINE_FILE = "benchmark_baseline.json"
+
+# A stage counts as a regression when its rows/sec drops by more than this fraction
+DEFAULT_TOLERANCE = 0.2
+
+# Workbook shapes run by default; each maps to generate_workbook arguments
+SCENARIOS = {
+    "small": {"sheets": ("2019", "2020", "2021"), "rows": 2000, "columns": 10, "sparsity": 0.1},
+    "wide": {"sheets": ("2020", "2021"), "rows": 500, "columns": 120, "sparsity": 0.1},
+    "sparse": {"sheets": ("2019", "2020", "2021"), "rows": 2000, "columns": 20, "sparsity": 0.7},
+    "large": {"sheets": ("2016", "2017", "2018", "2019", "2020"), "rows": 40000, "columns": 12, "sparsity": 0.1},
+}
+
+STAGES = ("excel_to_dictionary", "group_sheets_by_schema", "clean_data_for_insert", "export_to_json",
+          "insert_data_to_db")
+
+class NullCursor:
+    """Cursor of the in-process database stand-in: reads what COPY would send and discards it."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, statement, params=None):
+        self.connection.statements += 1
+
+    def copy_expert(self, statement, data):
+        self.connection.bytes_sent += len(data.read())
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+class NullConnection:
+    """Connection of the in-process database stand-in, counting statements and COPY bytes."""
+
+    closed = 0
+
+    def __init__(self):
+        self.statements = 0
+        self.bytes_sent = 0
+
+    def cursor(self):
+        return NullCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+@contextlib.contextmanager
+def null_database():
+    """
+    Replace the connection pool with the in-process stand-in, so the load
+    stage measures the client side (cleaning, bucketing, COPY formatting)
+    without a PostgreSQL server.
+
+    Yields:
+        list: The NullConnection objects handed out.
+    """
+    connections = []
+
+    def get_connection():
+        connections.append(NullConnection())
+        return connections[-1]
+
+    with mock.patch("pg_dbconnect.get_pooled_connection", side_effect=get_connection), \
+            mock.patch("pg_dbconnect.release_connection"):
+        yield connections
+
+@contextlib.contextmanager
+def timed_stage(results, stage, rows):
+    """Time a block and record its seconds, rows/sec and the peak RSS after it."""
+    start_time = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start_time
+    results[stage] = {"seconds": seconds, "rows": rows, "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+                      "peak_rss_mb": peak_rss_mb()}
+    logging.info("Stage %s: %s rows in %.3fs (%.0f rows/sec)", stage, rows, seconds, results[stage]["rows_per_sec"])
+
+def drop_tables(table_names):
+    """Drop the tables created by a benchmark run."""
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for table_name in table_names:
+                cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+            conn.commit()
+        finally:
+            cursor.close()
+
+def run_benchmark(scenario, work_dir, use_database=False, method="copy", engine="openpyxl", seed=0, as_table=False):
+    """
+    Generate the workbook of a scenario and time each stage of a load on it.
+
+    Stages run in order on the output of the previous one, as in
+    excel_to_database: parse, group by schema, clean, export to JSON and
+    load. Without use_database the load runs against the in-process
+    stand-in; with it, the tables are created in the configured PostgreSQL
+    database and dropped afterwards.
+
+    Args:
+        scenario (dict): Arguments for generate_workbook.
+        work_dir (str): Directory for the generated workbook and JSON export.
+        use_database (bool): Load into PostgreSQL instead of the stand-in.
+        method (str): Load method for insert_data_to_db ("insert", "copy" or "batch").
+        engine (str): "openpyxl" or "xml", the workbook reader.
+        seed (int): Seed of the workbook generator.
+        as_table (bool): Read the sheets into SheetTables with inferred types,
+            as excel_to_database does, instead of lists of row dictionaries.
+
+    Returns:
+        dict: Result with the workbook size, total rows and per-stage timings.
+    """
+    file_path = os.path.join(work_dir, "benchmark.xlsx")
+    start_time = time.perf_counter()
+    row_counts = generate_workbook(file_path, seed=seed, **scenario)
+    logging.info("Generated %s in %.2fs", file_path, time.perf_counter() - start_time)
+    rows = sum(row_counts.values())
+
+    stages = {}
+    with timed_stage(stages, "excel_to_dictionary", rows):
+        data = excel_to_dictionary(file_path, engine=engine, as_table=as_table, infer_types=as_table)
+    with timed_stage(stages, "group_sheets_by_schema", rows):
+        schema_groups = group_sheets_by_schema(data)
+    with timed_stage(stages, "clean_data_for_insert", rows):
+        cleaned_data = clean_data_for_insert(data)
+    with timed_stage(stages, "export_to_json", rows):
+        export_to_json(data, os.path.join(work_dir, "benchmark.json"))
+
+    with contextlib.ExitStack() as stack:
+        if not use_database:
+            stack.enter_context(null_database())
+        table_mapping = create_tables_for_schema_groups(schema_groups, "benchmark_data")
+        if use_database:
+            stack.callback(drop_tables, list(table_mapping.values()))
+        with timed_stage(stages, "insert_data_to_db", rows):
+            for schema_key, table_name in table_mapping.items():
+                group_data = {sheet: cleaned_data[sheet] for sheet in schema_groups[schema_key]['sheets']}
+                if not insert_data_to_db(group_data, table_name, method=method):
+                    logging.error("Benchmark load of table '%s' failed", table_name)
+
+    return {"rows": rows, "sheets": len(row_counts), "workbook_mb": os.path.getsize(file_path) / 1024 / 1024,
+            "database": "postgres" if use_database else "stand-in", "method": method, "engine": engine, "as_table": as_table,
+            "stages": stages, "peak_rss_mb": peak_rss_mb()}
+
+def compare_to_baseline(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare a benchmark result with its saved baseline.
+
+    Args:
+        result (dict): Result of run_benchmark.
+        baseline (dict): Result saved by an earlier run of the same scenario.
+        tolerance (float): Allowed fractional drop in rows/sec, or rise in peak RSS.
+
+    Returns:
+        list: Descriptions of the regressions found (empty if none).
+    """
+    regressions = []
+    for stage, timing in result["stages"].items():
+        baseline_timing = baseline["stages"].get(stage)
+        if baseline_timing is None or not baseline_timing["rows_per_sec"]:
+            continue
+        change = timing["rows_per_sec"] / baseline_timing["rows_per_sec"] - 1
+        if change < -tolerance:
+            regressions.append(f"{stage}: {timing['rows_per_sec']:.0f} rows/sec, "
+                               f"{-change:.0%} slower than the baseline {baseline_timing['rows_per_sec']:.0f}")
+    if result.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        change = result["peak_rss_mb"] / baseline["peak_rss_mb"] - 1
+        if change > tolerance:
+            regressions.append(f"peak RSS: {result['peak_rss_mb']:.0f} MB, "
+                               f"{change:.0%} above the baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+def load_baselines(baseline_file):
+    """Read the saved baselines, keyed by scenario name."""
+    if not os.path.exists(baseline_file):
+        return {}
+    with open(baseline_file, encoding="utf-8") as file:
+        return json.load(file)
+
+def save_baselines(baselines, baseline_file):
+    """Write the baselines, keyed by scenario name."""
+    with open(baseline_file, "w", encoding="utf-8") as file:
+        json.dump(baselines, file, indent=4, sort_keys=True)
+    logging.info("Saved benchmark baselines to %s", baseline_file)
+
+def print_result(name, result):
+    """Print the stage timings of one scenario as a table."""
+    print(f"\n{name}: {result['rows']} rows in {result['sheets']} sheets, {result['workbook_mb']:.1f} MB workbook, "
+          f"load into {result['database']} ({result['method']})")
+    print(f"  {'stage':24} {'seconds':>9} {'rows/sec':>12} {'peak RSS MB':>12}")
+    for stage, timing in result["stages"].items():
+        peak = "-" if timing["peak_rss_mb"] is None else f"{timing['peak_rss_mb']:.0f}"
+        print(f"  {stage:24} {timing['seconds']:9.3f} {timing['rows_per_sec']:12.0f} {peak:>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each stage of the Excel to PostgreSQL load on synthetic workbooks.")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run (default: small wide sparse); one of {list(SCENARIOS)}")
+    parser.add_argument("--rows", type=int, help="override the rows per sheet of every scenario")
+    parser.add_argument("--columns", type=int, help="override the columns of every scenario")
+    parser.add_argument("--sparsity", type=float, help="override the fraction of blank cells")
+    parser.add_argument("--type-mix", type=parse_type_mix, help="weights such as text=3,integer=2,decimal=2,date=2,boolean=1")
+    parser.add_argument("--seed", type=int, default=0, help="workbook generator seed (default: %(default)s)")
+    parser.add_argument("--engine", choices=("openpyxl", "xml"), default="openpyxl", help="workbook reader")
+    parser.add_argument("--method", choices=("insert", "copy", "batch"), default="copy", help="load method (default: copy)")
+    parser.add_argument("--as-table", action="store_true", help="read the sheets into columnar SheetTables")
+    parser.add_argument("--database", action="store_true",
+                        help="load into PostgreSQL (see docker-compose.yml) instead of the in-process stand-in")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="baseline file (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a stage is reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}, expected some of {list(SCENARIOS)}")
+    if args.method == "batch" and not args.database:
+        parser.error("the batch method needs a real database (--database)")
+
+    logging.basicConfig(filename='benchmark.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    baselines = load_baselines(args.baseline)
+    regressions = {}
+    if args.database:
+        pg_dbconnect.create_pool()
+    try:
+        for name in args.scenarios or ["small", "wide", "sparse"]:
+            scenario = dict(SCENARIOS[name])
+            for option in ("rows", "columns", "sparsity", "type_mix"):
+                if getattr(args, option) is not None:
+                    scenario[option] = getattr(args, option)
+            with tempfile.TemporaryDirectory() as work_dir:
+                result = run_benchmark(scenario, work_dir, use_database=args.database, method=args.method,
+                                       engine=args.engine, seed=args.seed, as_table=args.as_table)
+            result.update(scenario=scenario, python=platform.python_version(), machine=platform.machine(),
+                          recorded_at=datetime.datetime.now().isoformat(timespec="seconds"))
+            print_result(name, result)
+
+            if args.save_baseline:
+                baselines[name] = result
+            elif name in baselines:
+                regressions[name] = compare_to_baseline(result, baselines[name], args.tolerance)
+                for regression in regressions[name]:
+                    print(f"  REGRESSION {regression}")
+    finally:
+        if args.database:
+            pg_dbconnect.close_pool()
+
+    if args.save_baseline:
+        save_baselines(baselines, args.baseline)
+    sys.exit(1 if any(regressions.values()) else 0)
@@ -1,11 +1,44 @@
 from collections import defaultdict
-from excel_to_dictionary import excel_to_dictionary
+from concurrent.futures import ThreadPoolExecutor
+from excel_to_dictionary import excel_to_dictionary, iter_sheet_rows, iter_records
 from export_dict_to_json_file import export_to_json
-from print_sheet_summary import print_sheet_summary
+from print_sheet_summary import print_sheet_summary, print_workbook_summary
+import argparse
+import asyncio
 import datetime
+import itertools
+import time
 import pg_dbconnect
+import pg_bulk_load
+import ingest_manifest
+import async_pipeline
+import workbook_cache
+import pg_partitions
+import pg_staging
+import pg_upsert
+import workbook_inspector
+import instrumentation
+import vectorized_clean
+from sheet_table import SheetTable
+from type_inference import TypeInferencer, infer_sheet_types
+import type_inference
+from pg_bulk_load import clean_row, clean_column_name
 import logging
 
+# DEFAULT value for each inferred column type, so omitted cells get a sensible value
+COLUMN_DEFAULTS = {
+    type_inference.TEXT: "''",
+    type_inference.BOOLEAN: "FALSE",
+    type_inference.BIGINT: "0",
+    type_inference.DECIMAL: "0.0",
+    type_inference.DATE: "'1900-01-01'",
+    type_inference.TIMESTAMP: "'1900-01-01 00:00:00'",
+    type_inference.TIME: "'00:00:00'",
+}
+
+# Failed rows of the "insert" method that are logged in full; later failures are only counted
+MAX_LOGGED_ROW_ERRORS = 10
+
 # This method creates insert statements for each row in the dictionary
 def create_insert_statements(data_dict, table_name):
     """
@@ -23,7 +56,7 @@ def create_insert_statements(data_dict, table_name):
     for sheet_name, rows in data_dict.items():
         for row in rows:
             columns = ', '.join(row.keys())
-            values = ', '.join(f"'{str(value).replace('\'', '\'\'')}'" if value is not None else 'NULL' for value in row.values())
+            values = ', '.join("'" + str(value).replace("'", "''") + "'" if value is not None else 'NULL' for value in row.values())
             insert_statement = f"INSERT INTO {table_name} ({columns}) VALUES ({values});"
             #print(f"executing statement: {insert_statement}")
             insert_statements.append(insert_statement)
@@ -31,19 +64,37 @@ def create_insert_statements(data_dict, table_name):
     return insert_statements
 
 # This is function to insert data into a PostgreSQL database
-def insert_data_to_db(data_dict, table_name):
+def insert_data_to_db(data_dict, table_name, method="insert", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE,
+                      page_size=pg_bulk_load.DEFAULT_PAGE_SIZE, isolate_bad_rows=False, quarantine_file=None):
     """
     Insert data from the dictionary into a PostgreSQL database table.
     Adds a source_sheet column to track which sheet the data came from.
     
     Args:
-        data_dict (dict): The data dictionary containing sheet data.
+        data_dict (dict or iterable): The data dictionary containing sheet data,
+            or a stream of (sheet_name, row) records from iter_sheet_rows.
         table_name (str): The name of the database table to insert into.
+        method (str): "insert" for one INSERT per row, "copy" to bulk load
+            each chunk with COPY ... FROM STDIN, or "batch" for multi-row
+            INSERTs grouped by column signature.
+        chunk_size (int): Number of rows per chunk for the "copy" and "batch" methods.
+        page_size (int): Number of rows per INSERT statement for the "batch" method.
+        isolate_bad_rows (bool): For "copy" and "batch", load each chunk in a
+            SAVEPOINT and quarantine failing rows instead of aborting the load.
+        quarantine_file (str): JSON Lines file for quarantined rows
+            (if None, uses the <table_name>_quarantine table).
     
     Returns:
         bool: True if all data was inserted successfully, False otherwise.
     """
-    conn = pg_dbconnect.create_connection()
+    if method in ("copy", "batch"):
+        summary = pg_bulk_load.load_data_to_db(data_dict, table_name, method=method,
+                                               chunk_size=chunk_size, page_size=page_size,
+                                               isolate_bad_rows=isolate_bad_rows,
+                                               quarantine_file=quarantine_file)
+        return summary['success'] and summary['quarantined'] == 0
+    
+    conn = pg_dbconnect.get_pooled_connection()
     if not conn:
         logging.error("Failed to create a database connection.")
         return False
@@ -54,14 +105,19 @@ def insert_data_to_db(data_dict, table_name):
     failed_inserts = 0
     
     try:
-        # Clean the data before insertion
-        cleaned_data = clean_data_for_insert(data_dict)
-        
-        for sheet_name, rows in cleaned_data.items():
-            logging.info("Inserting data from sheet: %s (%s rows) into table: %s", sheet_name, len(rows), table_name)
+        with instrumentation.stage("insert", table=table_name) as stage_metrics:
+            current_sheet = None
             
-            for row_num, row in enumerate(rows, 1):
+            # Clean each row just before insertion so streamed data is never held in full
+            for sheet_name, raw_row in iter_records(data_dict):
+                if sheet_name != current_sheet:
+                    logging.info("Inserting data from sheet: %s into table: %s", sheet_name, table_name)
+                    current_sheet = sheet_name
+                    row_num = 0
+                
+                row_num += 1
                 total_rows += 1
+                row = clean_row(raw_row)
                 try:
                     # Add source_sheet column to track which sheet this data came from
                     row['source_sheet'] = sheet_name
@@ -79,18 +135,22 @@ def insert_data_to_db(data_dict, table_name):
                     cursor.execute(insert_statement, tuple(row.values()))
                     successful_inserts += 1
                     
-                    logging.debug("Row %s from sheet '%s' inserted successfully into table '%s'", row_num, sheet_name, table_name)
-                    
                 except Exception as row_error:
                     failed_inserts += 1
-                    logging.error("Failed to insert row %s from sheet '%s': %s", row_num, sheet_name, row_error)
-                    logging.error("Row data: %s", row)
-                    logging.error("Insert statement: %s", insert_statement)
+                    # Log the first failures in full and only count the rest, so a bad sheet cannot flood the log
+                    if failed_inserts <= MAX_LOGGED_ROW_ERRORS:
+                        logging.error("Failed to insert row %s from sheet '%s': %s", row_num, sheet_name, row_error)
+                        logging.error("Row data: %s", row)
+                        logging.error("Insert statement: %s", insert_statement)
                     # Continue with next row instead of stopping
                     continue
+            
+            # Commit all successful transactions
+            conn.commit()
+            stage_metrics.add(rows=successful_inserts)
         
-        # Commit all successful transactions
-        conn.commit()
+        instrumentation.count("rows_loaded", successful_inserts, table=table_name)
+        instrumentation.count("rows_failed", failed_inserts, table=table_name)
         logging.info("Data insertion completed for table '%s'. Total: %s, Successful: %s, Failed: %s", 
                     table_name, total_rows, successful_inserts, failed_inserts)
         
@@ -109,78 +169,132 @@ def insert_data_to_db(data_dict, table_name):
         
     finally:
         cursor.close()
-        logging.debug("Closing database connection.")
-        pg_dbconnect.close_connection(conn)
-        logging.debug("Database connection closed.")
+        logging.debug("Returning database connection to the pool.")
+        pg_dbconnect.release_connection(conn)
+        logging.debug("Database connection returned to the pool.")
 
 # This function creates a CREATE TABLE statement based on the data structure
-def create_table_statement(data_dict, table_name):
+def create_table_statement(data_dict, table_name, column_types=None, source_file_column=False,
+                           partition_by_sheet=False, staging=False):
     """
     Generate a CREATE TABLE statement based on the data dictionary structure.
+    Column types are inferred from every row of every sheet (see
+    type_inference), not just the first row.
     
     Args:
         data_dict (dict): The data dictionary containing sheet data.
         table_name (str): The name of the database table to create.
+        column_types (TypeInferencer): Already inferred column types
+            (if None, they are inferred from data_dict).
+        source_file_column (bool): Add a source_file column, for tables
+            shared by sheets of several workbooks.
+        partition_by_sheet (bool): Create a parent table LIST partitioned on
+            source_sheet (see pg_partitions); the primary key then has to
+            include source_sheet.
+        staging (bool): Create an UNLOGGED table without primary key to
+            bulk-load into (see pg_staging).
     
     Returns:
         str: CREATE TABLE SQL statement.
     """
-    if not data_dict:
+    if column_types is None:
+        column_types = infer_data_types(data_dict)
+    if column_types is None or not column_types.states:
         return None
     
-    # Get the first sheet's first row to analyze column structure
-    first_sheet = next(iter(data_dict.values()))
-    if not first_sheet:
-        return None
-    
-    first_row = first_sheet[0]
-    
     # Analyze data types for each column
     columns = []
-    columns.append("id SERIAL PRIMARY KEY")  # Add auto-increment primary key
-    columns.append("source_sheet TEXT DEFAULT ''")  # Add source sheet tracking
+    if partition_by_sheet:
+        columns.append("id SERIAL")  # Auto-increment key, unique together with the partition key
+        columns.append("source_sheet TEXT NOT NULL")  # Partition key
+    elif staging:
+        columns.append("id SERIAL")  # The primary key is added once the rows are loaded
+        columns.append("source_sheet TEXT DEFAULT ''")
+    else:
+        columns.append("id SERIAL PRIMARY KEY")  # Add auto-increment primary key
+        columns.append("source_sheet TEXT DEFAULT ''")  # Add source sheet tracking
+    if source_file_column:
+        columns.append("source_file TEXT DEFAULT ''")  # Add source workbook tracking
     
-    for column_name, sample_value in first_row.items():
+    for column_name, state in column_types.column_types():
         # Clean column name for SQL compatibility
-        clean_column_name = column_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()
+        sql_column_name = clean_column_name(column_name)
         
-        # Determine data type based on sample value and add appropriate defaults
-        if sample_value is None or sample_value == "":
-            data_type = "TEXT DEFAULT ''"
-        elif isinstance(sample_value, bool):
-            data_type = "BOOLEAN DEFAULT FALSE"
-        elif isinstance(sample_value, int):
-            data_type = "BIGINT DEFAULT 0"
-        elif isinstance(sample_value, float):
-            data_type = "DECIMAL(10,2) DEFAULT 0.0"
-        elif isinstance(sample_value, (datetime.datetime, datetime.date)):
-            data_type = "DATE DEFAULT '1900-01-01'"
-        elif isinstance(sample_value, datetime.time):
-            data_type = "TIME DEFAULT '00:00:00'"
-        else:
-            # Default to TEXT with empty string default
-            data_type = "TEXT DEFAULT ''"
+        # Use the inferred type with the matching default value
+        data_type = f"{state.sql_type(exact=column_types.exact)} DEFAULT {COLUMN_DEFAULTS[state.schema_type]}"
         
-        columns.append(f"{clean_column_name} {data_type}")
+        columns.append(f"{sql_column_name} {data_type}")
+    
+    partition_clause = ""
+    if partition_by_sheet:
+        columns.append("PRIMARY KEY (id, source_sheet)")
+        partition_clause = " PARTITION BY LIST (source_sheet)"
     
     columns_str = ",\n    ".join(columns)
     
-    create_statement = f"""CREATE TABLE IF NOT EXISTS {table_name} (
+    if staging:
+        return f"""CREATE UNLOGGED TABLE {table_name} (
     {columns_str}
 );"""
     
+    create_statement = f"""CREATE TABLE IF NOT EXISTS {table_name} (
+    {columns_str}
+){partition_clause};"""
+    
     return create_statement
 
+def infer_data_types(data_dict, sample_size=None):
+    """
+    Infer the column types of all sheets in a data dictionary together.
+    
+    Args:
+        data_dict (dict): The data dictionary containing sheet data.
+        sample_size (int): Only inspect the first sample_size rows of each sheet.
+    
+    Returns:
+        TypeInferencer: Merged column types, or None if there is no data.
+    """
+    merged_types = None
+    for sheet_data in (data_dict or {}).values():
+        if not sheet_data:
+            continue
+        sheet_types = infer_sheet_types(sheet_data, sample_size)
+        if merged_types is None:
+            merged_types = TypeInferencer()
+        merged_types.merge(sheet_types)
+    return merged_types
+
+def schema_from_types(column_types):
+    """
+    Build the schema signature for a set of inferred column types.
+    
+    Args:
+        column_types (TypeInferencer): Inferred column types.
+    
+    Returns:
+        tuple: A tuple of (SQL column name, base type) pairs.
+    """
+    return tuple((clean_column_name(column_name), state.schema_type)
+                 for column_name, state in column_types.column_types())
+
 # This function executes the CREATE TABLE statement
-def create_table_in_db(data_dict, table_name):
+def create_table_in_db(data_dict, table_name, column_types=None, source_file_column=False, partition_sheets=None,
+                       staging=False):
     """
     Create the table in the PostgreSQL database.
     
     Args:
         data_dict (dict): The data dictionary containing sheet data.
         table_name (str): The name of the database table to create.
+        column_types (TypeInferencer): Already inferred column types
+            (if None, they are inferred from data_dict).
+        source_file_column (bool): Add a source_file column (see create_table_statement).
+        partition_sheets (list): Create a table partitioned by source_sheet,
+            with one partition for each of these sheets.
+        staging (bool): Create an UNLOGGED staging table without primary key,
+            replacing any staging table left by an earlier run.
     """
-    conn = pg_dbconnect.create_connection()
+    conn = pg_dbconnect.get_pooled_connection()
     if not conn:
         logging.error("Failed to create a database connection.")
         return False
@@ -188,11 +302,16 @@ def create_table_in_db(data_dict, table_name):
     cursor = conn.cursor()
     
     try:
-        create_statement = create_table_statement(data_dict, table_name)
+        create_statement = create_table_statement(data_dict, table_name, column_types, source_file_column,
+                                                  partition_by_sheet=partition_sheets is not None, staging=staging)
         if create_statement:
             logging.info("Executing CREATE TABLE statement:")
             logging.info(create_statement)
+            if staging:
+                cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
             cursor.execute(create_statement)
+            for sheet_name in partition_sheets or []:
+                pg_partitions.create_partition(cursor, table_name, sheet_name)
             conn.commit()
             logging.debug("Table %s created successfully!", table_name)
             return True
@@ -206,14 +325,18 @@ def create_table_in_db(data_dict, table_name):
         return False
     finally:
         cursor.close()
-        logging.debug("Closing database connection.")
-        pg_dbconnect.close_connection(conn)
-        logging.debug("Database connection closed.")
+        logging.debug("Returning database connection to the pool.")
+        pg_dbconnect.release_connection(conn)
+        logging.debug("Database connection returned to the pool.")
 
 def clean_data_for_insert(data_dict):
     """
     Clean data for database insertion by handling empty values.
     Removes empty/None values so database can use DEFAULT values.
+    Sheets stored as SheetTable stay columnar: with NumPy and pandas
+    installed they are cleaned in place, column chunk by column chunk
+    (values trimmed, blank cells marked null and strings coerced to the
+    inferred column type); otherwise only blank cells are marked null.
     
     Args:
         data_dict (dict): The data dictionary containing sheet data.
@@ -224,29 +347,25 @@ def clean_data_for_insert(data_dict):
     cleaned_data = {}
     
     for sheet_name, rows in data_dict.items():
-        cleaned_rows = []
-        
-        for row in rows:
-            cleaned_row = {}
-            
-            for column_name, value in row.items():
-                # Handle empty or None values by omitting them from INSERT
-                if value is not None and str(value).strip() != '':
-                    cleaned_row[column_name] = value
-                # If value is empty/None, skip it - let database use DEFAULT value
-            
-            cleaned_rows.append(cleaned_row)
-        
-        cleaned_data[sheet_name] = cleaned_rows
+        if isinstance(rows, SheetTable):
+            # The column data is not copied
+            if vectorized_clean.is_available():
+                cleaned_data[sheet_name] = vectorized_clean.clean_table(rows)
+            else:
+                cleaned_data[sheet_name] = rows.cleaned()
+        else:
+            cleaned_data[sheet_name] = [clean_row(row) for row in rows]
     
     return cleaned_data
 
-def get_table_schema(data_dict):
+def get_table_schema(data_dict, sample_size=None):
     """
     Analyze the data structure and return a schema signature.
+    The type of each column is inferred from all of its values.
     
     Args:
         data_dict (dict): The data dictionary containing sheet data.
+        sample_size (int): Only inspect the first sample_size rows.
     
     Returns:
         tuple: A tuple representing the schema (column names and types).
@@ -254,38 +373,12 @@ def get_table_schema(data_dict):
     if not data_dict:
         return None
     
-    # Get the first sheet's first row to analyze column structure
+    # Analyze the first sheet's column structure
     first_sheet = next(iter(data_dict.values()))
     if not first_sheet:
         return None
     
-    first_row = first_sheet[0]
-    
-    # Create a schema signature based on column names and types
-    schema_items = []
-    for column_name, sample_value in first_row.items():
-        # Clean column name for SQL compatibility
-        clean_column_name = column_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()
-        
-        # Determine data type based on sample value
-        if sample_value is None or sample_value == "":
-            data_type = "TEXT"
-        elif isinstance(sample_value, bool):
-            data_type = "BOOLEAN"
-        elif isinstance(sample_value, int):
-            data_type = "BIGINT"
-        elif isinstance(sample_value, float):
-            data_type = "DECIMAL"
-        elif isinstance(sample_value, (datetime.datetime, datetime.date)):
-            data_type = "DATE"
-        elif isinstance(sample_value, datetime.time):
-            data_type = "TIME"
-        else:
-            data_type = "TEXT"
-        
-        schema_items.append((clean_column_name, data_type))
-    
-    return tuple(schema_items)
+    return schema_from_types(infer_sheet_types(first_sheet, sample_size))
 
 def compare_schemas(schema1, schema2):
     """
@@ -300,26 +393,46 @@ def compare_schemas(schema1, schema2):
     """
     return schema1 == schema2
 
-def group_sheets_by_schema(all_data):
+def group_sheets_by_schema(all_data, sample_size=None):
     """
     Group sheets by their schema structure.
     
+    Column types are inferred from every row of each sheet (or the first
+    sample_size rows), and each group keeps the merged types of its sheets
+    in 'column_types' for DDL generation.
+    
+    When a record stream (from iter_sheet_rows) is passed instead of a
+    dictionary, only the streamed rows are used for schema analysis and the
+    groups carry no 'data'; the caller re-streams each group's sheets when
+    loading. Pass iter_sheet_rows(file_path, max_rows=n) to bound the sample.
+    The stream is sampled one sheet at a time, so only the sample of the
+    current sheet (and the first sample of each group) is held in memory.
+    
     Args:
-        all_data (dict): Dictionary with all sheets data.
+        all_data (dict or iterable): Dictionary with all sheets data, or a
+            stream of (sheet_name, row) records.
+        sample_size (int): Only inspect the first sample_size rows of each sheet
+            (if None, inspects every row).
     
     Returns:
         dict: Dictionary where keys are schema signatures and values are sheet groups.
     """
+    streaming = not isinstance(all_data, dict)
+    sheet_samples = iter_sheet_samples(all_data) if streaming else all_data.items()
+    
     schema_groups = {}
     
-    for sheet_name, sheet_data in all_data.items():
+    for sheet_name, sheet_data in sheet_samples:
         if not sheet_data:  # Skip empty sheets
             logging.warning("Sheet '%s' is empty, skipping schema analysis", sheet_name)
             continue
             
-        # Create a single-sheet dict for schema analysis
+        # Infer the column types once and derive the schema from them
         single_sheet_dict = {sheet_name: sheet_data}
-        schema = get_table_schema(single_sheet_dict)
+        sheet_types = infer_sheet_types(sheet_data, sample_size)
+        # A streamed sample may not cover the whole sheet
+        sheet_types.sampled = sheet_types.sampled or streaming
+        schema = schema_from_types(sheet_types)
         
         if schema:
             # Convert schema to a hashable string for grouping
@@ -329,10 +442,14 @@ def group_sheets_by_schema(all_data):
                 schema_groups[schema_key] = {
                     'sheets': [],
                     'schema': schema,
-                    'sample_data': single_sheet_dict
+                    'sample_data': single_sheet_dict,
+                    'column_types': TypeInferencer()
                 }
             
             schema_groups[schema_key]['sheets'].append(sheet_name)
+            schema_groups[schema_key]['column_types'].merge(sheet_types)
+            if streaming:
+                continue
             # Add this sheet's data to the group
             if 'data' not in schema_groups[schema_key]:
                 schema_groups[schema_key]['data'] = {}
@@ -340,14 +457,44 @@ def group_sheets_by_schema(all_data):
     
     return schema_groups
 
-def create_tables_for_schema_groups(schema_groups, base_table_name):
+def iter_sheet_samples(records):
+    """
+    Collect a stream of (sheet_name, row) records into one list of rows per
+    sheet, one sheet at a time. The records of a sheet must be contiguous,
+    as iter_sheet_rows yields them.
+    
+    Args:
+        records (iterable): Stream of (sheet_name, row) records.
+    
+    Yields:
+        tuple: (sheet_name, list of rows)
+    """
+    for sheet_name, sheet_records in itertools.groupby(records, key=lambda record: record[0]):
+        sample = [row for _, row in sheet_records]
+        instrumentation.check_memory(f"Sampling sheet '{sheet_name}'")
+        yield sheet_name, sample
+
+def create_tables_for_schema_groups(schema_groups, base_table_name, partition_by_sheet=False, staging=False):
     """
     Create one table for each unique schema group.
     All sheets with the same schema will share the same table.
     
+    With partition_by_sheet, the table of a group of year sheets is a
+    parent LIST partitioned on source_sheet with one partition per sheet,
+    so queries filtering on a year only scan its partition. Such groups are
+    marked 'partitioned' and their sheets are loaded straight into their
+    partitions.
+    
+    With staging, each table is created as an UNLOGGED staging table
+    without primary key under pg_staging.staging_table_name(name), to be
+    swapped into place once loaded; the returned mapping still has the
+    final table names.
+    
     Args:
         schema_groups (dict): Dictionary of schema groups.
         base_table_name (str): Base name for tables.
+        partition_by_sheet (bool): Partition the tables of year sheet groups.
+        staging (bool): Create staging tables (see fast_load_schema_groups).
     
     Returns:
         dict: Dictionary mapping schema groups to table names.
@@ -379,58 +526,530 @@ def create_tables_for_schema_groups(schema_groups, base_table_name):
         logging.info("Schema columns: %s", [col[0] for col in group_info['schema']])
         
         # Create ONE table for this schema group (all sheets will use this table)
-        if create_table_in_db(group_info['sample_data'], table_name):
+        partition_sheets = sheets_in_group if partition_by_sheet and years and not staging else None
+        create_name = pg_staging.staging_table_name(table_name) if staging else table_name
+        if create_table_in_db(group_info['sample_data'], create_name, group_info.get('column_types'),
+                              partition_sheets=partition_sheets, staging=staging):
             table_mapping[schema_key] = table_name
+            group_info['partitioned'] = partition_sheets is not None
             logging.info("Table '%s' created successfully - will contain data from sheets: %s", table_name, sheets_in_group)
         else:
             logging.error("Failed to create table '%s' for schema group with sheets: %s", table_name, sheets_in_group)
     
     return table_mapping
 
+# This function loads the schema groups into their tables concurrently
+def sheet_table_mapping(schema_groups, table_mapping):
+    """
+    Map each sheet to the table created for its schema group, or to its own
+    partition when the group's table is partitioned.
+    
+    Args:
+        schema_groups (dict): Dictionary of schema groups.
+        table_mapping (dict): Dictionary mapping schema groups to table names.
+    
+    Returns:
+        dict: Dictionary mapping sheet names to table names, in sheet order.
+    """
+    sheet_tables = {}
+    for schema_key, group_info in schema_groups.items():
+        if schema_key not in table_mapping:
+            logging.error("No table created for schema group with sheets: %s", group_info['sheets'])
+            continue
+        for sheet in group_info['sheets']:
+            sheet_tables[sheet] = table_mapping[schema_key]
+            if group_info.get('partitioned'):
+                sheet_tables[sheet] = pg_partitions.partition_table_name(table_mapping[schema_key], sheet)
+    return sheet_tables
+
+def load_schema_groups(schema_groups, table_mapping, excel_file_path=None, max_workers=4, per_sheet=False,
+                       method="copy", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False):
+    """
+    Load every schema group into its table, running up to max_workers loads
+    at the same time. Each load takes its own connection from the pool.
+    
+    Groups built from a dictionary are loaded from their 'data'; groups
+    built from a record stream are re-streamed from excel_file_path. The
+    sheets of a partitioned group are loaded into their own partitions,
+    one load per sheet. With isolate_bad_rows, the quarantine tables are
+    created before the loads start, so loads of the same table never race
+    to create them.
+    
+    Args:
+        schema_groups (dict): Dictionary of schema groups.
+        table_mapping (dict): Dictionary mapping schema groups to table names.
+        excel_file_path (str): Path to the Excel file, for groups without 'data'.
+        max_workers (int): Maximum number of loads running at once.
+        per_sheet (bool): Run one load per sheet instead of one per table.
+        method (str): Load method for pg_bulk_load.load_data_to_db ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting a load.
+    
+    Returns:
+        dict: Dictionary mapping table names to their combined load summary.
+    """
+    tasks = []
+    for schema_key, group_info in schema_groups.items():
+        if schema_key not in table_mapping:
+            logging.error("No table created for schema group with sheets: %s", group_info['sheets'])
+            continue
+        table_name = table_mapping[schema_key]
+        if group_info.get('partitioned'):
+            for sheet in group_info['sheets']:
+                tasks.append((pg_partitions.partition_table_name(table_name, sheet), [sheet], group_info.get('data')))
+            continue
+        sheet_sets = [[sheet] for sheet in group_info['sheets']] if per_sheet else [group_info['sheets']]
+        for sheets in sheet_sets:
+            tasks.append((table_name, sheets, group_info.get('data')))
+    
+    def run_load(task):
+        table_name, sheets, group_data = task
+        if group_data is not None:
+            data = {sheet: group_data[sheet] for sheet in sheets}
+        else:
+            data = iter_sheet_rows(excel_file_path, sheet=sheets)
+        logging.info("Loading sheets %s into table '%s'", sheets, table_name)
+        summary = pg_bulk_load.load_data_to_db(data, table_name, method=method, chunk_size=chunk_size,
+                                               isolate_bad_rows=isolate_bad_rows)
+        return sheets, summary
+    
+    if isolate_bad_rows:
+        pg_bulk_load.create_quarantine_tables(table_name for table_name, _, _ in tasks)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(run_load, tasks))
+    
+    return combine_load_summaries(results, time.perf_counter() - start_time, max_workers)
+
+def combine_load_summaries(results, elapsed, max_workers):
+    """
+    Combine the summaries of concurrent loads into one summary per table and log them.
+    
+    Args:
+        results (list): List of (sheet names, load summary) tuples.
+        elapsed (float): Wall clock seconds of all loads together.
+        max_workers (int): Maximum number of loads that ran at once.
+    
+    Returns:
+        dict: Dictionary mapping table names to their combined load summary.
+    """
+    table_summaries = {}
+    for sheets, summary in results:
+        table_summary = table_summaries.setdefault(summary['table'], {
+            'table': summary['table'], 'sheets': [], 'rows': 0, 'quarantined': 0,
+            'seconds': 0.0, 'rows_per_sec': 0.0, 'success': True
+        })
+        table_summary['sheets'].extend(sheets)
+        table_summary['rows'] += summary['rows']
+        table_summary['quarantined'] += summary['quarantined']
+        # Loads of the same table overlap when per_sheet is set, so keep the longest one
+        table_summary['seconds'] = max(table_summary['seconds'], summary['seconds'])
+        table_summary['success'] = table_summary['success'] and summary['success'] and summary['quarantined'] == 0
+    
+    total_rows = 0
+    for table_summary in table_summaries.values():
+        if table_summary['seconds'] > 0:
+            table_summary['rows_per_sec'] = table_summary['rows'] / table_summary['seconds']
+        total_rows += table_summary['rows']
+        logging.info("Table '%s': sheets %s, %s rows in %.2fs (%.0f rows/sec), %s quarantined, success: %s",
+                     table_summary['table'], table_summary['sheets'], table_summary['rows'], table_summary['seconds'],
+                     table_summary['rows_per_sec'], table_summary['quarantined'], table_summary['success'])
+    logging.info("Loaded %s rows into %s tables in %.2fs with up to %s concurrent loads",
+                 total_rows, len(table_summaries), elapsed, max_workers)
+    
+    return table_summaries
+
+def fast_load_schema_groups(schema_groups, base_table_name, excel_file_path=None, max_workers=4, method="copy",
+                            chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False, indexes=(),
+                            keep_unlogged=False, partition_by_sheet=False):
+    """
+    Create and load every schema group's table through an UNLOGGED staging
+    table (see pg_staging).
+    
+    The rows are loaded without WAL and without any index to maintain;
+    the primary key and the configured indexes are then built once, the
+    table is made logged and analyzed, and it is swapped into place under
+    its final name. Readers see the previous table until the swap, never a
+    half-loaded one. A failed load drops its staging table and leaves the
+    previous table untouched.
+    
+    The staging tables are plain tables, so partitioned tables cannot be
+    fast loaded: partition_by_sheet is rejected, and an existing partitioned
+    table is left in place (see pg_staging.finalize_staging_table).
+    
+    Args:
+        schema_groups (dict): Dictionary of schema groups.
+        base_table_name (str): Base name for tables.
+        excel_file_path (str): Path to the Excel file, for groups without 'data'.
+        max_workers (int): Maximum number of loads running at once.
+        method (str): Load method for pg_bulk_load.load_data_to_db ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting a load.
+        indexes (list): Column names (or tuples of column names) to index
+            in every table that has them.
+        keep_unlogged (bool): Leave the tables UNLOGGED (see pg_staging.finalize_staging_table).
+        partition_by_sheet (bool): Not supported; raises ValueError when set.
+    
+    Returns:
+        dict: Dictionary mapping table names to their combined load summary.
+    
+    Raises:
+        ValueError: If partition_by_sheet is set.
+    """
+    if partition_by_sheet:
+        raise ValueError("fast_load cannot create partitioned tables; turn off partition_by_sheet or fast_load")
+    with instrumentation.stage("create_tables", staging=True):
+        table_mapping = create_tables_for_schema_groups(schema_groups, base_table_name, staging=True)
+    staging_mapping = {schema_key: pg_staging.staging_table_name(table_name)
+                       for schema_key, table_name in table_mapping.items()}
+    staged_summaries = load_schema_groups(schema_groups, staging_mapping, excel_file_path=excel_file_path,
+                                          max_workers=max_workers, method=method, chunk_size=chunk_size,
+                                          isolate_bad_rows=isolate_bad_rows)
+    
+    table_summaries = {}
+    for schema_key, table_name in table_mapping.items():
+        summary = staged_summaries.get(staging_mapping[schema_key])
+        if summary is None:
+            continue
+        summary['table'] = table_name
+        # Quarantined rows do not stop the good rows from being swapped in
+        if summary['success'] or summary['quarantined'] > 0:
+            table_columns = ["id", "source_sheet"] + [column for column, _ in schema_groups[schema_key]['schema']]
+            with instrumentation.stage("finalize", table=table_name):
+                if not pg_staging.finalize_staging_table(table_name, table_columns, indexes, keep_unlogged):
+                    summary['success'] = False
+        else:
+            logging.error("Loading staging table for '%s' failed; the previous table is left in place", table_name)
+            pg_staging.drop_staging_table(table_name)
+        table_summaries[table_name] = summary
+    return table_summaries
+
+def sync_schema_groups(schema_groups, base_table_name, natural_key, excel_file_path=None, max_workers=4,
+                       method="copy", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False,
+                       delete_missing=False, partition_by_sheet=False):
+    """
+    Sync every schema group's table with the workbook on a natural key
+    (see pg_upsert), instead of appending the rows again.
+    
+    Tables are created if they do not exist yet and kept otherwise. Each
+    group's rows are bulk-staged and upserted in one statement: new keys
+    are inserted, existing keys with changed values are updated and the
+    rest is left untouched.
+    
+    Args:
+        schema_groups (dict): Dictionary of schema groups.
+        base_table_name (str): Base name for tables.
+        natural_key (list or dict): Key columns used for every table, e.g.
+            ["invoice_no", "source_sheet"], or a dictionary mapping table
+            names to their key columns.
+        excel_file_path (str): Path to the Excel file, for groups without 'data'.
+        max_workers (int): Maximum number of syncs running at once.
+        method (str): Load method for staging the rows ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting a sync.
+        delete_missing (bool): Delete rows of the synced sheets whose key is not in the workbook any more.
+        partition_by_sheet (bool): Partition the tables of year sheet groups
+            (the key must then include source_sheet).
+    
+    Returns:
+        dict: Dictionary mapping table names to their sync summary.
+    """
+    with instrumentation.stage("create_tables"):
+        table_mapping = create_tables_for_schema_groups(schema_groups, base_table_name,
+                                                        partition_by_sheet=partition_by_sheet)
+    
+    tasks = []
+    table_summaries = {}
+    for schema_key, table_name in table_mapping.items():
+        group_info = schema_groups[schema_key]
+        key_columns = natural_key.get(table_name) if isinstance(natural_key, dict) else natural_key
+        columns = ["source_sheet"] + [column for column, _ in group_info['schema']]
+        if not key_columns or any(column not in columns for column in key_columns):
+            logging.error("Table '%s' has no natural key among its columns %s; it is not synced", table_name, columns)
+            table_summaries[table_name] = {'table': table_name, 'sheets': group_info['sheets'], 'rows': 0,
+                                           'quarantined': 0, 'seconds': 0.0, 'success': False}
+            continue
+        tasks.append((table_name, group_info, key_columns, columns))
+    
+    def run_sync(task):
+        table_name, group_info, key_columns, columns = task
+        sheets = group_info['sheets']
+        if group_info.get('data') is not None:
+            data = {sheet: group_info['data'][sheet] for sheet in sheets}
+        else:
+            data = iter_sheet_rows(excel_file_path, sheet=sheets)
+        logging.info("Syncing sheets %s into table '%s' on %s", sheets, table_name, key_columns)
+        summary = pg_upsert.sync_table(data, table_name, key_columns, columns, sheets=sheets, method=method,
+                                       chunk_size=chunk_size, isolate_bad_rows=isolate_bad_rows,
+                                       delete_missing=delete_missing)
+        summary['sheets'] = list(sheets)
+        return summary
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for summary in executor.map(run_sync, tasks):
+            table_summaries[summary['table']] = summary
+    
+    return table_summaries
+
+def ingest_changed_sheets(excel_file_path, base_table_name, max_workers=4, method="copy",
+                          chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False,
+                          schema_sample_rows=1000, schema_registry=None, partition_by_sheet=False):
+    """
+    Re-ingest only the sheets that changed since the last run, using the
+    ingest manifest (see ingest_manifest).
+    
+    Unchanged sheets are skipped without being parsed. A changed sheet
+    replaces its own source_sheet slice of the table it was loaded into
+    before (or its partition, when the table is partitioned); new sheets
+    are grouped by schema and get tables as usual. Sheets without data
+    rows are recorded in the manifest without a table.
+    
+    A changed sheet whose columns no longer fit its table (a new column,
+    or values of a type the column cannot hold) is not loaded: it is
+    reported as failed with the mismatching columns and stays out of the
+    manifest, so it is retried once the table has been migrated.
+    
+    Args:
+        excel_file_path (str): Path to the Excel file.
+        base_table_name (str): Base name for tables of new sheets.
+        max_workers (int): Maximum number of sheets loaded at once.
+        method (str): Load method for pg_bulk_load.load_data_to_db ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting a load.
+        schema_sample_rows (int): Rows per new sheet used to infer column types.
+        schema_registry: Registry shared by several workbooks (see
+            batch_ingest.SchemaRegistry) that gives new sheets their table;
+            the tables then have a source_file column.
+        partition_by_sheet (bool): Partition the tables created for new year
+            sheet groups (see create_tables_for_schema_groups).
+    
+    Returns:
+        dict: Dictionary mapping table names to their combined load summary.
+    """
+    manifest = ingest_manifest.read_manifest(excel_file_path)
+    workbook_hash, sheet_hashes, changed, unchanged = ingest_manifest.plan_ingest(excel_file_path, manifest)
+    ingest_manifest.record_unchanged_sheets(excel_file_path, unchanged, workbook_hash)
+    if not changed:
+        logging.info("Nothing to load: every sheet of %s is unchanged", excel_file_path)
+        return {}
+    
+    # Changed sheets go back to the table they were loaded into before (sheets that had no rows have none)
+    previous_tables = {sheet: entry['target_table'] for sheet, entry in manifest.items() if entry['target_table']}
+    sheet_tables = {sheet: previous_tables[sheet] for sheet in changed if sheet in previous_tables}
+    mismatches = {}
+    if sheet_tables:
+        mismatches = ingest_manifest.find_schema_mismatches(
+            group_sheets_by_schema(iter_sheet_rows(excel_file_path, sheet=list(sheet_tables),
+                                                   max_rows=schema_sample_rows)), sheet_tables)
+        for sheet, mismatch in mismatches.items():
+            logging.error("Sheet '%s' no longer fits table '%s' (%s); migrate the table to reload it",
+                          sheet, sheet_tables[sheet], mismatch)
+    
+    new_sheets = [sheet for sheet in changed if sheet not in previous_tables]
+    if new_sheets:
+        schema_groups = group_sheets_by_schema(iter_sheet_rows(excel_file_path, sheet=new_sheets,
+                                                               max_rows=schema_sample_rows))
+        grouped_sheets = {sheet for group_info in schema_groups.values() for sheet in group_info['sheets']}
+        ingest_manifest.record_sheets_without_rows(excel_file_path,
+                                                   [sheet for sheet in new_sheets if sheet not in grouped_sheets],
+                                                   workbook_hash, sheet_hashes)
+        if schema_registry is not None:
+            table_mapping = schema_registry.tables_for_groups(schema_groups)
+        else:
+            table_mapping = create_tables_for_schema_groups(schema_groups, base_table_name,
+                                                            partition_by_sheet=partition_by_sheet)
+        for schema_key, table_name in table_mapping.items():
+            for sheet in schema_groups[schema_key]['sheets']:
+                sheet_tables[sheet] = table_name
+    
+    def run_replace(sheet):
+        table_name = sheet_tables[sheet]
+        previous_table = previous_tables.get(sheet)
+        logging.info("Replacing sheet '%s' in table '%s'", sheet, table_name)
+        summary = ingest_manifest.replace_sheet(excel_file_path, sheet, table_name, workbook_hash,
+                                                sheet_hashes[sheet], previous_table=previous_table,
+                                                method=method, chunk_size=chunk_size,
+                                                isolate_bad_rows=isolate_bad_rows,
+                                                track_source_file=schema_registry is not None)
+        return [sheet], summary
+    
+    replaced = [sheet for sheet in changed if sheet in sheet_tables and sheet not in mismatches]
+    if isolate_bad_rows:
+        pg_bulk_load.create_quarantine_tables(sheet_tables[sheet] for sheet in replaced)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(run_replace, replaced))
+    results.extend(([sheet], {'table': sheet_tables[sheet], 'method': method, 'rows': 0, 'quarantined': 0,
+                              'seconds': 0.0, 'rows_per_sec': 0.0, 'success': False})
+                   for sheet in mismatches)
+    
+    return combine_load_summaries(results, time.perf_counter() - start_time, max_workers)
+
 # Example usage
 if __name__ == "__main__":
 
-    logging.basicConfig(filename='excel_to_dict.log', level=logging.DEBUG, filemode='w', format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Load the sheets of an Excel workbook into PostgreSQL.")
+    parser.add_argument("--clear-cache", action="store_true", help="delete the workbook cache before running")
+    parser.add_argument("--debug", action="store_true", help="log at DEBUG level (slows large loads)")
+    parser.add_argument("--report", default="run_report.json", help="JSON run report (default: %(default)s)")
+    parser.add_argument("--prometheus", help="also write the metrics in Prometheus text format to this file")
+    parser.add_argument("--profile", choices=instrumentation.PROFILERS, help="profile each stage")
+    parser.add_argument("--profile-dir", default="profiles", help="directory for profiles (default: %(default)s)")
+    parser.add_argument("--summary", action="store_true",
+                        help="print the sheets, their estimated sizes and headers without loading anything")
+    parser.add_argument("--chunk-size", type=int,
+                        help="bounded memory mode: stream every stage in chunks of this many rows per sheet")
+    parser.add_argument("--max-memory", type=float,
+                        help="bounded memory mode: stop the run once its RSS goes over this many MB")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename='excel_to_dict.log', level=logging.DEBUG if args.debug else logging.INFO, filemode='w',
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    metrics = instrumentation.start_run(profile=args.profile, profile_dir=args.profile_dir,
+                                        memory_limit_mb=args.max_memory)
 
     # Replace with your Excel file path
     excel_file_path = "/Users/tushartari/tushar/study/courses/IraSkills/work/JCB_DATA_PUNE_CLEANED.xlsx"
     output_json_file = "/Users/tushartari/tushar/study/courses/IraSkills/work/JCB_DATA_PUNE_CLEANED.json"
     
+    if args.summary:
+        # Reads only the workbook metadata and header rows, not the data
+        workbook_info = workbook_inspector.inspect_workbook(excel_file_path)
+        print_workbook_summary(workbook_info, workbook_inspector.header_groups(workbook_info))
+        raise SystemExit(0)
+    
+    # Stream rows from the workbook in read-only mode instead of loading every sheet into memory
+    streaming = True
+    # Bulk load each sheet with COPY instead of one INSERT per row
+    load_method = "copy"
+    # Quarantine bad rows in <table>_quarantine instead of aborting the whole table
+    isolate_bad_rows = True
+    # Number of tables loaded at the same time
+    load_workers = 4
+    # Rows per sheet used to infer column types when streaming
+    schema_sample_rows = 1000
+    # Skip sheets that are unchanged since the last run (see ingest_manifest)
+    incremental = True
+    # Overlap parsing, cleaning and DB writes in an asyncio pipeline (streaming only)
+    use_pipeline = False
+    # Reuse parsed sheets from the on-disk workbook cache when the file is unchanged (full loads without
+    # streaming only: incremental runs already skip unchanged workbooks, and streaming keeps no parsed sheets)
+    use_cache = True
+    # Create year sheet groups as tables LIST partitioned on source_sheet, one partition per year
+    partition_by_sheet = False
+    # Full loads go through UNLOGGED staging tables that are indexed and swapped into place afterwards
+    fast_load = False
+    # Indexes built on the loaded tables in fast_load mode, e.g. ["source_sheet", ("customer_name", "invoice_date")]
+    fast_load_indexes = ["source_sheet"]
+    # Full loads upsert the rows on a natural key instead of appending them (see pg_upsert)
+    sync = False
+    # Natural key of every table, or a dictionary of table name -> key columns
+    sync_key = ["invoice_no", "source_sheet"]
+    # In sync mode, also delete rows whose key is no longer in their sheet
+    sync_delete_missing = False
+    # Rows per chunk read, cleaned and loaded at a time
+    chunk_size = args.chunk_size or pg_bulk_load.DEFAULT_CHUNK_SIZE
+    
+    if args.chunk_size or args.max_memory:
+        # Bounded memory: every stage streams fixed-size chunks and one table is loaded at a time, so
+        # memory stays at a chunk or two whatever the workbook size. Schemas come from the header
+        # and a leading sample of at most one chunk per sheet.
+        streaming = True
+        use_cache = False
+        load_workers = 1
+        schema_sample_rows = min(schema_sample_rows, chunk_size)
+        logging.info("Bounded memory mode: %s rows per chunk, memory limit %s MB", chunk_size, args.max_memory)
+    
+    if args.clear_cache:
+        workbook_cache.clear_cache()
+    
     try:
-        # Read the Excel file and convert to dictionary
-        result = excel_to_dictionary(excel_file_path)
-        
-        #Print summary
-        #print_sheet_summary(result)
-        #Export to JSON file
-        #export_to_json(result, output_json_file)
-        
-        # Group sheets by schema structure
-        logging.info("Analyzing sheet structures...")
-        schema_groups = group_sheets_by_schema(result)
-        
-        logging.info("Found %s different schema groups:", len(schema_groups))
-        for i, (schema_key, group_info) in enumerate(schema_groups.items(), 1):
-            logging.info("Group %s: Sheets %s", i, group_info['sheets'])
-        
-        # Create tables for each schema group
+        # One connection pool is shared by all DDL and DML of this run
+        pg_dbconnect.create_pool()
         base_table_name = "invoice_data"
-        table_mapping = create_tables_for_schema_groups(schema_groups, base_table_name)
         
-        # Insert data into appropriate tables
-        for schema_key, group_info in schema_groups.items():
-            if schema_key in table_mapping:
-                table_name = table_mapping[schema_key]
-                group_data = group_info['data']
-                
-                logging.info("Inserting data for schema group with sheets: %s into table '%s'", 
-                           group_info['sheets'], table_name)
+        if incremental:
+            # Hash the sheets first and only parse and load the ones that changed
+            table_summaries = ingest_changed_sheets(excel_file_path, base_table_name, max_workers=load_workers,
+                                                    method=load_method, chunk_size=chunk_size,
+                                                    isolate_bad_rows=isolate_bad_rows,
+                                                    schema_sample_rows=schema_sample_rows,
+                                                    partition_by_sheet=partition_by_sheet)
+        elif streaming:
+            # Column types are inferred from a leading sample of each sheet
+            logging.info("Analyzing sheet structures...")
+            with instrumentation.stage("group"):
+                # Sheets without data rows are found from the workbook metadata and not opened at all
+                sheets = workbook_inspector.sheets_with_rows(workbook_inspector.inspect_workbook(excel_file_path,
+                                                                                                 read_headers=False))
+                schema_groups = group_sheets_by_schema(iter_sheet_rows(excel_file_path, sheet=sheets,
+                                                                       max_rows=schema_sample_rows))
+        else:
+            # Read the Excel file and convert to dictionary
+            # Column types are inferred while the rows are read
+            result = excel_to_dictionary(excel_file_path, as_table=True, infer_types=True, cache=use_cache)
+            
+            #Print summary
+            #print_sheet_summary(result)
+            #Export to JSON file
+            #export_to_json(result, output_json_file)
+            #Or stream the rows as compressed JSON Lines, one file per sheet
+            #export_to_json(iter_sheet_rows(excel_file_path), output_json_file + "l", format="jsonl", per_sheet=True, compression="gzip")
+            
+            # Group sheets by schema structure
+            logging.info("Analyzing sheet structures...")
+            with instrumentation.stage("group"):
+                schema_groups = group_sheets_by_schema(result)
+        
+        if not incremental:
+            logging.info("Found %s different schema groups:", len(schema_groups))
+            for i, (schema_key, group_info) in enumerate(schema_groups.items(), 1):
+                logging.info("Group %s: Sheets %s", i, group_info['sheets'])
+            
+            if sync:
+                # Stage the rows and apply them with one INSERT ... ON CONFLICT DO UPDATE per table
+                table_summaries = sync_schema_groups(schema_groups, base_table_name, sync_key,
+                                                     excel_file_path=excel_file_path if streaming else None,
+                                                     max_workers=load_workers, method=load_method,
+                                                     chunk_size=chunk_size, isolate_bad_rows=isolate_bad_rows,
+                                                     delete_missing=sync_delete_missing,
+                                                     partition_by_sheet=partition_by_sheet)
+            elif fast_load:
+                # Load UNLOGGED staging tables, then index, analyze and swap them into place
+                table_summaries = fast_load_schema_groups(schema_groups, base_table_name,
+                                                          excel_file_path=excel_file_path if streaming else None,
+                                                          max_workers=load_workers, method=load_method,
+                                                          chunk_size=chunk_size, isolate_bad_rows=isolate_bad_rows,
+                                                          indexes=fast_load_indexes,
+                                                          partition_by_sheet=partition_by_sheet)
+            else:
+                # Create tables for each schema group
+                with instrumentation.stage("create_tables"):
+                    table_mapping = create_tables_for_schema_groups(schema_groups, base_table_name,
+                                                                    partition_by_sheet=partition_by_sheet)
                 
-                if insert_data_to_db(group_data, table_name):
-                    logging.info("Data insertion completed successfully for table '%s'!", table_name)
+                if streaming and use_pipeline:
+                    # Read, clean and write at the same time, connected by bounded queues
+                    table_summaries = asyncio.run(async_pipeline.run_pipeline(
+                        excel_file_path, sheet_table_mapping(schema_groups, table_mapping),
+                        method=load_method, chunk_size=chunk_size, isolate_bad_rows=isolate_bad_rows))
                 else:
-                    logging.error("Data insertion completed with errors for table '%s'. Check the log for details.", table_name)
+                    # Load the tables concurrently, each load with its own pooled connection
+                    table_summaries = load_schema_groups(schema_groups, table_mapping,
+                                                         excel_file_path=excel_file_path if streaming else None,
+                                                         max_workers=load_workers, method=load_method,
+                                                         chunk_size=chunk_size, isolate_bad_rows=isolate_bad_rows)
+        
+        for table_name, table_summary in table_summaries.items():
+            if table_summary['success']:
+                logging.info("Data insertion completed successfully for table '%s'!", table_name)
             else:
-                logging.error("No table created for schema group with sheets: %s", group_info['sheets'])
+                logging.error("Data insertion completed with errors for table '%s'. Check the log for details.", table_name)
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
+    finally:
+        pg_dbconnect.close_pool()
+        logging.info("Peak RSS %s MB (limit %s MB)", instrumentation.peak_rss_mb(), args.max_memory)
+        metrics.write_report(args.report)
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
@@ -1,24 +1,56 @@
 import openpyxl
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import json
 import datetime
+import os
 import re
 import logging
+import instrumentation
+import xlsx_fast_reader
+import workbook_cache
+from sheet_table import SheetTable
+from type_inference import TypeInferencer
 
-def excel_to_dictionary(file_path):
+ENGINES = ("openpyxl", "xml")
+
+def excel_to_dictionary(file_path, parallel=False, workers=None, engine="openpyxl", as_table=False,
+                        infer_types=False, cache=False):
     """
     Read multiple sheets from an Excel file and create dictionaries
     using headers as keys and cell values as values for each row.
     
     Args:
         file_path (str): Path to the Excel file
+        parallel (bool): Parse the sheets in a process pool (see parallel_excel_to_dictionary)
+        workers (int): Number of worker processes when parallel (if None, uses the CPU count)
+        engine (str): "openpyxl", or "xml" to parse the worksheet XML directly
+            with xlsx_fast_reader (same output, no openpyxl cell objects)
+        as_table (bool): Store each sheet as a columnar SheetTable instead of
+            a list of row dictionaries
+        infer_types (bool): With as_table, infer the column types while the
+            rows are read (available as SheetTable.column_types)
+        cache (bool): Load the parsed sheets from the on-disk workbook cache,
+            parsing and storing them on a miss (see workbook_cache)
     
     Returns:
-        dict: Dictionary with sheet names as keys and list of row dictionaries as values
+        dict: Dictionary with sheet names as keys and list of row dictionaries
+            (or SheetTable) as values
     """
+    check_engine(engine)
+    if cache:
+        return cached_excel_to_dictionary(file_path, parallel=parallel, workers=workers, engine=engine,
+                                          as_table=as_table, infer_types=infer_types)
+    if parallel:
+        return parallel_excel_to_dictionary(file_path, workers=workers, engine=engine, as_table=as_table,
+                                            infer_types=infer_types)
+    if engine == "xml":
+        return xml_excel_to_dictionary(file_path, as_table=as_table, infer_types=infer_types)
     
     # Open the Excel workbook
-    workbook = openpyxl.load_workbook(file_path, data_only=True)
+    with instrumentation.stage("load_workbook", engine=engine) as stage_metrics:
+        workbook = openpyxl.load_workbook(file_path, data_only=True)
+        stage_metrics.add(bytes_read=os.path.getsize(file_path))
     
     # Dictionary to store all sheets data
     all_sheets_data = {}
@@ -32,50 +64,30 @@ def excel_to_dictionary(file_path):
     for sheet_name in sheet_names:
         logging.info("Processing sheet: %s", {sheet_name})
         
-        # Select the current sheet
-        worksheet = workbook[sheet_name]
-        
-        # Get the headers from the first row
-        headers = []
-        first_row = worksheet[1]  # First row (1-indexed)
-        
-        for cell in first_row:
-            # Normalize header names
-            normalized_header = normalize_headers(cell.value)
-            if normalized_header is not None:
-                headers.append(normalized_header.strip())
-            else:
-                headers.append(f"Column_{len(headers) + 1}")  # Default name for empty headers
-        
-        logging.info("Headers found: %s ", headers)
-        logging.info("Total number of columns in header:  %s", len(headers))
-        
-        # List to store dictionaries for each row
-        sheet_data = []
-        
-        # Iterate through rows starting from row 2 (skip header row)
-        for row_num, row in enumerate(worksheet.iter_rows(min_row=2, values_only=True), start=2):
-            # Skip completely empty rows
-            if all(cell is None or str(cell).strip() == '' for cell in row):
-                continue
+        with instrumentation.stage("parse", sheet=sheet_name, engine=engine) as stage_metrics:
+            # Select the current sheet
+            worksheet = workbook[sheet_name]
+            
+            # Get the headers from the first row
+            first_row = worksheet[1]  # First row (1-indexed)
+            headers = build_headers(cell.value for cell in first_row)
             
-            # Create dictionary for current row
-            row_dict = {}
+            logging.info("Headers found: %s ", headers)
+            logging.info("Total number of columns in header:  %s", len(headers))
             
-            # Iterate through each cell in the row
-            for col_index, cell_value in enumerate(row):
-                # Make sure we don't exceed the number of headers
-                if col_index < len(headers):
-                    header = headers[col_index]
-                    # Handle None values and convert to appropriate type
-                    if cell_value is None:
-                        row_dict[header] = ""
-                    else:
-                        row_dict[header] = cell_value
+            # List to store dictionaries for each row
+            sheet_data = new_sheet_table(headers, infer_types) if as_table else []
             
-            # Add the row dictionary to sheet data
-            sheet_data.append(row_dict)
-           # print(f"Row {row_num}: {row_dict}")
+            # Iterate through rows starting from row 2 (skip header row)
+            for row_num, row in enumerate(worksheet.iter_rows(min_row=2, values_only=True), start=2):
+                # Skip completely empty rows
+                if is_empty_row(row):
+                    continue
+                
+                # Add the row dictionary to sheet data
+                sheet_data.append(row if as_table else row_to_dict(headers, row))
+               # print(f"Row {row_num}: {row_dict}")
+            stage_metrics.add(rows=len(sheet_data))
         
         # Add sheet data to main dictionary
         all_sheets_data[sheet_name] = sheet_data
@@ -87,6 +99,443 @@ def excel_to_dictionary(file_path):
     return all_sheets_data
 
 
+# This function reads a workbook with the direct XML engine
+def xml_excel_to_dictionary(file_path, as_table=False, infer_types=False):
+    """
+    Read every sheet of an Excel file with xlsx_fast_reader instead of
+    openpyxl. The result is identical to excel_to_dictionary.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        as_table (bool): Store each sheet as a SheetTable
+        infer_types (bool): With as_table, infer the column types while reading
+    
+    Returns:
+        dict: Dictionary with sheet names as keys and list of row dictionaries as values
+    """
+    all_sheets_data = {}
+    
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        logging.debug('Found %s sheets %s:', len(reader.sheetnames), reader.sheetnames)
+        for sheet_name in reader.sheetnames:
+            with instrumentation.stage("parse", sheet=sheet_name, engine="xml") as stage_metrics:
+                headers, rows = collect_sheet_rows(reader.iter_rows(sheet_name))
+                all_sheets_data[sheet_name] = make_sheet_data(headers, rows, as_table, infer_types)
+                stage_metrics.add(rows=len(rows), bytes_read=reader.zip_file.getinfo(reader.sheet_paths[sheet_name]).file_size)
+            logging.info('Sheet %s processed: %s rows', sheet_name, len(rows))
+    
+    return all_sheets_data
+
+
+# This function parses the sheets of a workbook in parallel
+def parallel_excel_to_dictionary(file_path, workers=None, engine="openpyxl", as_table=False, infer_types=False):
+    """
+    Read every sheet of an Excel file in a process pool.
+    
+    Each worker opens the workbook in read-only mode itself and returns its
+    sheet as a compact batch of row tuples; the rows are turned into
+    dictionaries in the parent and merged back in sheet order, so the result
+    is identical to excel_to_dictionary.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        workers (int): Number of worker processes (if None, uses the CPU count)
+        engine (str): "openpyxl" or "xml", the reader used by the workers
+        as_table (bool): Store each sheet as a SheetTable
+        infer_types (bool): With as_table, infer the column types while building the tables
+    
+    Returns:
+        dict: Dictionary with sheet names as keys and list of row dictionaries as values
+    """
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        sheet_names = reader.sheetnames
+    
+    all_sheets_data = {}
+    for sheet_name, headers, rows in iter_sheet_batches(file_path, sheet_names, workers, engine):
+        all_sheets_data[sheet_name] = make_sheet_data(headers, rows, as_table, infer_types)
+        logging.info('Sheet %s processed: %s rows', sheet_name, len(rows))
+    
+    return all_sheets_data
+
+
+# This function reads a workbook through the parsed workbook cache
+def cached_excel_to_dictionary(file_path, parallel=False, workers=None, engine="openpyxl", as_table=False,
+                               infer_types=False):
+    """
+    Read every sheet of an Excel file from the workbook cache. On a miss the
+    sheets are parsed (in a process pool if parallel) and stored in the
+    cache for the next call. The result is identical to excel_to_dictionary.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        parallel (bool): Parse the sheets in a process pool on a cache miss
+        workers (int): Number of worker processes when parallel
+        engine (str): "openpyxl" or "xml", the reader used on a cache miss
+        as_table (bool): Store each sheet as a SheetTable
+        infer_types (bool): With as_table, infer the column types while building the tables
+    
+    Returns:
+        dict: Dictionary with sheet names as keys and list of row dictionaries as values
+    """
+    batches = workbook_cache.load_workbook(file_path)
+    if batches is None:
+        with xlsx_fast_reader.XlsxReader(file_path) as reader:
+            sheet_names = reader.sheetnames
+        batches = list(iter_sheet_batches(file_path, sheet_names, workers if parallel else 1, engine))
+        workbook_cache.store_workbook(file_path, batches)
+    
+    all_sheets_data = {}
+    for sheet_name, headers, rows in batches:
+        all_sheets_data[sheet_name] = make_sheet_data(headers, rows, as_table, infer_types)
+        logging.info('Sheet %s processed: %s rows', sheet_name, len(rows))
+    
+    return all_sheets_data
+
+
+def iter_sheet_batches(file_path, sheet_names, workers=None, engine="openpyxl"):
+    """
+    Read the given sheets with read_sheet_batch, in a process pool when
+    more than one worker is used.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_names (list): Names of the sheets to read
+        workers (int): Number of worker processes (if None, uses the CPU count)
+        engine (str): "openpyxl" or "xml"
+    
+    Yields:
+        tuple: (sheet_name, list of headers, list of row tuples) in sheet order
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(sheet_names)))
+    if workers == 1:
+        for sheet_name in sheet_names:
+            yield read_sheet_batch(file_path, sheet_name, engine)
+        return
+    
+    logging.info("Parsing %s sheets with %s worker processes", len(sheet_names), workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields results in submission order, which keeps the sheet order
+        yield from executor.map(read_sheet_batch, [file_path] * len(sheet_names), sheet_names,
+                                [engine] * len(sheet_names))
+
+
+def read_sheet_batch(file_path, sheet_name, engine="openpyxl"):
+    """
+    Read one sheet in read-only mode and return its headers and non-empty rows.
+    Runs in a worker process of parallel_excel_to_dictionary.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_name (str): Name of the sheet to read
+        engine (str): "openpyxl" or "xml"
+    
+    Returns:
+        tuple: (sheet_name, list of headers, list of row tuples)
+    """
+    if engine == "xml":
+        with xlsx_fast_reader.XlsxReader(file_path) as reader:
+            headers, rows = collect_sheet_rows(reader.iter_rows(sheet_name))
+        return sheet_name, headers, rows
+    
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name]
+        worksheet.reset_dimensions()
+        headers, rows = collect_sheet_rows(worksheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+    
+    return sheet_name, headers, rows
+
+
+def collect_sheet_rows(rows):
+    """
+    Collect the headers and non-empty data rows of a sheet from its raw rows.
+    
+    The column count is taken from the cells actually present rather than
+    the sheet's stored dimensions, as openpyxl does when it loads the
+    workbook in full mode, so the headers match excel_to_dictionary.
+    
+    Args:
+        rows (iterable): Row value tuples, starting with the header row
+    
+    Returns:
+        tuple: (list of headers, list of row tuples)
+    """
+    header_row = ()
+    # openpyxl gives even an empty sheet one column, so its header is Column_1
+    column_count = 1
+    data_rows = []
+    for row_num, row in enumerate(rows, start=1):
+        column_count = max(column_count, len(row))
+        if row_num == 1:
+            header_row = row
+        elif not is_empty_row(row):
+            data_rows.append(row)
+    
+    header_row = tuple(header_row) + (None,) * (column_count - len(header_row))
+    return build_headers(header_row), data_rows
+
+
+# This function streams the rows of a workbook one record at a time
+def iter_sheet_rows(file_path, sheet=None, max_rows=None, engine="openpyxl"):
+    """
+    Stream rows from an Excel file without loading the whole workbook.
+    
+    The workbook is opened in read-only mode, so only the row currently
+    being yielded is held in memory. Rows are built like the ones returned
+    by excel_to_dictionary, with one difference: a streamed sheet cannot be
+    scanned for its widest row before the first row is yielded, so the
+    header row is padded to the width of the sheet's stored dimension
+    instead. When a sheet's stored dimension is wider than its cells, the
+    rows get extra empty Column_<n> keys that excel_to_dictionary does not
+    produce.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        sheet (str or list): Sheet name, or list of sheet names, to read
+            (if None, reads every sheet in workbook order)
+        max_rows (int): Maximum number of data rows to yield per sheet
+            (if None, yields every row)
+        engine (str): "openpyxl", or "xml" to parse the worksheet XML directly
+    
+    Yields:
+        tuple: (sheet_name, row_dict) for each non-empty data row
+    """
+    check_engine(engine)
+    if engine == "xml":
+        yield from xml_iter_sheet_rows(file_path, sheet, max_rows)
+        return
+    
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    
+    try:
+        if sheet is None:
+            sheet_names = workbook.sheetnames
+        elif isinstance(sheet, str):
+            sheet_names = [sheet]
+        else:
+            sheet_names = list(sheet)
+        
+        for sheet_name in sheet_names:
+            logging.info("Streaming sheet: %s", sheet_name)
+            worksheet = workbook[sheet_name]
+            rows = worksheet.iter_rows(values_only=True)
+            
+            header_row = next(rows, None)
+            if header_row is None:
+                logging.warning("Sheet '%s' has no header row, skipping", sheet_name)
+                continue
+            headers = build_headers(header_row)
+            
+            row_count = 0
+            for row in rows:
+                if max_rows is not None and row_count >= max_rows:
+                    break
+                if is_empty_row(row):
+                    continue
+                row_count += 1
+                yield sheet_name, row_to_dict(headers, row)
+            
+            logging.info('Sheet %s streamed: %s rows', sheet_name, row_count)
+    finally:
+        workbook.close()
+
+
+def xml_iter_sheet_rows(file_path, sheet=None, max_rows=None):
+    """
+    Stream rows like iter_sheet_rows, using xlsx_fast_reader.
+    As in openpyxl's read-only mode, the header width comes from the sheet's
+    stored dimension when there is one.
+    """
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        if sheet is None:
+            sheet_names = reader.sheetnames
+        elif isinstance(sheet, str):
+            sheet_names = [sheet]
+        else:
+            sheet_names = list(sheet)
+        
+        for sheet_name in sheet_names:
+            logging.info("Streaming sheet: %s", sheet_name)
+            dimension = reader.dimension(sheet_name)
+            rows = reader.iter_rows(sheet_name)
+            
+            header_row = next(rows, None)
+            if header_row is None:
+                logging.warning("Sheet '%s' has no header row, skipping", sheet_name)
+                continue
+            if dimension is not None and dimension[3] > len(header_row):
+                header_row = tuple(header_row) + (None,) * (dimension[3] - len(header_row))
+            headers = build_headers(header_row)
+            
+            row_count = 0
+            for row in rows:
+                if max_rows is not None and row_count >= max_rows:
+                    break
+                if is_empty_row(row):
+                    continue
+                row_count += 1
+                yield sheet_name, row_to_dict(headers, row)
+            
+            logging.info('Sheet %s streamed: %s rows', sheet_name, row_count)
+
+
+# This function streams the raw value tuples of one sheet
+def iter_sheet_values(file_path, sheet_name, engine="openpyxl"):
+    """
+    Stream the raw row value tuples of one sheet in read-only mode, header
+    row first. Rows are not turned into dictionaries and empty rows are
+    not skipped. As in iter_sheet_rows, the header row is as wide as the
+    sheet's stored dimension.
+    
+    Args:
+        file_path (str): Path to the Excel file
+        sheet_name (str): Name of the sheet to read
+        engine (str): "openpyxl", or "xml" to parse the worksheet XML directly
+    
+    Yields:
+        tuple: Cell values of one row
+    """
+    check_engine(engine)
+    if engine == "xml":
+        with xlsx_fast_reader.XlsxReader(file_path) as reader:
+            dimension = reader.dimension(sheet_name)
+            rows = reader.iter_rows(sheet_name)
+            header_row = next(rows, None)
+            if header_row is None:
+                return
+            if dimension is not None and dimension[3] > len(header_row):
+                header_row = tuple(header_row) + (None,) * (dimension[3] - len(header_row))
+            yield header_row
+            yield from rows
+        return
+    
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from workbook[sheet_name].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+# This function groups a stream of (sheet_name, row) records into chunks
+def iter_sheet_chunks(records, chunk_size=10000):
+    """
+    Group a stream of (sheet_name, row) records into per-sheet chunks.
+    
+    Args:
+        records (iterable): (sheet_name, row_dict) records, e.g. from iter_sheet_rows
+        chunk_size (int): Maximum number of rows per chunk
+    
+    Yields:
+        tuple: (sheet_name, list of row dictionaries) with at most chunk_size rows
+    """
+    current_sheet = None
+    chunk = []
+    
+    for sheet_name, row in records:
+        if chunk and (sheet_name != current_sheet or len(chunk) >= chunk_size):
+            yield current_sheet, chunk
+            chunk = []
+        current_sheet = sheet_name
+        chunk.append(row)
+    
+    if chunk:
+        yield current_sheet, chunk
+
+
+def iter_records(data, skip_nulls=False):
+    """
+    Iterate over (sheet_name, row) records from either a sheet dictionary
+    (as returned by excel_to_dictionary) or a record stream (as yielded by
+    iter_sheet_rows).
+    
+    Args:
+        data (dict or iterable): Sheet dictionary or record stream
+        skip_nulls (bool): For SheetTable sheets, leave empty cells out of
+            the row dictionaries instead of using ""
+    
+    Yields:
+        tuple: (sheet_name, row_dict)
+    """
+    if isinstance(data, dict):
+        for sheet_name, rows in data.items():
+            if isinstance(rows, SheetTable):
+                rows = rows.iter_dicts(skip_nulls)
+            for row in rows:
+                yield sheet_name, row
+    else:
+        yield from data
+
+
+def make_sheet_data(headers, rows, as_table=False, infer_types=False):
+    """
+    Build the stored form of a sheet from its headers and row tuples:
+    a SheetTable, or a list of row dictionaries.
+    """
+    if as_table:
+        table = new_sheet_table(headers, infer_types)
+        for row in rows:
+            table.append(row)
+        return table
+    return [row_to_dict(headers, row) for row in rows]
+
+
+def new_sheet_table(headers, infer_types=False):
+    """
+    Create an empty SheetTable, with a TypeInferencer that is updated as rows
+    are appended when infer_types is set.
+    """
+    return SheetTable(headers, TypeInferencer(headers) if infer_types else None)
+
+
+def check_engine(engine):
+    """Raise ValueError for an unknown reader engine."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+
+def build_headers(header_values):
+    """
+    Build the list of column headers from the values of the header row.
+    Empty header cells get a default Column_<n> name.
+    """
+    headers = []
+    for value in header_values:
+        # Normalize header names
+        normalized_header = normalize_headers(value)
+        if normalized_header is not None:
+            headers.append(normalized_header.strip())
+        else:
+            headers.append(f"Column_{len(headers) + 1}")  # Default name for empty headers
+    return headers
+
+
+def is_empty_row(row):
+    """Return True if every cell in the row is None or blank."""
+    return all(cell is None or str(cell).strip() == '' for cell in row)
+
+
+def row_to_dict(headers, row):
+    """
+    Create the dictionary for a single row, keyed by header.
+    None values are stored as empty strings and cells missing at the end
+    of short rows are treated as None, so every row has every header.
+    """
+    row_dict = {}
+    row_length = len(row)
+    for col_index, header in enumerate(headers):
+        cell_value = row[col_index] if col_index < row_length else None
+        # Handle None values and convert to appropriate type
+        if cell_value is None:
+            row_dict[header] = ""
+        else:
+            row_dict[header] = cell_value
+    return row_dict
+
+
 def normalize_headers(headerString):
     # Replace sequences of space and/or hyphen with single underscore
     if headerString is None:
@@ -1,18 +1,61 @@
 from collections import defaultdict
+import gzip
 import json
 import datetime
 import logging
+import os
+import re
+from excel_to_dictionary import iter_records
+from sheet_table import SheetTable
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+FORMATS = ("pretty", "jsonl")
+
+# File name suffix added for each compression
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+# Serialized dates and times kept by the fast serializer; sheets repeat the same dates a lot
+SERIALIZER_MEMO_SIZE = 100000
 
 # exports the dictionary to a Json file
-def export_to_json(data_dict, output_file):
+def export_to_json(data_dict, output_file, format="pretty", per_sheet=False, compression=None):
     """
     Export the data dictionary to a JSON file.
     
+    A stream of (sheet_name, row) records (from iter_sheet_rows) can be
+    passed instead of a dictionary; it is written row by row so the whole
+    dataset never has to be held in memory. Sheets stored as SheetTable are
+    written the same way from their row views. The output has the same
+    {sheet_name: [rows]} structure in all cases.
+    
+    With format="jsonl" the rows are written as JSON Lines instead (see
+    export_to_jsonl).
+    
     Args:
-        data_dict (dict): The data dictionary to export.
-        output_file (str): The path to the output JSON file.
+        data_dict (dict or iterable): The data dictionary to export, or a
+            stream of (sheet_name, row) records.
+        output_file (str): The path to the output JSON file (a directory
+            when per_sheet is set).
+        format (str): "pretty" for the indented {sheet_name: [rows]} document,
+            "jsonl" for one JSON object per row.
+        per_sheet (bool): With "jsonl", write one file per sheet.
+        compression (str): None, "gzip" or "zstd".
+    
+    Returns:
+        dict: For "jsonl", the number of rows written per sheet; None otherwise.
     """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format '{format}', expected one of {FORMATS}")
+    if format == "jsonl":
+        return export_to_jsonl(data_dict, output_file, per_sheet=per_sheet, compression=compression)
+    if per_sheet:
+        raise ValueError("per_sheet export is only supported for the jsonl format")
     
+
     def json_serializer(obj):
         """JSON serializer for objects not serializable by default json code"""
         if isinstance(obj, (datetime.datetime, datetime.date)):
@@ -21,6 +64,188 @@ def export_to_json(data_dict, output_file):
             return obj.strftime('%H:%M:%S')
         raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
     
-    with open(output_file, 'w', encoding='utf-8') as json_file:
-        json.dump(data_dict, json_file, indent=4, ensure_ascii=False, default=json_serializer)
-    logging.info("Data exported to path : %s ", output_file)
\ No newline at end of file
+    with open_output(output_file, compression) as json_file:
+        if isinstance(data_dict, dict) and not any(isinstance(rows, SheetTable) for rows in data_dict.values()):
+            json.dump(data_dict, json_file, indent=4, ensure_ascii=False, default=json_serializer)
+        else:
+            write_records_as_json(iter_records(data_dict), json_file, json_serializer)
+    logging.info("Data exported to path : %s ", output_file)
+
+def write_records_as_json(records, json_file, serializer):
+    """
+    Write a stream of (sheet_name, row) records to an open file as a
+    {sheet_name: [rows]} JSON object, one row at a time.
+    
+    Args:
+        records (iterable): Stream of (sheet_name, row) records.
+        json_file (file): Open text file to write to.
+        serializer (callable): Fallback serializer for non-JSON types.
+    """
+    current_sheet = None
+    json_file.write("{")
+    
+    for sheet_name, row in records:
+        if sheet_name != current_sheet:
+            if current_sheet is not None:
+                json_file.write("\n    ],")
+            json_file.write(f"\n    {json.dumps(sheet_name, ensure_ascii=False)}: [")
+            current_sheet = sheet_name
+            separator = ""
+        row_json = json.dumps(row, indent=4, ensure_ascii=False, default=serializer)
+        json_file.write(separator + "\n        " + row_json.replace("\n", "\n        "))
+        separator = ","
+    
+    if current_sheet is not None:
+        json_file.write("\n    ]\n")
+    json_file.write("}")
+
+
+def open_output(output_file, compression=None):
+    """
+    Open a text file for writing, compressed with gzip or zstd if requested.
+    
+    Args:
+        output_file (str): The path to the output file.
+        compression (str): None, "gzip" or "zstd".
+    
+    Returns:
+        file: Open text file.
+    """
+    if compression is None:
+        return open(output_file, 'w', encoding='utf-8')
+    if compression == "gzip":
+        return gzip.open(output_file, 'wt', encoding='utf-8', compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+        return zstandard.open(output_file, 'w', encoding='utf-8')
+    raise ValueError(f"Unknown compression '{compression}', expected one of {list(COMPRESSION_SUFFIXES)}")
+
+def fast_json_serializer():
+    """
+    Build a JSON fallback serializer for dates and times that remembers the
+    values it has already converted, so repeated dates are formatted once.
+    The output matches the serializer of export_to_json.
+    
+    Returns:
+        callable: Serializer for the default= argument of json.JSONEncoder.
+    """
+    memo = {}
+    
+    def serialize(obj):
+        text = memo.get(obj)
+        if text is not None:
+            return text
+        obj_class = obj.__class__
+        if obj_class is datetime.datetime or obj_class is datetime.date:
+            text = obj.isoformat()
+        elif obj_class is datetime.time:
+            text = obj.strftime('%H:%M:%S')
+        elif isinstance(obj, (datetime.datetime, datetime.date)):
+            text = obj.isoformat()
+        else:
+            raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+        if len(memo) < SERIALIZER_MEMO_SIZE:
+            memo[obj] = text
+        return text
+    
+    return serialize
+
+def make_row_encoder():
+    """
+    Build one reusable compact JSON encoder for rows. Creating the encoder
+    once (instead of per json.dumps call) and skipping the circular
+    reference check makes row encoding about twice as fast.
+    
+    Returns:
+        callable: Function encoding one row dictionary to a JSON string.
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=False,
+                               default=fast_json_serializer())
+    return encoder.encode
+
+def sheet_file_name(sheet_name, compression=None):
+    """
+    Build the JSON Lines file name of a sheet, safe for any file system.
+    
+    Args:
+        sheet_name (str): Name of the sheet.
+        compression (str): None, "gzip" or "zstd".
+    
+    Returns:
+        str: File name such as "2019.jsonl.gz".
+    """
+    return safe_file_name(sheet_name) + ".jsonl" + COMPRESSION_SUFFIXES[compression]
+
+def safe_file_name(name):
+    """
+    Replace the characters of a sheet name that are not safe in file names.
+    
+    Args:
+        name (str): Sheet name.
+    
+    Returns:
+        str: Name with runs of other characters than letters, digits, "." and "-" replaced by "_".
+    """
+    return re.sub(r'[^\w.-]+', '_', name).strip('.') or "sheet"
+
+def export_to_jsonl(data, output_path, per_sheet=False, compression=None):
+    """
+    Export rows as JSON Lines, one JSON object per row, straight from a row
+    stream so memory use does not grow with the data.
+    
+    In a single file every row carries its sheet name in a source_sheet
+    field, like the rows loaded into the database. With per_sheet, each
+    sheet is written to its own file in the output_path directory; two
+    sheet names that give the same file name (such as "Sheet/2" and
+    "Sheet 2") raise a ValueError instead of overwriting each other.
+    
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+        output_path (str): Output file, or output directory when per_sheet is set.
+        per_sheet (bool): Write one file per sheet.
+        compression (str): None, "gzip" or "zstd".
+    
+    Returns:
+        dict: Dictionary with sheet names as keys and the number of rows written as values.
+    
+    Raises:
+        ValueError: If per_sheet is set and two sheets map to the same file name.
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {list(COMPRESSION_SUFFIXES)}")
+    encode_row = make_row_encoder()
+    row_counts = {}
+    open_files = {}
+    file_sheets = {}
+    
+    if per_sheet:
+        os.makedirs(output_path, exist_ok=True)
+    else:
+        open_files[None] = open_output(output_path, compression)
+    
+    try:
+        for sheet_name, row in iter_records(data):
+            if per_sheet:
+                output_file = open_files.get(sheet_name)
+                if output_file is None:
+                    file_name = sheet_file_name(sheet_name, compression)
+                    if file_name in file_sheets:
+                        raise ValueError(f"Sheets '{file_sheets[file_name]}' and '{sheet_name}' "
+                                         f"would both be written to {file_name}")
+                    file_sheets[file_name] = sheet_name
+                    output_file = open_files[sheet_name] = open_output(
+                        os.path.join(output_path, file_name), compression)
+            else:
+                output_file = open_files[None]
+                row = dict(row, source_sheet=sheet_name)
+            output_file.write(encode_row(row))
+            output_file.write("\n")
+            row_counts[sheet_name] = row_counts.get(sheet_name, 0) + 1
+    finally:
+        for output_file in open_files.values():
+            output_file.close()
+    
+    logging.info("Exported %s rows of %s sheets as JSON Lines to path : %s ",
+                 sum(row_counts.values()), len(row_counts), output_path)
+    return row_counts
@@ -1,19 +1,317 @@
-from openpyxl import load_workbook
+# File: importmulti_excel.py
+import argparse
 import csv
+import datetime
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-workbook = load_workbook('/Users/tushartari/tushar/study/courses/IraSkills/work/JCB_DATA_PUNE_CLEANED.xlsx',data_only=True)
-sheet_names = workbook.sheetnames
+import type_inference
+from excel_to_dictionary import ENGINES, build_headers, is_empty_row, iter_sheet_values
+from export_dict_to_json_file import safe_file_name
+from type_inference import TypeInferencer
+from xlsx_fast_reader import XlsxReader
 
-print(f"Total number of sheets: {len(sheet_names)}")
-for sheet_name in sheet_names:
-    print(f"Processing sheet: {sheet_name}")
-    worksheet = workbook[sheet_name]
-    
-    csv_file_path = f"{sheet_name}.csv"
-    with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only the parquet format needs pyarrow
+    pa = None
+
+FORMATS = ("csv", "parquet")
+
+DEFAULT_ROW_GROUP_SIZE = 100000
+DEFAULT_NAME_TEMPLATE = "{sheet}.{ext}"
+
+class SchemaConflict(Exception):
+    """Raised when a row group no longer fits the Parquet schema chosen from earlier rows."""
+
+def arrow_type(schema_type):
+    """
+    Get the Arrow type used in Parquet files for an inferred base type.
+    Decimal columns are written as float64, which analytics tools read fastest.
+    """
+    return {
+        type_inference.BOOLEAN: pa.bool_(),
+        type_inference.BIGINT: pa.int64(),
+        type_inference.DECIMAL: pa.float64(),
+        type_inference.DATE: pa.date32(),
+        type_inference.TIMESTAMP: pa.timestamp("us"),
+        type_inference.TIME: pa.time64("us"),
+    }.get(schema_type, pa.string())
+
+def coerce_value(value, schema_type):
+    """
+    Convert a cell value to the Python type expected by its Parquet column.
+    Blank strings are nulls in every column except text columns.
+    """
+    if value is None:
+        return None
+    if schema_type == type_inference.TEXT:
+        return value if value.__class__ is str else str(value)
+    if value.__class__ is str:
+        # Only blank strings reach a typed (or so far empty) column
+        return None
+    if schema_type == type_inference.DATE and isinstance(value, datetime.datetime):
+        return value.date()
+    if schema_type == type_inference.TIMESTAMP and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+def build_output_path(output_dir, name_template, file_path, sheet_name, sheet_index, format):
+    """
+    Build the output file path of a sheet from the name template.
+
+    The template can use {workbook} (file name without extension), {sheet}
+    (sheet name made safe for file names), {index} (1-based sheet position)
+    and {ext} (csv or parquet).
+
+    Returns:
+        str: The output file path.
+    """
+    file_name = name_template.format(
+        workbook=os.path.splitext(os.path.basename(file_path))[0],
+        sheet=safe_file_name(sheet_name),
+        index=sheet_index,
+        ext=format,
+    )
+    return os.path.join(output_dir, file_name)
+
+def export_sheet_to_csv(file_path, sheet_name, output_path, engine="openpyxl"):
+    """
+    Stream one sheet to a CSV file, header row first. Empty rows are skipped.
+
+    Returns:
+        int: Number of data rows written.
+    """
+    row_count = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as csv_file:
         csv_writer = csv.writer(csv_file)
-    
-        for row in worksheet.iter_rows(values_only=True):
+        rows = iter_sheet_values(file_path, sheet_name, engine)
+        header_row = next(rows, None)
+        if header_row is None:
+            return 0
+        csv_writer.writerow(header_row)
+        for row in rows:
+            if is_empty_row(row):
+                continue
             csv_writer.writerow(row)
-    
-    print(f"Data from sheet '{sheet_name}' has been written to {csv_file_path}")
\ No newline at end of file
+            row_count += 1
+    return row_count
+
+def iter_row_groups(file_path, sheet_name, row_group_size, engine="openpyxl"):
+    """
+    Stream the headers and then the non-empty data rows of a sheet in groups
+    of row_group_size rows.
+
+    Yields:
+        list: The headers first, then lists of row tuples.
+    """
+    rows = iter_sheet_values(file_path, sheet_name, engine)
+    header_row = next(rows, None)
+    if header_row is None:
+        return
+    yield build_headers(header_row)
+
+    row_group = []
+    for row in rows:
+        if is_empty_row(row):
+            continue
+        row_group.append(row)
+        if len(row_group) >= row_group_size:
+            yield row_group
+            row_group = []
+    if row_group:
+        yield row_group
+
+def unique_column_names(headers):
+    """
+    Make header names unique for the Parquet schema by numbering repeats ("Amount", "Amount_2").
+    """
+    names = []
+    for header in headers:
+        name, number = header, 1
+        while name in names:
+            number += 1
+            name = f"{header}_{number}"
+        names.append(name)
+    return names
+
+def write_parquet_sheet(file_path, sheet_name, output_path, row_group_size, engine, column_types=None):
+    """
+    Write one sheet as a Parquet file, one row group at a time.
+
+    The schema is fixed by the types inferred from the first row group,
+    joined with column_types (from an earlier attempt) if given. Type
+    inference carries on over every later row; a row group whose values
+    widen a column's type raises SchemaConflict with the widened types.
+
+    Returns:
+        int: Number of data rows written.
+
+    Raises:
+        SchemaConflict: With the TypeInferencer of the rows read so far.
+    """
+    row_groups = iter_row_groups(file_path, sheet_name, row_group_size, engine)
+    headers = next(row_groups, None)
+    if headers is None:
+        return 0
+    # Columns are tracked by position, as headers can repeat
+    positions = list(range(len(headers)))
+    inferencer = TypeInferencer(positions)
+    schema_types = None
+    writer = None
+    row_count = 0
+
+    try:
+        for row_group in row_groups:
+            for row in row_group:
+                inferencer.update_values(positions, row)
+            current_types = [state.base_type for _, state in inferencer.column_types()]
+
+            if schema_types is None:
+                schema_types = current_types
+                if column_types is not None:
+                    schema_types = [type_inference.join_types(state.base_type, current)
+                                    for (_, state), current in zip(column_types.column_types(), current_types)]
+                schema = pa.schema([(name, arrow_type(schema_type))
+                                    for name, schema_type in zip(unique_column_names(headers), schema_types)])
+                writer = pq.ParquetWriter(output_path, schema, compression="snappy")
+            elif any(type_inference.join_types(fixed, current) != fixed
+                     for fixed, current in zip(schema_types, current_types)):
+                raise SchemaConflict(inferencer)
+
+            columns = []
+            for col_index, schema_type in enumerate(schema_types):
+                values = [coerce_value(row[col_index] if col_index < len(row) else None, schema_type)
+                          for row in row_group]
+                columns.append(pa.array(values, type=writer.schema.field(col_index).type))
+            writer.write_table(pa.Table.from_arrays(columns, schema=writer.schema), row_group_size=row_group_size)
+            row_count += len(row_group)
+
+        if writer is None:
+            # A sheet with headers only still gets a file, with text columns
+            writer = pq.ParquetWriter(output_path, pa.schema([(name, pa.string())
+                                                              for name in unique_column_names(headers)]))
+    finally:
+        if writer is not None:
+            writer.close()
+    return row_count
+
+def export_sheet_to_parquet(file_path, sheet_name, output_path, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                            engine="openpyxl"):
+    """
+    Stream one sheet to a Parquet file with column types from type inference.
+    Only one row group is held in memory at a time. If a later row group
+    widens a column's type, the sheet is written again with the wider types.
+
+    Returns:
+        int: Number of data rows written.
+    """
+    if pa is None:
+        raise ImportError("Parquet export needs the pyarrow package (pip install pyarrow)")
+    column_types = None
+    while True:
+        try:
+            return write_parquet_sheet(file_path, sheet_name, output_path, row_group_size, engine, column_types)
+        except SchemaConflict as conflict:
+            column_types = conflict.args[0]
+            logging.info("Column types of sheet '%s' widened after the first row group, rewriting %s",
+                         sheet_name, output_path)
+
+def export_sheet(file_path, sheet_name, output_path, format="csv", row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                 engine="openpyxl"):
+    """
+    Export one sheet to a CSV or Parquet file. Runs in a worker process of export_workbook.
+
+    Returns:
+        dict: Export summary with sheet, path, rows and seconds.
+    """
+    start_time = time.perf_counter()
+    if format == "parquet":
+        row_count = export_sheet_to_parquet(file_path, sheet_name, output_path, row_group_size, engine)
+    else:
+        row_count = export_sheet_to_csv(file_path, sheet_name, output_path, engine)
+    seconds = time.perf_counter() - start_time
+    logging.info("Data from sheet '%s' has been written to %s: %s rows in %.2fs",
+                 sheet_name, output_path, row_count, seconds)
+    return {'sheet': sheet_name, 'path': output_path, 'rows': row_count, 'seconds': seconds}
+
+def export_workbook(file_path, output_dir=".", format="csv", sheets=None, name_template=DEFAULT_NAME_TEMPLATE,
+                    workers=None, row_group_size=DEFAULT_ROW_GROUP_SIZE, engine="openpyxl"):
+    """
+    Export the sheets of a workbook to one CSV or Parquet file each.
+
+    Sheets are streamed in read-only mode and exported in parallel worker
+    processes, so memory use is bounded by one row group per worker.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        output_dir (str): Directory for the output files.
+        format (str): "csv" or "parquet".
+        sheets (list): Names of the sheets to export (if None, exports every sheet).
+        name_template (str): Output file name template, see build_output_path.
+        workers (int): Number of worker processes (if None, uses the CPU count).
+        row_group_size (int): Rows per Parquet row group.
+        engine (str): "openpyxl", or "xml" to parse the worksheet XML directly.
+
+    Returns:
+        list: Export summaries (sheet, path, rows, seconds) in sheet order.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format '{format}', expected one of {FORMATS}")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+    with XlsxReader(file_path) as reader:
+        sheet_names = reader.sheetnames
+    if sheets is not None:
+        missing = [sheet for sheet in sheets if sheet not in sheet_names]
+        if missing:
+            raise ValueError(f"Sheets not found in {file_path}: {missing}")
+        sheet_names = [sheet for sheet in sheet_names if sheet in sheets]
+    if not sheet_names:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_paths = [build_output_path(output_dir, name_template, file_path, sheet_name, index, format)
+                    for index, sheet_name in enumerate(sheet_names, 1)]
+    if len(set(output_paths)) != len(output_paths):
+        raise ValueError(f"Name template '{name_template}' gives several sheets the same file name")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(sheet_names)))
+    count = len(sheet_names)
+    logging.info("Exporting %s sheets of %s with %s workers", count, file_path, workers)
+
+    if workers == 1:
+        return [export_sheet(file_path, sheet_name, output_path, format, row_group_size, engine)
+                for sheet_name, output_path in zip(sheet_names, output_paths)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(export_sheet, [file_path] * count, sheet_names, output_paths,
+                                 [format] * count, [row_group_size] * count, [engine] * count))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the sheets of an Excel workbook to CSV or Parquet files.")
+    parser.add_argument("file_path", help="path to the Excel file")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="csv", help="output format (default: csv)")
+    parser.add_argument("-o", "--output-dir", default=".", help="output directory (default: current directory)")
+    parser.add_argument("-s", "--sheet", action="append", dest="sheets",
+                        help="sheet to export, can be repeated (default: every sheet)")
+    parser.add_argument("-n", "--name", default=DEFAULT_NAME_TEMPLATE,
+                        help="file name template with {workbook}, {sheet}, {index} and {ext} (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="rows per Parquet row group (default: %(default)s)")
+    parser.add_argument("--engine", choices=ENGINES, default="openpyxl", help="workbook reader (default: openpyxl)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    summaries = export_workbook(args.file_path, output_dir=args.output_dir, format=args.format, sheets=args.sheets,
+                                name_template=args.name, workers=args.workers,
+                                row_group_size=args.row_group_size, engine=args.engine)
+    print(f"Total number of sheets: {len(summaries)}")
+    for summary in summaries:
+        print(f"Data from sheet '{summary['sheet']}' has been written to {summary['path']} ({summary['rows']} rows)")
@@ -0,0 +1,437 @@
+# File: ingest_manifest.py
+import hashlib
+import logging
+import os
+import re
+
+import instrumentation
+import pg_bulk_load
+import pg_partitions
+import pg_dbconnect
+import type_inference
+import xlsx_fast_reader
+from excel_to_dictionary import iter_sheet_rows
+
+MANIFEST_TABLE = "ingest_manifest"
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# information_schema data types each inferred base type can be loaded into; text columns take anything
+TEXT_DATA_TYPES = ("text", "character varying")
+COMPATIBLE_DATA_TYPES = {
+    type_inference.BOOLEAN: ("boolean",),
+    type_inference.BIGINT: ("bigint", "integer", "smallint", "numeric", "double precision", "real"),
+    type_inference.DECIMAL: ("numeric", "double precision", "real"),
+    type_inference.DATE: ("date", "timestamp without time zone"),
+    type_inference.TIMESTAMP: ("timestamp without time zone",),
+    type_inference.TIME: ("time without time zone",),
+}
+
+# A shared string cell and its index into the shared string table
+SHARED_STRING_CELL_RE = re.compile(rb'(<c\b[^>]*\bt="s"[^>]*>\s*<v>)(\d+)(</v>)')
+ROW_END = b"</row>"
+
+def source_key(file_path):
+    """
+    Get the key a workbook is recorded under in the manifest.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        str: The absolute path of the file.
+    """
+    return os.path.abspath(file_path)
+
+def hash_workbook(file_path):
+    """
+    Hash the bytes of a whole workbook file.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        str: SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as workbook_file:
+        for block in iter(lambda: workbook_file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_sheet(reader, sheet_name):
+    """
+    Hash the content of one sheet without parsing its rows.
+
+    The worksheet XML is hashed with every shared string index replaced by
+    the string itself, so the hash does not change when edits to other
+    sheets renumber the shared string table. The date system and the date
+    styles are included as they decide how numbers are read.
+
+    Args:
+        reader (XlsxReader): Open reader of the workbook.
+        sheet_name (str): Name of the sheet to hash.
+
+    Returns:
+        str: SHA-256 hex digest of the sheet content.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((reader.epoch, sorted(reader.date_styles), sorted(reader.timedelta_styles))).encode())
+
+    def resolve_shared_string(match):
+        text = reader.shared_string(int(match.group(2))).encode("utf-8")
+        return match.group(1) + text + match.group(3)
+
+    pending = b""
+    with reader.zip_file.open(reader.sheet_paths[sheet_name]) as sheet_file:
+        for block in iter(lambda: sheet_file.read(HASH_BLOCK_SIZE), b""):
+            pending += block
+            # Only substitute up to the last complete row so no cell is split between blocks
+            cut = pending.rfind(ROW_END)
+            if cut < 0:
+                continue
+            cut += len(ROW_END)
+            digest.update(SHARED_STRING_CELL_RE.sub(resolve_shared_string, pending[:cut]))
+            pending = pending[cut:]
+    digest.update(SHARED_STRING_CELL_RE.sub(resolve_shared_string, pending))
+    return digest.hexdigest()
+
+def hash_sheets(file_path, sheets=None):
+    """
+    Hash every sheet of a workbook (or the given sheets).
+
+    Args:
+        file_path (str): Path to the Excel file.
+        sheets (list): Names of the sheets to hash (if None, hashes every sheet).
+
+    Returns:
+        dict: Dictionary with sheet names as keys and hex digests as values.
+    """
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        sheet_names = reader.sheetnames if sheets is None else sheets
+        sheet_hashes = {}
+        for sheet_name in sheet_names:
+            with instrumentation.stage("hash", sheet=sheet_name) as stage_metrics:
+                sheet_hashes[sheet_name] = hash_sheet(reader, sheet_name)
+                stage_metrics.add(bytes_read=reader.zip_file.getinfo(reader.sheet_paths[sheet_name]).file_size)
+        return sheet_hashes
+
+def create_manifest_table(cursor):
+    """
+    Create the ingest_manifest table if it does not exist.
+
+    Args:
+        cursor: Database cursor.
+    """
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+    source_file TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    workbook_hash TEXT NOT NULL,
+    sheet_hash TEXT NOT NULL,
+    target_table TEXT NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    loaded_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (source_file, sheet_name)
+);""")
+
+def read_manifest(file_path):
+    """
+    Read the manifest entries recorded for a workbook.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        dict: Dictionary with sheet names as keys and entry dictionaries
+            (workbook_hash, sheet_hash, target_table, row_count) as values.
+    """
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            create_manifest_table(cursor)
+            cursor.execute(f"SELECT sheet_name, workbook_hash, sheet_hash, target_table, row_count "
+                           f"FROM {MANIFEST_TABLE} WHERE source_file = %s", (source_key(file_path),))
+            entries = {
+                sheet_name: {'workbook_hash': workbook_hash, 'sheet_hash': sheet_hash,
+                             'target_table': target_table, 'row_count': row_count}
+                for sheet_name, workbook_hash, sheet_hash, target_table, row_count in cursor.fetchall()
+            }
+            conn.commit()
+        finally:
+            cursor.close()
+    return entries
+
+def plan_ingest(file_path, manifest):
+    """
+    Compare a workbook with its manifest entries.
+
+    When the whole file is unchanged and every one of its sheets has an
+    entry, no sheet is hashed at all; otherwise each sheet is hashed and
+    compared with its recorded hash. A sheet whose last load failed has no
+    entry, so it is always planned again.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        manifest (dict): Entries returned by read_manifest.
+
+    Returns:
+        tuple: (workbook hash, dict of sheet hashes, list of changed or new
+            sheet names, list of unchanged sheet names)
+    """
+    workbook_hash = hash_workbook(file_path)
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        sheet_names = reader.sheetnames
+    if all(sheet_name in manifest and manifest[sheet_name]['workbook_hash'] == workbook_hash
+           for sheet_name in sheet_names):
+        logging.info("Workbook %s is unchanged since the last run", file_path)
+        sheet_hashes = {sheet_name: manifest[sheet_name]['sheet_hash'] for sheet_name in sheet_names}
+        return workbook_hash, sheet_hashes, [], list(sheet_names)
+
+    sheet_hashes = hash_sheets(file_path)
+    changed, unchanged = [], []
+    for sheet_name, sheet_hash in sheet_hashes.items():
+        entry = manifest.get(sheet_name)
+        if entry is not None and entry['sheet_hash'] == sheet_hash:
+            unchanged.append(sheet_name)
+        else:
+            changed.append(sheet_name)
+
+    for sheet_name in manifest:
+        if sheet_name not in sheet_hashes:
+            logging.warning("Sheet '%s' is no longer in %s; its rows are left in table '%s'",
+                            sheet_name, file_path, manifest[sheet_name]['target_table'])
+    logging.info("Sheets changed since the last run: %s, unchanged: %s", changed, unchanged)
+    return workbook_hash, sheet_hashes, changed, unchanged
+
+def missing_sheets(file_path):
+    """
+    Get the sheets of a workbook that have no manifest entry: sheets that
+    were never loaded, or whose last load failed.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        list: Sheet names in workbook order.
+    """
+    manifest = read_manifest(file_path)
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        return [sheet_name for sheet_name in reader.sheetnames if sheet_name not in manifest]
+
+def record_sheet(cursor, file_path, sheet_name, workbook_hash, sheet_hash, target_table, row_count):
+    """
+    Insert or update the manifest entry of one sheet.
+
+    Args:
+        cursor: Database cursor.
+        file_path (str): Path to the Excel file.
+        sheet_name (str): Name of the sheet.
+        workbook_hash (str): Hash of the workbook file.
+        sheet_hash (str): Hash of the sheet content.
+        target_table (str): Table the sheet was loaded into.
+        row_count (int): Number of rows loaded.
+    """
+    cursor.execute(f"""INSERT INTO {MANIFEST_TABLE}
+    (source_file, sheet_name, workbook_hash, sheet_hash, target_table, row_count, loaded_at)
+VALUES (%s, %s, %s, %s, %s, %s, now())
+ON CONFLICT (source_file, sheet_name) DO UPDATE SET
+    workbook_hash = EXCLUDED.workbook_hash,
+    sheet_hash = EXCLUDED.sheet_hash,
+    target_table = EXCLUDED.target_table,
+    row_count = EXCLUDED.row_count,
+    loaded_at = EXCLUDED.loaded_at""",
+                   (source_key(file_path), sheet_name, workbook_hash, sheet_hash, target_table, row_count))
+
+def record_unchanged_sheets(file_path, sheet_names, workbook_hash):
+    """
+    Store the new workbook hash for sheets whose content did not change,
+    so the next run of the same file can skip hashing the sheets.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        sheet_names (list): Names of the unchanged sheets.
+        workbook_hash (str): Hash of the workbook file.
+    """
+    if not sheet_names:
+        return
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"UPDATE {MANIFEST_TABLE} SET workbook_hash = %s "
+                           f"WHERE source_file = %s AND sheet_name = ANY(%s)",
+                           (workbook_hash, source_key(file_path), list(sheet_names)))
+            conn.commit()
+        except Exception as e:
+            logging.error("Updating the manifest of %s failed: %s", file_path, e)
+            conn.rollback()
+        finally:
+            cursor.close()
+
+def record_sheets_without_rows(file_path, sheet_names, workbook_hash, sheet_hashes):
+    """
+    Record sheets that have no data rows, so they count as loaded (into no
+    table) and an unchanged workbook can skip hashing its sheets. Their
+    entries have an empty target_table and are planned like new sheets
+    once they get rows.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        sheet_names (list): Names of the sheets without data rows.
+        workbook_hash (str): Hash of the workbook file.
+        sheet_hashes (dict): Hash of each sheet, from plan_ingest.
+    """
+    if not sheet_names:
+        return
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for sheet_name in sheet_names:
+                record_sheet(cursor, file_path, sheet_name, workbook_hash, sheet_hashes[sheet_name], "", 0)
+            conn.commit()
+        except Exception as e:
+            logging.error("Recording the empty sheets of %s failed: %s", file_path, e)
+            conn.rollback()
+        finally:
+            cursor.close()
+
+def table_data_types(cursor, table_name):
+    """
+    Get the columns of a table with their information_schema data types.
+
+    Args:
+        cursor: psycopg2 cursor.
+        table_name (str): Name of the table in the current schema.
+
+    Returns:
+        dict: Column name -> data type, empty if the table does not exist.
+    """
+    cursor.execute("SELECT column_name, data_type FROM information_schema.columns "
+                   "WHERE table_schema = current_schema() AND table_name = %s", (table_name,))
+    return dict(cursor.fetchall())
+
+def schema_mismatch(schema, data_types):
+    """
+    Describe why rows of a sheet schema cannot be loaded into a table.
+
+    Args:
+        schema (tuple): (SQL column name, base type) pairs of the sheet.
+        data_types (dict): Column name -> data type of the table, from table_data_types.
+
+    Returns:
+        str: Description of the missing and incompatible columns, or None if the sheet fits.
+    """
+    missing = [column for column, _ in schema if column not in data_types]
+    incompatible = [f"{column} ({base_type} into {data_types[column]})" for column, base_type in schema
+                    if column in data_types and base_type != type_inference.NULL
+                    and data_types[column] not in TEXT_DATA_TYPES
+                    and data_types[column] not in COMPATIBLE_DATA_TYPES.get(base_type, ())]
+    problems = []
+    if missing:
+        problems.append(f"columns not in the table: {', '.join(missing)}")
+    if incompatible:
+        problems.append(f"incompatible columns: {', '.join(incompatible)}")
+    return "; ".join(problems) or None
+
+def find_schema_mismatches(schema_groups, sheet_tables):
+    """
+    Check that changed sheets still fit the tables they were loaded into.
+
+    Args:
+        schema_groups (dict): Schema groups of the sheets, from group_sheets_by_schema.
+        sheet_tables (dict): Sheet name -> table it is loaded into.
+
+    Returns:
+        dict: Sheet name -> description of the mismatch, for the sheets that no longer fit.
+    """
+    mismatches = {}
+    table_types = {}
+    with pg_dbconnect.pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            for group_info in schema_groups.values():
+                for sheet in group_info['sheets']:
+                    table_name = sheet_tables[sheet]
+                    if table_name not in table_types:
+                        table_types[table_name] = table_data_types(cursor, table_name)
+                    mismatch = schema_mismatch(group_info['schema'], table_types[table_name])
+                    if mismatch:
+                        mismatches[sheet] = mismatch
+        conn.rollback()
+    return mismatches
+
+def replace_sheet(file_path, sheet_name, table_name, workbook_hash, sheet_hash, previous_table=None,
+                  method="copy", chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False,
+                  track_source_file=False):
+    """
+    Replace the source_sheet slice of a table with the current rows of a sheet.
+
+    The old rows are deleted, the sheet is re-streamed and loaded, and the
+    manifest entry is updated in one transaction, so a failed load leaves
+    both the table and the manifest as they were.
+
+    When the table is partitioned by source_sheet, nothing is deleted: the
+    sheet is loaded into a staging table that is then swapped in as its
+    partition (see pg_partitions.swap_partition). The empty staging table
+    is committed before the load, so the transaction only locks the parent
+    for the swap, and concurrent swaps into the same parent wait for each
+    other instead of deadlocking.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        sheet_name (str): Name of the sheet to load.
+        table_name (str): Table to load the sheet into.
+        workbook_hash (str): Hash of the workbook file.
+        sheet_hash (str): Hash of the sheet content.
+        previous_table (str): Table the sheet was loaded into last time, if different.
+        method (str): Load method for pg_bulk_load.load_data_to_db ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting the load.
+        track_source_file (bool): The table holds sheets of several workbooks in
+            a source_file column; the slice is then (source_file, source_sheet).
+
+    Returns:
+        dict: Load summary from pg_bulk_load.load_data_to_db.
+    """
+    source_file = source_key(file_path) if track_source_file else None
+    slice_filter, slice_params = "source_sheet = %s", (sheet_name,)
+    if track_source_file:
+        slice_filter, slice_params = "source_file = %s AND source_sheet = %s", (source_file, sheet_name)
+
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # A partition holds exactly one sheet unless several workbooks share the table
+            swap = (not track_source_file and previous_table in (None, table_name)
+                    and pg_partitions.is_partitioned_table(cursor, table_name))
+            load_table = table_name
+            if swap:
+                load_table = pg_partitions.create_staging_partition(cursor, table_name, sheet_name)
+                # Release the parent lock taken by CREATE TABLE ... LIKE; a failed load leaves an empty
+                # staging table that the next attempt drops
+                conn.commit()
+            else:
+                for slice_table in {table_name, previous_table or table_name}:
+                    cursor.execute(f"DELETE FROM {slice_table} WHERE {slice_filter}", slice_params)
+                    logging.info("Deleted %s old rows of sheet '%s' from table '%s'", cursor.rowcount, sheet_name, slice_table)
+
+            with instrumentation.stage("replace_sheet", sheet=sheet_name, table=table_name) as stage_metrics:
+                summary = pg_bulk_load.load_data_to_db(iter_sheet_rows(file_path, sheet=[sheet_name]), load_table,
+                                                       method=method, chunk_size=chunk_size,
+                                                       isolate_bad_rows=isolate_bad_rows, conn=conn,
+                                                       source_file=source_file)
+                stage_metrics.add(rows=summary['rows'])
+            if summary['success'] and swap:
+                pg_partitions.swap_partition(cursor, table_name, sheet_name, load_table)
+                summary['table'] = table_name
+            if summary['success']:
+                record_sheet(cursor, file_path, sheet_name, workbook_hash, sheet_hash, table_name, summary['rows'])
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception as e:
+            logging.error("Replacing sheet '%s' in table '%s' failed: %s", sheet_name, table_name, e)
+            conn.rollback()
+            summary = {'table': table_name, 'method': method, 'rows': 0, 'quarantined': 0,
+                       'seconds': 0.0, 'rows_per_sec': 0.0, 'success': False}
+        finally:
+            cursor.close()
+    return summary
@@ -0,0 +1,365 @@
+# File: instrumentation.py
+import collections
+import contextlib
+import cProfile
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory is then not reported
+    resource = None
+
+PROFILERS = ("cprofile", "sampling")
+
+# Seconds between two stack samples of the sampling profiler
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Prefix of every metric name in the Prometheus output
+METRIC_PREFIX = "excel_ingest"
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB.
+
+    Returns:
+        float: Peak RSS in MB, or None where the resource module is missing.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def current_rss_mb():
+    """
+    Current resident set size of this process, in MB.
+
+    Returns:
+        float: RSS in MB read from /proc, the peak RSS where /proc is missing,
+            or None where neither is available.
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+class MemoryLimitExceeded(RuntimeError):
+    """Raised by check_memory when the process uses more memory than the run allows."""
+
+class StageMetrics:
+    """
+    Measurements of one run of a stage: wall time, rows, bytes read and
+    memory. Rows and bytes are added by the code running the stage.
+    """
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.rows = 0
+        self.bytes_read = 0
+        self.seconds = 0.0
+        self.peak_rss_mb = None
+        self.rss_growth_mb = None
+        self.error = None
+
+    def add(self, rows=0, bytes_read=0):
+        """Count rows processed and bytes read by the stage."""
+        self.rows += rows
+        self.bytes_read += bytes_read
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self):
+        return {"stage": self.name, "labels": self.labels, "seconds": round(self.seconds, 6), "rows": self.rows,
+                "rows_per_sec": round(self.rows_per_sec, 1), "bytes_read": self.bytes_read,
+                "peak_rss_mb": self.peak_rss_mb, "rss_growth_mb": self.rss_growth_mb, "error": self.error}
+
+class SamplingProfiler:
+    """
+    Statistical profiler of one thread: a background thread records the
+    thread's call stack every interval seconds. Much cheaper than cProfile
+    on hot loops; the output is in the folded format read by flamegraph
+    tools (one "outer;inner count" line per stack).
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as profile_file:
+            for stack, count in self.stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+class RunMetrics:
+    """
+    Metrics of one run: a record per stage (and per sheet or table) plus
+    aggregated counters. Thread safe, so loads running on a pool can
+    report into the same run.
+
+    With profile set, every outermost stage of a thread is also profiled,
+    with cProfile (a .prof file for pstats or snakeviz) or the sampling
+    profiler (a .folded file), written to profile_dir.
+
+    With memory_limit_mb set, check_memory fails once the process RSS
+    goes over the limit.
+    """
+
+    def __init__(self, profile=None, profile_dir="profiles", sample_interval=DEFAULT_SAMPLE_INTERVAL,
+                 memory_limit_mb=None):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profile}', expected one of {PROFILERS}")
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.sample_interval = sample_interval
+        self.memory_limit_mb = memory_limit_mb
+        self.started_at = datetime.datetime.now()
+        self.start_time = time.perf_counter()
+        self.stages = []
+        self.counters = collections.Counter()
+        self.lock = threading.Lock()
+        self._profiled = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        """
+        Measure a block as one run of a stage.
+
+        Args:
+            name (str): Stage name, e.g. "parse" or "load".
+            **labels: Labels such as sheet or table, kept in the report.
+
+        Yields:
+            StageMetrics: Record to add the rows and bytes processed to.
+        """
+        stage_metrics = StageMetrics(name, {key: str(value) for key, value in labels.items()})
+        with self.lock:
+            self.stages.append(stage_metrics)
+        start_rss = peak_rss_mb()
+        start_time = time.perf_counter()
+        profiler = self._start_profiler()
+        try:
+            yield stage_metrics
+        except BaseException as e:
+            stage_metrics.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stage_metrics.seconds = time.perf_counter() - start_time
+            if profiler is not None:
+                self._stop_profiler(profiler, stage_metrics)
+            stage_metrics.peak_rss_mb = peak_rss_mb()
+            if start_rss is not None:
+                stage_metrics.rss_growth_mb = stage_metrics.peak_rss_mb - start_rss
+
+    def _start_profiler(self):
+        # Profilers are per thread and do not nest, so only the outermost stage of a thread is profiled
+        if self.profile is None or getattr(self._profiled, "active", False):
+            return None
+        self._profiled.active = True
+        if self.profile == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        return profiler
+
+    def _stop_profiler(self, profiler, stage_metrics):
+        if self.profile == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+        self._profiled.active = False
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = "-".join([stage_metrics.name, *stage_metrics.labels.values()])
+        with self.lock:
+            index = sum(1 for stage in self.stages if stage is not stage_metrics and stage.name == stage_metrics.name)
+        file_name = f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', name)}-{index}.{'prof' if self.profile == 'cprofile' else 'folded'}"
+        file_path = os.path.join(self.profile_dir, file_name)
+        if self.profile == "cprofile":
+            profiler.dump_stats(file_path)
+        else:
+            profiler.write(file_path)
+        logging.info("Profile of stage '%s' written to %s", name, file_path)
+
+    def count(self, name, amount=1, **labels):
+        """
+        Add to an aggregated counter, e.g. rows loaded into a table.
+
+        Args:
+            name (str): Counter name.
+            amount (int): Amount to add.
+            **labels: Labels of the counter, e.g. table.
+        """
+        key = (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+        with self.lock:
+            self.counters[key] += amount
+
+    def check_memory(self, where):
+        """
+        Fail if the process uses more memory than the run allows. Called
+        between chunks, so an oversized run stops with a clear error
+        instead of being killed by the kernel or the container.
+
+        Args:
+            where (str): What is running, for the error message.
+
+        Raises:
+            MemoryLimitExceeded: If the RSS is over memory_limit_mb.
+        """
+        if self.memory_limit_mb is None:
+            return
+        rss = current_rss_mb()
+        if rss is not None and rss > self.memory_limit_mb:
+            self.count("memory_limit_exceeded")
+            raise MemoryLimitExceeded(f"{where}: RSS {rss:.0f} MB is over the {self.memory_limit_mb} MB limit")
+
+    def report(self):
+        """
+        Build the structured run report.
+
+        Returns:
+            dict: Run start time, elapsed seconds, peak memory and memory limit, stage records and counters.
+        """
+        with self.lock:
+            stages = [stage.as_dict() for stage in self.stages]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {"started_at": self.started_at.isoformat(timespec="seconds"),
+                "seconds": round(time.perf_counter() - self.start_time, 6), "argv": sys.argv,
+                "peak_rss_mb": peak_rss_mb(), "memory_limit_mb": self.memory_limit_mb, "stages": stages,
+                "counters": counters}
+
+    def write_report(self, file_path):
+        """Write the run report as JSON."""
+        with open(file_path, "w", encoding="utf-8") as report_file:
+            json.dump(self.report(), report_file, indent=4)
+        logging.info("Run report written to %s", file_path)
+
+    def prometheus_text(self):
+        """
+        Format the metrics in the Prometheus text exposition format, e.g.
+        for the node_exporter textfile collector. Runs of the same stage
+        with the same labels are summed.
+
+        Returns:
+            str: The metrics text.
+        """
+        totals = collections.OrderedDict()
+        with self.lock:
+            for stage in self.stages:
+                labels = tuple(sorted({"stage": stage.name, **stage.labels}.items()))
+                total = totals.setdefault(labels, {"seconds": 0.0, "rows": 0, "bytes_read": 0})
+                total["seconds"] += stage.seconds
+                total["rows"] += stage.rows
+                total["bytes_read"] += stage.bytes_read
+            counters = sorted(self.counters.items())
+
+        lines = []
+        for metric, metric_type, help_text in (("seconds", "counter", "Wall time spent in the stage"),
+                                               ("rows", "counter", "Rows processed by the stage"),
+                                               ("bytes_read", "counter", "Bytes read by the stage")):
+            name = f"{METRIC_PREFIX}_stage_{metric}_total"
+            lines.append(f"# HELP {name} {help_text}.")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, total in totals.items():
+                lines.append(f"{name}{format_labels(labels)} {total[metric]}")
+
+        counter_names = list(dict.fromkeys(name for (name, _), _ in counters))
+        for counter_name in counter_names:
+            name = f"{METRIC_PREFIX}_{counter_name}_total"
+            lines.append(f"# TYPE {name} counter")
+            for (other_name, labels), value in counters:
+                if other_name == counter_name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+        peak = peak_rss_mb()
+        if peak is not None:
+            lines.append(f"# TYPE {METRIC_PREFIX}_peak_rss_bytes gauge")
+            lines.append(f"{METRIC_PREFIX}_peak_rss_bytes {int(peak * 1024 * 1024)}")
+        if self.memory_limit_mb is not None:
+            lines.append(f"# TYPE {METRIC_PREFIX}_memory_limit_bytes gauge")
+            lines.append(f"{METRIC_PREFIX}_memory_limit_bytes {int(self.memory_limit_mb * 1024 * 1024)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_path):
+        """Write the metrics in the Prometheus text format."""
+        with open(file_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.prometheus_text())
+        logging.info("Prometheus metrics written to %s", file_path)
+
+def format_labels(labels):
+    """Format (name, value) pairs as a Prometheus label set."""
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+# Metrics of the current run; replaced by start_run
+_current = RunMetrics()
+
+def start_run(profile=None, profile_dir="profiles", sample_interval=DEFAULT_SAMPLE_INTERVAL, memory_limit_mb=None):
+    """
+    Start collecting the metrics of a new run.
+
+    Args:
+        profile (str): None, "cprofile" or "sampling".
+        profile_dir (str): Directory for the profile files.
+        sample_interval (float): Seconds between samples of the sampling profiler.
+        memory_limit_mb (float): RSS limit enforced by check_memory (if None, no limit).
+
+    Returns:
+        RunMetrics: The metrics of the new run.
+    """
+    global _current
+    _current = RunMetrics(profile, profile_dir, sample_interval, memory_limit_mb)
+    return _current
+
+def get_metrics():
+    """Metrics of the current run."""
+    return _current
+
+def stage(name, **labels):
+    """Measure a block as one run of a stage of the current run (see RunMetrics.stage)."""
+    return _current.stage(name, **labels)
+
+def count(name, amount=1, **labels):
+    """Add to a counter of the current run (see RunMetrics.count)."""
+    _current.count(name, amount, **labels)
+
+def check_memory(where):
+    """Fail if the current run is over its memory limit (see RunMetrics.check_memory)."""
+    _current.check_memory(where)
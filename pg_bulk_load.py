@@ -0,0 +1,506 @@
+# File: pg_bulk_load.py
+import csv
+import datetime
+import functools
+import io
+import json
+import logging
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import instrumentation
+import pg_dbconnect
+import vectorized_clean
+from excel_to_dictionary import iter_records
+from sheet_table import SheetTable
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_PAGE_SIZE = 1000
+
+# INSERT statements kept per (table name, column signature)
+INSERT_STATEMENT_CACHE_SIZE = 1024
+
+def clean_column_name(column_name):
+    """
+    Clean a column name for SQL compatibility.
+
+    Args:
+        column_name (str): Column name as found in the sheet header.
+
+    Returns:
+        str: Lower-case column name with spaces, hyphens and dots replaced by underscores.
+    """
+    return column_name.replace(' ', '_').replace('-', '_').replace('.', '_').lower()
+
+def clean_row(row):
+    """
+    Clean a single row for database insertion.
+    Empty/None values are omitted so the database can use DEFAULT values.
+
+    Args:
+        row (dict): A row dictionary.
+
+    Returns:
+        dict: Cleaned row dictionary.
+    """
+    cleaned_row = {}
+
+    for column_name, value in row.items():
+        # Handle empty or None values by omitting them from INSERT
+        if value is not None and str(value).strip() != '':
+            cleaned_row[column_name] = value
+        # If value is empty/None, skip it - let database use DEFAULT value
+
+    return cleaned_row
+
+def iter_load_chunks(data, chunk_size=DEFAULT_CHUNK_SIZE, source_file=None):
+    """
+    Clean rows and group them into chunks ready for loading.
+    Every row gets a source_sheet value; completely empty rows are dropped.
+    Sheets stored as SheetTable are cleaned one column chunk at a time with
+    vectorized_clean when NumPy and pandas are installed.
+
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+        chunk_size (int): Maximum number of rows per chunk.
+        source_file (str): Value of the source_file column, if the table has one.
+
+    Yields:
+        list: List of cleaned row dictionaries with SQL column names.
+    """
+    if isinstance(data, dict) and vectorized_clean.is_available():
+        for sheet_name, rows in data.items():
+            if isinstance(rows, SheetTable):
+                column_names = [clean_column_name(header) for header in rows.headers]
+                yield from vectorized_clean.iter_table_load_chunks(sheet_name, rows, column_names, chunk_size,
+                                                                   source_file)
+            else:
+                yield from iter_load_chunks(((sheet_name, row) for row in rows), chunk_size, source_file)
+        return
+
+    chunk = []
+
+    for sheet_name, raw_row in iter_records(data, skip_nulls=True):
+        row = prepare_load_row(sheet_name, raw_row, source_file)
+        if not row:
+            continue
+        chunk.append(row)
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def prepare_load_row(sheet_name, raw_row, source_file=None):
+    """
+    Clean one row for loading: drop empty values, use SQL column names and
+    add the source_sheet (and source_file, if given) value.
+
+    Args:
+        sheet_name (str): Name of the sheet the row comes from.
+        raw_row (dict): Row dictionary keyed by header.
+        source_file (str): Value of the source_file column, if the table has one.
+
+    Returns:
+        dict: Cleaned row dictionary, or an empty dictionary if the row has no values.
+    """
+    row = {clean_column_name(column): value for column, value in clean_row(raw_row).items()}
+    if row:
+        row['source_sheet'] = sheet_name
+        if source_file is not None:
+            row['source_file'] = source_file
+    return row
+
+def bucket_rows_by_signature(rows):
+    """
+    Group rows by the set of columns they contain.
+    Rows from the same sheet can have different columns once empty cells
+    are dropped, so each bucket can be loaded with a single column list.
+
+    Args:
+        rows (list): List of cleaned row dictionaries.
+
+    Returns:
+        dict: frozenset of column names -> (tuple of column names, list of rows).
+    """
+    buckets = {}
+
+    for row in rows:
+        signature = frozenset(row)
+        if signature not in buckets:
+            buckets[signature] = (tuple(row), [])
+        buckets[signature][1].append(row)
+
+    return buckets
+
+def format_copy_value(value):
+    """
+    Format a Python value as CSV text that PostgreSQL's COPY can parse.
+
+    Args:
+        value: A non-empty cell value.
+
+    Returns:
+        str: The text representation of the value.
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+def copy_rows(cursor, table_name, columns, rows):
+    """
+    Load rows that share the same columns with COPY ... FROM STDIN.
+    Columns not listed get their DEFAULT value, like a partial INSERT.
+
+    Args:
+        cursor: psycopg2 cursor.
+        table_name (str): The name of the database table to load into.
+        columns (tuple): Column names present in every row.
+        rows (list): List of row dictionaries.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    for row in rows:
+        writer.writerow([format_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    copy_statement = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor.copy_expert(copy_statement, buffer)
+
+@functools.lru_cache(maxsize=INSERT_STATEMENT_CACHE_SIZE)
+def get_insert_statement(table_name, columns):
+    """
+    Get the multi-row INSERT statement for a table and column signature.
+    Statements are built once per signature and kept in a bounded cache.
+
+    Args:
+        table_name (str): The name of the database table to insert into.
+        columns (tuple): Column names present in every row, in VALUES order.
+
+    Returns:
+        str: INSERT statement for execute_values.
+    """
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s"
+
+def insert_rows(cursor, table_name, columns, rows, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Insert rows that share the same columns with psycopg2's execute_values,
+    sending page_size rows per INSERT statement.
+
+    Args:
+        cursor: psycopg2 cursor.
+        table_name (str): The name of the database table to insert into.
+        columns (tuple): Column names present in every row.
+        rows (list): List of row dictionaries.
+        page_size (int): Number of rows per INSERT statement.
+    """
+    columns = tuple(columns)
+    values = [tuple(row[column] for column in columns) for row in rows]
+    execute_values(cursor, get_insert_statement(table_name, columns), values, page_size=page_size)
+
+def copy_data_to_db(data, table_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bulk load data into a PostgreSQL table with COPY ... FROM STDIN.
+    Rows are cleaned like clean_data_for_insert, tagged with their
+    source_sheet and sent in chunks, one COPY per column signature.
+
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+        table_name (str): The name of the database table to load into.
+        chunk_size (int): Number of rows buffered per chunk.
+
+    Returns:
+        dict: Load summary with table, rows, seconds, rows_per_sec and success.
+    """
+    return load_data_to_db(data, table_name, method="copy", chunk_size=chunk_size)
+
+def batch_insert_data_to_db(data, table_name, page_size=DEFAULT_PAGE_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert data into a PostgreSQL table with batched multi-row INSERTs.
+    Rows are bucketed by column signature so omitted columns still get
+    their DEFAULT value, and each bucket is sent with execute_values.
+
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+        table_name (str): The name of the database table to insert into.
+        page_size (int): Number of rows per INSERT statement.
+        chunk_size (int): Number of rows buffered per chunk.
+
+    Returns:
+        dict: Load summary with table, rows, seconds, rows_per_sec and success.
+    """
+    return load_data_to_db(data, table_name, method="batch", chunk_size=chunk_size, page_size=page_size)
+
+def create_quarantine_table(cursor, table_name):
+    """
+    Create the quarantine table that receives rows rejected while loading table_name.
+
+    Args:
+        cursor: psycopg2 cursor.
+        table_name (str): The name of the table being loaded.
+
+    Returns:
+        str: The name of the quarantine table.
+    """
+    quarantine_table = f"{table_name}_quarantine"
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {quarantine_table} (
+    id SERIAL PRIMARY KEY,
+    source_sheet TEXT,
+    row_data JSONB,
+    error TEXT,
+    quarantined_at TIMESTAMP DEFAULT now()
+);""")
+    return quarantine_table
+
+def create_quarantine_tables(table_names):
+    """
+    Create the quarantine tables of several tables up front, in one
+    transaction. Concurrent loads into the same table would otherwise race
+    to create its quarantine table, and CREATE TABLE IF NOT EXISTS can
+    still fail on the duplicate when two sessions run it at once.
+
+    Args:
+        table_names (iterable): Names of the tables about to be loaded.
+
+    Returns:
+        bool: True if every quarantine table exists.
+    """
+    try:
+        with pg_dbconnect.pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                for table_name in dict.fromkeys(table_names):
+                    create_quarantine_table(cursor, table_name)
+            conn.commit()
+        return True
+    except psycopg2.Error as e:
+        logging.error("Creating the quarantine tables failed: %s", e)
+        return False
+
+def write_quarantine_file(table_name, bad_rows, quarantine_file):
+    """
+    Append rejected rows with their error text to a JSON Lines file.
+
+    Args:
+        table_name (str): The name of the table being loaded.
+        bad_rows (list): List of (row, error text) tuples.
+        quarantine_file (str): Path of the JSON Lines file.
+    """
+    with open(quarantine_file, 'a', encoding='utf-8') as file:
+        for row, error in bad_rows:
+            record = {'table': table_name, 'source_sheet': row.get('source_sheet'), 'row': row, 'error': error}
+            file.write(json.dumps(record, ensure_ascii=False, default=format_copy_value) + "\n")
+
+def quarantine_rows(cursor, table_name, bad_rows, quarantine_file=None):
+    """
+    Record rejected rows with their error text, either in the
+    <table_name>_quarantine table or appended to a JSON Lines file.
+    Rows written to the table are part of the current transaction; rows
+    written to the file stay there even if the transaction rolls back.
+
+    Args:
+        cursor: psycopg2 cursor.
+        table_name (str): The name of the table being loaded.
+        bad_rows (list): List of (row, error text) tuples.
+        quarantine_file (str): Path of a JSON Lines file (if None, uses the quarantine table).
+    """
+    if quarantine_file:
+        write_quarantine_file(table_name, bad_rows, quarantine_file)
+        return
+
+    quarantine_table = create_quarantine_table(cursor, table_name)
+    values = [(row.get('source_sheet'), json.dumps(row, ensure_ascii=False, default=format_copy_value), error)
+              for row, error in bad_rows]
+    execute_values(cursor, f"INSERT INTO {quarantine_table} (source_sheet, row_data, error) VALUES %s", values)
+
+def load_chunk_isolating_bad_rows(cursor, chunk, load_bucket):
+    """
+    Load a chunk inside a SAVEPOINT. If it fails, roll back to the savepoint
+    and bisect the chunk, so the good rows are kept and each bad row is
+    found in O(log n) extra round trips.
+
+    Args:
+        cursor: psycopg2 cursor.
+        chunk (list): List of cleaned row dictionaries.
+        load_bucket (callable): Function(cursor, columns, rows) that loads one bucket.
+
+    Returns:
+        tuple: (number of rows loaded, list of (row, error text) tuples).
+    """
+    bad_rows = []
+
+    def attempt(rows):
+        cursor.execute("SAVEPOINT load_chunk")
+        try:
+            for columns, bucket in bucket_rows_by_signature(rows).values():
+                load_bucket(cursor, columns, bucket)
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT load_chunk")
+            cursor.execute("RELEASE SAVEPOINT load_chunk")
+            return e
+        cursor.execute("RELEASE SAVEPOINT load_chunk")
+        return None
+
+    def bisect(rows, error):
+        if len(rows) == 1:
+            bad_rows.append((rows[0], str(error).strip()))
+            return 0
+        middle = len(rows) // 2
+        loaded = 0
+        for half in (rows[:middle], rows[middle:]):
+            half_error = attempt(half)
+            if half_error is None:
+                loaded += len(half)
+            else:
+                loaded += bisect(half, half_error)
+        return loaded
+
+    error = attempt(chunk)
+    if error is None:
+        return len(chunk), bad_rows
+    return bisect(chunk, error), bad_rows
+
+def get_bucket_loader(table_name, method="copy", page_size=DEFAULT_PAGE_SIZE):
+    """
+    Get the function that loads one bucket of rows with the given method.
+
+    Args:
+        table_name (str): The name of the database table to load into.
+        method (str): "copy" for COPY ... FROM STDIN, "batch" for execute_values INSERTs.
+        page_size (int): Number of rows per INSERT statement for the "batch" method.
+
+    Returns:
+        callable: Function(cursor, columns, rows) that loads one bucket.
+    """
+    if method == "copy":
+        def load_bucket(cursor, columns, rows):
+            copy_rows(cursor, table_name, columns, rows)
+    elif method == "batch":
+        def load_bucket(cursor, columns, rows):
+            insert_rows(cursor, table_name, columns, rows, page_size)
+    else:
+        raise ValueError(f"Unknown load method: {method}")
+    return load_bucket
+
+def load_chunk(cursor, table_name, chunk, load_bucket, isolate_bad_rows=False, quarantine_file=None,
+               deferred_rows=None):
+    """
+    Load one chunk of cleaned rows in the current transaction.
+
+    Args:
+        cursor: psycopg2 cursor.
+        table_name (str): The name of the database table to load into.
+        chunk (list): List of cleaned row dictionaries.
+        load_bucket (callable): Function(cursor, columns, rows) from get_bucket_loader.
+        isolate_bad_rows (bool): Bisect out and quarantine failing rows instead of raising.
+        quarantine_file (str): JSON Lines file for quarantined rows
+            (if None, uses the <table_name>_quarantine table).
+        deferred_rows (list): With quarantine_file, bad rows are added to
+            this list instead of being written, so the caller can write
+            them once the transaction is committed.
+
+    Returns:
+        tuple: (number of rows loaded, number of rows quarantined).
+    """
+    if isolate_bad_rows:
+        loaded, bad_rows = load_chunk_isolating_bad_rows(cursor, chunk, load_bucket)
+        if bad_rows and quarantine_file and deferred_rows is not None:
+            deferred_rows.extend(bad_rows)
+        elif bad_rows:
+            quarantine_rows(cursor, table_name, bad_rows, quarantine_file)
+        return loaded, len(bad_rows)
+
+    for columns, rows in bucket_rows_by_signature(chunk).values():
+        load_bucket(cursor, columns, rows)
+    return len(chunk), 0
+
+def load_data_to_db(data, table_name, method="copy", chunk_size=DEFAULT_CHUNK_SIZE, page_size=DEFAULT_PAGE_SIZE,
+                    isolate_bad_rows=False, quarantine_file=None, conn=None, source_file=None):
+    """
+    Load data into a PostgreSQL table chunk by chunk in one transaction.
+    With isolate_bad_rows, a failing chunk no longer aborts the load: its bad
+    rows are bisected out and quarantined while the good rows are committed.
+
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+        table_name (str): The name of the database table to load into.
+        method (str): "copy" for COPY ... FROM STDIN, "batch" for execute_values INSERTs.
+        chunk_size (int): Number of rows buffered per chunk.
+        page_size (int): Number of rows per INSERT statement for the "batch" method.
+        isolate_bad_rows (bool): Wrap each chunk in a SAVEPOINT and quarantine failing rows.
+        quarantine_file (str): JSON Lines file for quarantined rows
+            (if None, uses the <table_name>_quarantine table). The file is
+            only written once the load has succeeded (after the commit,
+            unless conn is given), so a rolled back load adds nothing to it.
+        conn: Connection to load with. The caller then owns the transaction:
+            nothing is committed or rolled back here, and a failed load
+            leaves the transaction for the caller to roll back. Quarantined
+            rows already written to quarantine_file stay there if the
+            caller rolls back afterwards.
+        source_file (str): Value of the source_file column, if the table has one.
+
+    Returns:
+        dict: Load summary with table, rows, quarantined, seconds, rows_per_sec and success.
+    """
+    load_bucket = get_bucket_loader(table_name, method, page_size)
+
+    summary = {'table': table_name, 'method': method, 'rows': 0, 'quarantined': 0,
+               'seconds': 0.0, 'rows_per_sec': 0.0, 'success': False}
+
+    own_connection = conn is None
+    if own_connection:
+        conn = pg_dbconnect.get_pooled_connection()
+    if not conn:
+        logging.error("Failed to create a database connection.")
+        return summary
+
+    cursor = conn.cursor()
+    start_time = time.perf_counter()
+    deferred_rows = []
+
+    try:
+        with instrumentation.stage("load", table=table_name, method=method) as stage_metrics:
+            for chunk_number, chunk in enumerate(iter_load_chunks(data, chunk_size, source_file), 1):
+                instrumentation.check_memory(f"Loading table '{table_name}'")
+                loaded, quarantined = load_chunk(cursor, table_name, chunk, load_bucket, isolate_bad_rows,
+                                                 quarantine_file, deferred_rows)
+                if quarantined:
+                    logging.warning("Chunk %s for table '%s': %s bad rows quarantined", chunk_number, table_name, quarantined)
+                summary['rows'] += loaded
+                summary['quarantined'] += quarantined
+                stage_metrics.add(rows=loaded)
+                logging.debug("Chunk %s loaded into table '%s' (%s rows so far)", chunk_number, table_name, summary['rows'])
+
+            if own_connection:
+                conn.commit()
+        if deferred_rows:
+            write_quarantine_file(table_name, deferred_rows, quarantine_file)
+        summary['success'] = True
+        instrumentation.count("rows_loaded", summary['rows'], table=table_name)
+        instrumentation.count("rows_quarantined", summary['quarantined'], table=table_name)
+    except Exception as e:
+        logging.error("Loading table '%s' with method '%s' failed: %s", table_name, method, e)
+        if own_connection:
+            logging.error("Rolling back the transaction due to error.")
+            conn.rollback()
+        summary['rows'] = 0
+    finally:
+        cursor.close()
+        if own_connection:
+            pg_dbconnect.release_connection(conn)
+
+    summary['seconds'] = time.perf_counter() - start_time
+    if summary['seconds'] > 0:
+        summary['rows_per_sec'] = summary['rows'] / summary['seconds']
+
+    logging.info("Loading table '%s' with method '%s' finished: %s rows in %.2fs (%.0f rows/sec), %s quarantined, success: %s",
+                 table_name, method, summary['rows'], summary['seconds'], summary['rows_per_sec'],
+                 summary['quarantined'], summary['success'])
+    return summary
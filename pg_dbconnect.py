@@ -1,48 +1,259 @@
 # File: pg_dbconnect.py
+import contextlib
+import logging
+import os
+import threading
+
 import psycopg2
+from psycopg2 import extensions, pool
+
+import instrumentation
+
+# Defaults match docker-compose.yml; override them with the standard PG* environment variables
+DEFAULT_SETTINGS = {
+    'host': 'localhost',
+    'port': 5432,
+    'user': 'admin',
+    'password': 'admin',
+    'dbname': 'mydb',
+}
+
+# Pool sizing and health checks can be overridden with PG_POOL_MIN, PG_POOL_MAX and PG_POOL_HEALTH_CHECK
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 8
+
+_pool = None
+_pool_slots = None
+_pool_health_check = True
+# Reentrant so get_pool can create the pool while holding it
+_pool_lock = threading.RLock()
+# id(connection) -> semaphore of the pool it was taken from
+_checked_out = {}
 
-hostname="localhost"
-port=5432
-username="admin"
-password="admin"
-database="mydb"
+def get_connection_settings():
+    """
+    Read the database connection settings from the environment.
+
+    Returns:
+        dict: Keyword arguments for psycopg2.connect.
+    """
+    return {
+        'host': os.environ.get('PGHOST', DEFAULT_SETTINGS['host']),
+        'port': int(os.environ.get('PGPORT', DEFAULT_SETTINGS['port'])),
+        'user': os.environ.get('PGUSER', DEFAULT_SETTINGS['user']),
+        'password': os.environ.get('PGPASSWORD', DEFAULT_SETTINGS['password']),
+        'dbname': os.environ.get('PGDATABASE', DEFAULT_SETTINGS['dbname']),
+    }
 
 def create_connection():
     """
     Create a database connection to the PostgreSQL database.
-    
+
     Returns:
         connection: psycopg2 connection object
     """
     try:
-        connection = psycopg2.connect(
-            host=hostname,
-            port=port,
-            user=username,
-            password=password,
-            dbname=database
-        )
-        print("Connection to the database established successfully.")
+        connection = psycopg2.connect(**get_connection_settings())
+        logging.debug("Connection to the database established successfully.")
+        instrumentation.count("db_connections_opened")
         return connection
     except Exception as e:
-        print(f"Error connecting to the database: {e}")
+        logging.error("Error connecting to the database: %s", e)
         return None
 
 def close_connection(connection):
     """
     Close the database connection.
-    
+
     Args:
         connection: psycopg2 connection object
     """
     if connection:
         connection.close()
-        print("Database connection closed.")    
+        logging.debug("Database connection closed.")
+
+def create_pool(minconn=None, maxconn=None, health_check=None):
+    """
+    Create the shared connection pool used for an ingestion run.
+    Any existing pool is closed first.
+
+    Args:
+        minconn (int): Connections opened up front (defaults to PG_POOL_MIN or 1)
+        maxconn (int): Maximum number of connections (defaults to PG_POOL_MAX or 8)
+        health_check (bool): Check connections with SELECT 1 when they are
+            taken from the pool (defaults to PG_POOL_HEALTH_CHECK or True)
+
+    Returns:
+        ThreadedConnectionPool: The new pool
+    """
+    global _pool, _pool_slots, _pool_health_check
+
+    if minconn is None:
+        minconn = int(os.environ.get('PG_POOL_MIN', DEFAULT_POOL_MIN))
+    if maxconn is None:
+        maxconn = int(os.environ.get('PG_POOL_MAX', DEFAULT_POOL_MAX))
+    if health_check is None:
+        health_check = os.environ.get('PG_POOL_HEALTH_CHECK', '1').lower() not in ('0', 'false', 'no')
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = pool.ThreadedConnectionPool(minconn, maxconn, **get_connection_settings())
+        # The pool raises instead of waiting when it is exhausted, so callers wait on a semaphore
+        _pool_slots = threading.BoundedSemaphore(maxconn)
+        _pool_health_check = health_check
+
+    logging.info("Connection pool created (min=%s, max=%s, health_check=%s)", minconn, maxconn, health_check)
+    return _pool
+
+def get_pool():
+    """
+    Get the shared connection pool, creating it from the environment settings on first use.
+
+    Returns:
+        ThreadedConnectionPool: The shared pool
+    """
+    if _pool is None:
+        with _pool_lock:
+            # Checked again under the lock so two threads never both create (and close) a pool
+            if _pool is None:
+                create_pool()
+    return _pool
+
+def get_pool_size():
+    """
+    Get the maximum number of connections of the shared pool, creating it on first use.
+
+    Returns:
+        int: Maximum number of connections checked out at once
+    """
+    return get_pool().maxconn
+
+def close_pool():
+    """
+    Close every connection in the shared pool.
+    """
+    global _pool, _pool_slots
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            logging.info("Connection pool closed.")
+        _pool = None
+        _pool_slots = None
+
+def is_connection_healthy(connection):
+    """
+    Check that a connection is open and can still run a query.
+
+    Args:
+        connection: psycopg2 connection object
+
+    Returns:
+        bool: True if the connection is usable
+    """
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def get_pooled_connection():
+    """
+    Take a connection from the shared pool, waiting if every connection is in use.
+    Broken connections are discarded and replaced.
+
+    Returns:
+        connection: psycopg2 connection object, or None if no connection could be made
+    """
+    try:
+        connection_pool = get_pool()
+        slots = _pool_slots
+        slots.acquire()
+        try:
+            connection = connection_pool.getconn()
+            if _pool_health_check and not is_connection_healthy(connection):
+                logging.warning("Discarding broken pooled connection.")
+                instrumentation.count("db_connections_discarded")
+                connection_pool.putconn(connection, close=True)
+                connection = connection_pool.getconn()
+        except Exception:
+            slots.release()
+            raise
+        with _pool_lock:
+            _checked_out[id(connection)] = slots
+        instrumentation.count("db_connections_checked_out")
+        return connection
+    except Exception as e:
+        logging.error("Error getting a pooled database connection: %s", e)
+        return None
+
+def release_connection(connection):
+    """
+    Return a connection to the shared pool.
+    Any transaction left open is rolled back first; a connection that is
+    closed or cannot be rolled back is closed and dropped from the pool.
+
+    Args:
+        connection: psycopg2 connection object from get_pooled_connection
+    """
+    if not connection:
+        return
+
+    with _pool_lock:
+        slots = _checked_out.pop(id(connection), None)
+    discard = bool(connection.closed)
+    try:
+        if not discard and connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            # Discarded unless the rollback succeeds, so a broken connection is never reused
+            discard = True
+            connection.rollback()
+            discard = bool(connection.closed)
+    except psycopg2.Error as e:
+        logging.warning("Rolling back a released connection failed, closing it: %s", e)
+    finally:
+        try:
+            if _pool is not None:
+                _pool.putconn(connection, close=discard)
+            else:
+                connection.close()
+        finally:
+            if slots is not None:
+                slots.release()
+
+@contextlib.contextmanager
+def pooled_connection():
+    """
+    Context manager that lends a pooled connection for the duration of a block.
+
+    Yields:
+        connection: psycopg2 connection object
+
+    Raises:
+        psycopg2.OperationalError: If no connection could be made
+    """
+    connection = get_pooled_connection()
+    if connection is None:
+        raise psycopg2.OperationalError("Could not get a connection from the pool")
+    try:
+        yield connection
+    except Exception:
+        if not connection.closed:
+            connection.rollback()
+        raise
+    finally:
+        release_connection(connection)
 
 if __name__ == "__main__":
-    conn = create_connection()
-    if conn:
-        # Perform database operations here
-        close_connection(conn)
-    else:
-        print("Failed to create a database connection.")    
\ No newline at end of file
+    try:
+        with pooled_connection() as conn:
+            # Perform database operations here
+            print("Pooled connection is healthy:", is_connection_healthy(conn))
+    except psycopg2.Error:
+        print("Failed to create a database connection.")
+    finally:
+        close_pool()
@@ -0,0 +1,109 @@
+# File: pg_partitions.py
+import logging
+import re
+
+# Check constraint added to a staged partition so ATTACH PARTITION can skip scanning it
+PARTITION_CHECK = "source_sheet_partition_check"
+
+def partition_table_name(parent_table, sheet_name):
+    """
+    Get the name of the partition holding one sheet of a partitioned table.
+
+    Args:
+        parent_table (str): Name of the partitioned parent table.
+        sheet_name (str): Name of the sheet, the partition's source_sheet value.
+
+    Returns:
+        str: Partition name, e.g. invoice_data_2019_2021_p2020.
+    """
+    return f"{parent_table}_p{re.sub(r'[^0-9a-z_]+', '_', sheet_name.lower())}"
+
+def create_partition(cursor, parent_table, sheet_name):
+    """
+    Create the partition of a sheet if it does not exist yet.
+
+    Args:
+        cursor: Database cursor.
+        parent_table (str): Name of the partitioned parent table.
+        sheet_name (str): Name of the sheet.
+
+    Returns:
+        str: The partition name.
+    """
+    partition = partition_table_name(parent_table, sheet_name)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {parent_table} FOR VALUES IN (%s)",
+                   (sheet_name,))
+    logging.info("Partition '%s' of table '%s' holds sheet '%s'", partition, parent_table, sheet_name)
+    return partition
+
+def is_partitioned_table(cursor, table_name):
+    """
+    Check whether a table is a partitioned parent table.
+
+    Args:
+        cursor: Database cursor.
+        table_name (str): Name of the table.
+
+    Returns:
+        bool: True if the table exists and is partitioned.
+    """
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table_name,))
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+def create_staging_partition(cursor, parent_table, sheet_name):
+    """
+    Create an empty stand-alone table shaped like a partition of the parent,
+    to load a sheet into before swapping it in with swap_partition.
+
+    The table gets a CHECK constraint matching the partition bound, so
+    attaching it does not have to scan its rows. Indexes are left out and
+    built once when the table is attached, instead of updated per row.
+
+    CREATE TABLE ... LIKE holds a lock on the parent until the end of the
+    transaction, and the DETACH in swap_partition needs an exclusive lock
+    on it. Commit the new table before loading it, or two transactions
+    swapping sheets of the same parent deadlock each other.
+
+    Args:
+        cursor: Database cursor.
+        parent_table (str): Name of the partitioned parent table.
+        sheet_name (str): Name of the sheet.
+
+    Returns:
+        str: Name of the staging table.
+    """
+    staging_table = partition_table_name(parent_table, sheet_name) + "_staging"
+    cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+    cursor.execute(f"CREATE TABLE {staging_table} (LIKE {parent_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(f"ALTER TABLE {staging_table} ADD CONSTRAINT {PARTITION_CHECK} "
+                   f"CHECK (source_sheet IS NOT NULL AND source_sheet = %s)", (sheet_name,))
+    return staging_table
+
+def swap_partition(cursor, parent_table, sheet_name, staging_table):
+    """
+    Replace the partition of a sheet with a loaded staging table: the old
+    partition is detached and dropped, and the staging table is renamed and
+    attached in its place. Run it in the same transaction as the load, so
+    readers see either the old or the new rows of the sheet, and the
+    parent is only locked for the swap itself.
+
+    Args:
+        cursor: Database cursor.
+        parent_table (str): Name of the partitioned parent table.
+        sheet_name (str): Name of the sheet.
+        staging_table (str): Table from create_staging_partition.
+
+    Returns:
+        str: The partition name.
+    """
+    partition = partition_table_name(parent_table, sheet_name)
+    cursor.execute("SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s)",
+                   (partition, parent_table))
+    if cursor.fetchone() is not None:
+        cursor.execute(f"ALTER TABLE {parent_table} DETACH PARTITION {partition}")
+    cursor.execute(f"DROP TABLE IF EXISTS {partition}")
+    cursor.execute(f"ALTER TABLE {staging_table} RENAME TO {partition}")
+    cursor.execute(f"ALTER TABLE {parent_table} ATTACH PARTITION {partition} FOR VALUES IN (%s)", (sheet_name,))
+    logging.info("Swapped in a new partition '%s' for sheet '%s' of table '%s'", partition, sheet_name, parent_table)
+    return partition
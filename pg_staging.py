@@ -0,0 +1,142 @@
+# File: pg_staging.py
+import logging
+import re
+
+import pg_dbconnect
+import pg_partitions
+
+STAGING_SUFFIX = "_staging"
+
+def staging_table_name(table_name):
+    """
+    Get the name of the staging table a table is bulk-loaded into.
+
+    Args:
+        table_name (str): Name of the final table.
+
+    Returns:
+        str: Name of the staging table.
+    """
+    return table_name + STAGING_SUFFIX
+
+def index_name(table_name, columns):
+    """
+    Get the name of an index of a table on the given columns.
+
+    Args:
+        table_name (str): Name of the table.
+        columns (tuple): Indexed column names.
+
+    Returns:
+        str: Index name, e.g. invoice_data_2019_2020_source_sheet_idx.
+    """
+    return f"{table_name}_{'_'.join(re.sub(r'[^0-9a-z_]+', '_', column.lower()) for column in columns)}_idx"
+
+def normalize_indexes(indexes):
+    """Turn a list of column names and column tuples into a list of column tuples."""
+    return [(index,) if isinstance(index, str) else tuple(index) for index in indexes or ()]
+
+def build_indexes(cursor, staging_table, indexes=()):
+    """
+    Add the primary key and the configured indexes to a loaded staging
+    table. Building each index once over the loaded rows is much cheaper
+    than updating it for every inserted row.
+
+    Args:
+        cursor: Database cursor.
+        staging_table (str): Name of the staging table.
+        indexes (list): Column tuples to index.
+    """
+    cursor.execute(f"ALTER TABLE {staging_table} ADD PRIMARY KEY (id)")
+    for columns in indexes:
+        cursor.execute(f"CREATE INDEX {index_name(staging_table, columns)} ON {staging_table} ({', '.join(columns)})")
+
+def swap_staging_table(cursor, table_name, staging_table, indexes=()):
+    """
+    Put a staging table in place of the final table: the old table is
+    dropped and the staging table, its primary key, indexes and id
+    sequence take over the final names. Run it in one transaction, so
+    readers see either the old table or the fully loaded new one.
+
+    Args:
+        cursor: Database cursor.
+        table_name (str): Name of the final table.
+        staging_table (str): Name of the loaded staging table.
+        indexes (list): Column tuples indexed by build_indexes.
+    """
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    cursor.execute(f"ALTER TABLE {staging_table} RENAME TO {table_name}")
+    cursor.execute(f"ALTER TABLE {table_name} RENAME CONSTRAINT {staging_table}_pkey TO {table_name}_pkey")
+    cursor.execute(f"ALTER SEQUENCE IF EXISTS {staging_table}_id_seq RENAME TO {table_name}_id_seq")
+    for columns in indexes:
+        cursor.execute(f"ALTER INDEX {index_name(staging_table, columns)} RENAME TO {index_name(table_name, columns)}")
+
+def finalize_staging_table(table_name, table_columns=None, indexes=(), keep_unlogged=False):
+    """
+    Finish a staged bulk load: build the primary key and indexes, make the
+    table crash safe again, refresh its planner statistics and swap it into
+    place.
+
+    The indexes are built and the table analyzed in a first transaction, so
+    the swap itself only holds its locks for a few catalog updates.
+
+    A partitioned final table is never replaced: the staging table is a
+    plain table, so the swap would drop the parent and its partitions. The
+    staging table is dropped instead and the final table left as it was.
+
+    Args:
+        table_name (str): Name of the final table.
+        table_columns (list): Columns of the table; indexes on other columns are skipped
+            (if None, every index is built).
+        indexes (list): Column names or column tuples to index.
+        keep_unlogged (bool): Leave the table UNLOGGED. Faster, but its rows are
+            lost on a database crash and it is not replicated.
+
+    Returns:
+        bool: True if the table was swapped into place.
+    """
+    staging_table = staging_table_name(table_name)
+    indexes = [columns for columns in normalize_indexes(indexes)
+               if table_columns is None or all(column in table_columns for column in columns)]
+
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if pg_partitions.is_partitioned_table(cursor, table_name):
+                logging.error("Table '%s' is partitioned and cannot be replaced by staging table '%s'; "
+                              "load it without fast_load", table_name, staging_table)
+                cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+                conn.commit()
+                return False
+            build_indexes(cursor, staging_table, indexes)
+            if not keep_unlogged:
+                # Writes the table to the WAL once, instead of row by row during the load
+                cursor.execute(f"ALTER TABLE {staging_table} SET LOGGED")
+            cursor.execute(f"ANALYZE {staging_table}")
+            conn.commit()
+
+            swap_staging_table(cursor, table_name, staging_table, indexes)
+            conn.commit()
+        except Exception as e:
+            logging.error("Swapping staging table '%s' into '%s' failed: %s", staging_table, table_name, e)
+            conn.rollback()
+            return False
+        finally:
+            cursor.close()
+    logging.info("Staging table '%s' swapped into place as '%s' (indexes: %s)", staging_table, table_name, indexes)
+    return True
+
+def drop_staging_table(table_name):
+    """
+    Drop the staging table of a failed load, leaving the final table as it was.
+
+    Args:
+        table_name (str): Name of the final table.
+    """
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table_name(table_name)}")
+            conn.commit()
+        finally:
+            cursor.close()
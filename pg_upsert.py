@@ -0,0 +1,217 @@
+# File: pg_upsert.py
+import logging
+import re
+import time
+
+import instrumentation
+import pg_bulk_load
+import pg_dbconnect
+from excel_to_dictionary import iter_records
+
+SYNC_SUFFIX = "_sync"
+# Staging column holding each row's position in the workbook, so the last of several rows with one key wins
+SYNC_ROW_COLUMN = "sync_row"
+
+def key_index_name(table_name, key_columns):
+    """
+    Get the name of the unique index on the natural key of a table.
+
+    Args:
+        table_name (str): Name of the table.
+        key_columns (tuple): Natural key columns.
+
+    Returns:
+        str: Index name, e.g. invoice_data_2019_2021_invoice_no_source_sheet_key.
+    """
+    return f"{table_name}_{'_'.join(re.sub(r'[^0-9a-z_]+', '_', column.lower()) for column in key_columns)}_key"
+
+def ensure_unique_index(cursor, table_name, key_columns):
+    """
+    Create the unique index ON CONFLICT needs on the natural key, if it
+    does not exist yet. Fails if the table already has duplicate keys,
+    e.g. from earlier appending loads; those have to be removed first.
+
+    Args:
+        cursor: Database cursor.
+        table_name (str): Name of the table.
+        key_columns (tuple): Natural key columns.
+    """
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {key_index_name(table_name, key_columns)} "
+                   f"ON {table_name} ({', '.join(key_columns)})")
+
+def create_sync_table(cursor, table_name):
+    """
+    Create the temporary table the rows of a sync are staged in. It has the
+    columns and defaults of the table but no id, so staging does not use up
+    id values, plus the sync_row position of each row in the workbook. It is
+    dropped when the transaction commits.
+
+    Args:
+        cursor: Database cursor.
+        table_name (str): Name of the synced table.
+
+    Returns:
+        str: Name of the temporary table.
+    """
+    sync_table = table_name + SYNC_SUFFIX
+    cursor.execute(f"CREATE TEMP TABLE {sync_table} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP")
+    cursor.execute(f"ALTER TABLE {sync_table} DROP COLUMN id")
+    cursor.execute(f"ALTER TABLE {sync_table} ADD COLUMN {SYNC_ROW_COLUMN} BIGINT")
+    return sync_table
+
+def number_rows(data):
+    """
+    Stream the records of data with their position in the workbook in a
+    sync_row value. Rows are staged in buckets of the same columns, not in
+    workbook order, so the position has to travel with each row.
+
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+
+    Yields:
+        tuple: (sheet_name, row_dict) with the sync_row value added; rows without values are dropped.
+    """
+    row_number = 0
+    for sheet_name, row in iter_records(data, skip_nulls=True):
+        row = pg_bulk_load.clean_row(row)
+        if row:
+            row[SYNC_ROW_COLUMN] = row_number
+            row_number += 1
+            yield sheet_name, row
+
+def merge_statement(table_name, sync_table, key_columns, columns):
+    """
+    Build the set-based upsert of the staged rows into the table.
+
+    Staged rows with the same key are reduced to one with DISTINCT ON,
+    keeping the one that comes last in the workbook (highest sync_row), so
+    repeated syncs of the same workbook always pick the same row. Existing
+    rows are only updated when a value differs, so unchanged rows are
+    neither rewritten nor counted as updated; RETURNING tells inserted rows
+    (xmax = 0) from updated ones.
+
+    Args:
+        table_name (str): Name of the synced table.
+        sync_table (str): Name of the staging table.
+        key_columns (tuple): Natural key columns.
+        columns (list): Columns to insert, including the key columns.
+
+    Returns:
+        str: Statement returning one (inserted, updated, staged) row.
+    """
+    column_list = ", ".join(columns)
+    key_list = ", ".join(key_columns)
+    update_columns = [column for column in columns if column not in key_columns]
+    if update_columns:
+        assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+        current = ", ".join(f"target.{column}" for column in update_columns)
+        incoming = ", ".join(f"EXCLUDED.{column}" for column in update_columns)
+        conflict_action = f"DO UPDATE SET {assignments}\n    WHERE ROW({current}) IS DISTINCT FROM ROW({incoming})"
+    else:
+        conflict_action = "DO NOTHING"
+    return f"""WITH staged AS (
+    SELECT DISTINCT ON ({key_list}) {column_list} FROM {sync_table} ORDER BY {key_list}, {SYNC_ROW_COLUMN} DESC
+), upserted AS (
+    INSERT INTO {table_name} AS target ({column_list})
+    SELECT {column_list} FROM staged
+    ON CONFLICT ({key_list}) {conflict_action}
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted), (SELECT count(*) FROM staged)
+FROM upserted"""
+
+def delete_missing_rows(cursor, table_name, sync_table, key_columns, sheets, source_file=None):
+    """
+    Delete the rows of the synced sheets whose key is no longer in the workbook.
+
+    Args:
+        cursor: Database cursor.
+        table_name (str): Name of the synced table.
+        sync_table (str): Name of the staging table.
+        key_columns (tuple): Natural key columns.
+        sheets (list): Synced sheet names; rows of other sheets are kept.
+        source_file (str): Only delete rows of this workbook, if the table has a source_file column.
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    matches = " AND ".join(f"staged.{column} = target.{column}" for column in key_columns)
+    statement = (f"DELETE FROM {table_name} AS target WHERE target.source_sheet = ANY(%s)"
+                 f"{' AND target.source_file = %s' if source_file is not None else ''} "
+                 f"AND NOT EXISTS (SELECT 1 FROM {sync_table} AS staged WHERE {matches})")
+    cursor.execute(statement, (list(sheets),) if source_file is None else (list(sheets), source_file))
+    return cursor.rowcount
+
+def sync_table(data, table_name, key_columns, columns, sheets=(), method="copy",
+               chunk_size=pg_bulk_load.DEFAULT_CHUNK_SIZE, isolate_bad_rows=False, delete_missing=False,
+               source_file=None):
+    """
+    Sync a table with the rows of some sheets on a natural key, in one
+    transaction: the rows are bulk-loaded into a temporary table and
+    applied with a single INSERT ... ON CONFLICT DO UPDATE, so a reload
+    updates existing rows instead of appending duplicates, and no
+    statement is issued per row. When the workbook repeats a key, its
+    last row wins.
+
+    Args:
+        data (dict or iterable): Sheet dictionary or stream of (sheet_name, row) records.
+        table_name (str): Name of the table to sync.
+        key_columns (list): Natural key columns, e.g. ["invoice_no", "source_sheet"].
+        columns (list): Columns of the table besides id.
+        sheets (list): Names of the synced sheets, for delete_missing.
+        method (str): Load method for pg_bulk_load.load_data_to_db ("copy" or "batch").
+        chunk_size (int): Number of rows per chunk.
+        isolate_bad_rows (bool): Quarantine failing rows instead of aborting the sync.
+        delete_missing (bool): Also delete rows of the synced sheets that are not in the workbook any more.
+        source_file (str): Value of the source_file column, if the table has one.
+
+    Returns:
+        dict: Sync summary with table, rows, inserted, updated, unchanged,
+            deleted, quarantined, seconds, rows_per_sec and success.
+    """
+    key_columns = tuple(key_columns)
+    summary = {'table': table_name, 'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0,
+               'quarantined': 0, 'seconds': 0.0, 'rows_per_sec': 0.0, 'success': False}
+    start_time = time.perf_counter()
+
+    with pg_dbconnect.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with instrumentation.stage("sync", table=table_name) as stage_metrics:
+                ensure_unique_index(cursor, table_name, key_columns)
+                staging_table = create_sync_table(cursor, table_name)
+                load_summary = pg_bulk_load.load_data_to_db(number_rows(data), staging_table, method=method,
+                                                            chunk_size=chunk_size,
+                                                            isolate_bad_rows=isolate_bad_rows, conn=conn,
+                                                            source_file=source_file)
+                if not load_summary['success']:
+                    raise RuntimeError(f"staging the rows in '{staging_table}' failed")
+
+                cursor.execute(merge_statement(table_name, staging_table, key_columns, columns))
+                inserted, updated, staged = cursor.fetchone()
+                if delete_missing:
+                    summary['deleted'] = delete_missing_rows(cursor, table_name, staging_table, key_columns, sheets,
+                                                             source_file)
+                conn.commit()
+                stage_metrics.add(rows=load_summary['rows'])
+        except Exception as e:
+            logging.error("Syncing table '%s' failed: %s", table_name, e)
+            conn.rollback()
+            return summary
+        finally:
+            cursor.close()
+
+    if load_summary['rows'] > staged:
+        logging.warning("Table '%s': %s staged rows repeat a key and were ignored",
+                        table_name, load_summary['rows'] - staged)
+    summary.update(rows=load_summary['rows'], inserted=inserted, updated=updated, unchanged=staged - inserted - updated,
+                   quarantined=load_summary['quarantined'], success=True)
+    summary['seconds'] = time.perf_counter() - start_time
+    if summary['seconds'] > 0:
+        summary['rows_per_sec'] = summary['rows'] / summary['seconds']
+    for outcome in ('inserted', 'updated', 'unchanged', 'deleted'):
+        instrumentation.count(f"rows_{outcome}", summary[outcome], table=table_name)
+    logging.info("Synced table '%s' on %s: %s inserted, %s updated, %s unchanged, %s deleted, %s quarantined",
+                 table_name, key_columns, inserted, updated, summary['unchanged'], summary['deleted'],
+                 summary['quarantined'])
+    return summary
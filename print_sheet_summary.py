@@ -14,4 +14,31 @@ def print_sheet_summary(data_dict):
         
         if rows:
             print(f"Columns: {list(rows[0].keys())}")
-            print(f"Sample row: {rows[0]}")
\ No newline at end of file
+            print(f"Sample row: {rows[0]}")
+
+def print_workbook_summary(info, header_groups=None):
+    """
+    Print a summary of a workbook from workbook_inspector.inspect_workbook,
+    without its rows having been read
+    """
+    print("\n" + "="*50)
+    print(f"WORKBOOK SUMMARY: {info['file']}")
+    print("="*50)
+    print(f"File size: {info['file_size'] / 1024 / 1024:.2f} MB, "
+          f"sheets uncompressed: {info['uncompressed_size'] / 1024 / 1024:.2f} MB, "
+          f"shared strings: {info['shared_strings_size'] / 1024 / 1024:.2f} MB "
+          f"(inspected in {info['seconds'] * 1000:.0f} ms)")
+
+    for sheet in info['sheets']:
+        print(f"\nSheet: {sheet['name']}")
+        print(f"Estimated rows: {sheet['rows']} (from {sheet['rows_estimated_from']}), columns: {sheet['columns']}")
+        print(f"Size: {sheet['compressed_size'] / 1024:.1f} KB compressed, "
+              f"{sheet['uncompressed_size'] / 1024:.1f} KB uncompressed")
+        if 'headers' in sheet:
+            print(f"Columns: {sheet['headers']}")
+            print(f"Header fingerprint: {sheet['header_fingerprint']}")
+
+    if header_groups:
+        print("\nSheets with the same headers:")
+        for fingerprint, sheets in header_groups.items():
+            print(f"  {fingerprint}: {sheets}")
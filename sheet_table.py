@@ -0,0 +1,157 @@
+# File: sheet_table.py
+
+
+class SheetTable:
+    """
+    Compact columnar storage for the rows of one sheet.
+
+    The header tuple is stored once and the data is kept as one list per
+    column, with a null bitmap per column instead of "" placeholders for
+    empty cells. Iterating or indexing a SheetTable gives row dictionaries
+    shaped like the ones excel_to_dictionary returns, so code written for a
+    list of row dictionaries keeps working.
+
+    When column_types (a type_inference.TypeInferencer) is given, it is
+    updated with every appended row, so the column types are known as soon
+    as the sheet has been read.
+    """
+
+    def __init__(self, headers, column_types=None):
+        self.headers = tuple(headers)
+        self.columns = [[] for _ in self.headers]
+        # One bit per row and column, set when the cell is empty
+        self.null_masks = [bytearray() for _ in self.headers]
+        self.column_types = column_types
+        self._row_count = 0
+
+    @classmethod
+    def from_rows(cls, headers, rows, column_types=None):
+        """
+        Build a SheetTable from row value tuples.
+
+        Args:
+            headers (list): Column headers.
+            rows (iterable): Row value tuples aligned with the headers.
+            column_types (TypeInferencer): Inferencer updated with every row.
+
+        Returns:
+            SheetTable: The new table.
+        """
+        table = cls(headers, column_types)
+        for row in rows:
+            table.append(row)
+        return table
+
+    def append(self, row):
+        """
+        Append one row of values. Missing trailing values and None are stored as nulls.
+
+        Args:
+            row (tuple): Row values aligned with the headers.
+        """
+        row_index = self._row_count
+        byte_index, bit = divmod(row_index, 8)
+        row_length = len(row)
+
+        for col_index, column in enumerate(self.columns):
+            mask = self.null_masks[col_index]
+            if bit == 0:
+                mask.append(0)
+            value = row[col_index] if col_index < row_length else None
+            if value is None:
+                mask[byte_index] |= 1 << bit
+            column.append(value)
+
+        if self.column_types is not None:
+            self.column_types.update_values(self.headers, row)
+        self._row_count += 1
+
+    def is_null(self, col_index, row_index):
+        """Return True if the cell at (col_index, row_index) is empty."""
+        byte_index, bit = divmod(row_index, 8)
+        return bool(self.null_masks[col_index][byte_index] & (1 << bit))
+
+    def column(self, header):
+        """Return the list of values of a column, with None for empty cells."""
+        return self.columns[self.headers.index(header)]
+
+    def row_dict(self, row_index, skip_nulls=False):
+        """
+        Build the dictionary view of one row.
+
+        Args:
+            row_index (int): Index of the row.
+            skip_nulls (bool): Leave empty cells out instead of using "".
+
+        Returns:
+            dict: Row dictionary keyed by header.
+        """
+        byte_index, bit = divmod(row_index, 8)
+        flag = 1 << bit
+        row = {}
+        for header, column, mask in zip(self.headers, self.columns, self.null_masks):
+            if mask[byte_index] & flag:
+                if not skip_nulls:
+                    row[header] = ""
+            else:
+                row[header] = column[row_index]
+        return row
+
+    def iter_dicts(self, skip_nulls=False):
+        """
+        Iterate over the rows as dictionaries.
+
+        Args:
+            skip_nulls (bool): Leave empty cells out instead of using "".
+
+        Yields:
+            dict: Row dictionary keyed by header.
+        """
+        for row_index in range(self._row_count):
+            yield self.row_dict(row_index, skip_nulls)
+
+    def cleaned(self):
+        """
+        Return a table that also treats blank (whitespace-only) values as null,
+        like clean_data_for_insert does for row dictionaries.
+        The column lists are shared with this table; only the null masks are copied.
+
+        Returns:
+            SheetTable: The cleaned table.
+        """
+        table = SheetTable(self.headers, self.column_types)
+        table.columns = self.columns
+        table.null_masks = [bytearray(mask) for mask in self.null_masks]
+        table._row_count = self._row_count
+
+        for column, mask in zip(table.columns, table.null_masks):
+            for row_index, value in enumerate(column):
+                if isinstance(value, str) and value.strip() == '':
+                    byte_index, bit = divmod(row_index, 8)
+                    mask[byte_index] |= 1 << bit
+        return table
+
+    def __len__(self):
+        return self._row_count
+
+    def __iter__(self):
+        return self.iter_dicts()
+
+    def __getitem__(self, row_index):
+        if isinstance(row_index, slice):
+            return [self.row_dict(index) for index in range(*row_index.indices(self._row_count))]
+        if row_index < 0:
+            row_index += self._row_count
+        if not 0 <= row_index < self._row_count:
+            raise IndexError("SheetTable row index out of range")
+        return self.row_dict(row_index)
+
+    def __eq__(self, other):
+        if isinstance(other, SheetTable):
+            return self.headers == other.headers and list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"SheetTable(columns={len(self.headers)}, rows={self._row_count})"
@@ -1,37 +1,61 @@
+import xlsx_fast_reader
+from excel_to_dictionary import build_headers, is_empty_row, row_to_dict
 
 # Alternative function if you want to process just one specific sheet
-def single_sheet_to_dictionary(file_path, sheet_name=None):
+def single_sheet_to_dictionary(file_path, sheet_name=None, min_row=2, max_row=None, columns=None):
     """
     Read a single sheet from Excel file and return list of dictionaries
-    
+
+    Only the XML part of the requested sheet is read, streamed row by row
+    (see xlsx_fast_reader), so a preview or a few columns of one sheet can
+    be pulled out of a large workbook without touching the other sheets.
+    Rows before min_row are skipped without decoding their cells, reading
+    stops after max_row and only the cells of the selected columns are
+    decoded. Headers are built as in iter_sheet_rows: the header row is
+    padded to the width of the sheet's stored dimension.
+
     Args:
         file_path (str): Path to the Excel file
         sheet_name (str): Name of the sheet (if None, uses first sheet)
-    
+        min_row (int): First sheet row to read; row 1 is the header row
+        max_row (int): Last sheet row to read (if None, reads to the end of the sheet)
+        columns (list): Headers of the columns to keep, in the order wanted
+            (if None, keeps every column)
+
     Returns:
-        list: List of dictionaries, one for each row
+        list: List of dictionaries, one for each non-empty row
+
+    Raises:
+        KeyError: If the sheet does not exist
+        ValueError: If a requested column is not a header of the sheet
     """
-    workbook = openpyxl.load_workbook(file_path)
-    
-    # Use first sheet if no sheet name specified
-    if sheet_name is None:
-        worksheet = workbook.active
-    else:
-        worksheet = workbook[sheet_name]
-    
-    # Get headers
-    headers = [str(cell.value).strip() if cell.value else f"Column_{i+1}" 
-               for i, cell in enumerate(worksheet[1])]
-    
-    # Create list of dictionaries
-    data = []
-    for row in worksheet.iter_rows(min_row=2, values_only=True):
-        if any(cell is not None and str(cell).strip() != '' for cell in row):
-            row_dict = {}
-            for i, cell_value in enumerate(row):
-                if i < len(headers):
-                    row_dict[headers[i]] = cell_value if cell_value is not None else ""
-            data.append(row_dict)
-    
-    workbook.close()
-    return data
\ No newline at end of file
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        # Use first sheet if no sheet name specified
+        if sheet_name is None:
+            sheet_name = reader.sheetnames[0]
+
+        # Get headers, as wide as the sheet's stored dimension
+        dimension = reader.dimension(sheet_name)
+        header_row = next(reader.iter_rows(sheet_name, max_row=1), ())
+        if dimension is not None and dimension[3] > len(header_row):
+            header_row = tuple(header_row) + (None,) * (dimension[3] - len(header_row))
+        headers = build_headers(header_row)
+
+        if columns is None:
+            selected = list(range(len(headers)))
+        else:
+            missing = [column for column in columns if column not in headers]
+            if missing:
+                raise ValueError(f"Columns {missing} not found in sheet '{sheet_name}', its headers are {headers}")
+            selected = [headers.index(column) for column in columns]
+        selected_headers = [headers[index] for index in selected]
+        decoded_columns = None if columns is None else {index + 1 for index in selected}
+
+        # Create list of dictionaries
+        data = []
+        for row in reader.iter_rows(sheet_name, min_row=max(min_row, 2), max_row=max_row, columns=decoded_columns):
+            values = tuple(row[index] if index < len(row) else None for index in selected)
+            if not is_empty_row(values):
+                data.append(row_to_dict(selected_headers, values))
+
+    return data
@@ -0,0 +1,121 @@
+# File: synthetic_workbook.py
+import argparse
+import datetime
+import random
+
+import openpyxl
+
+COLUMN_KINDS = ("text", "integer", "decimal", "date", "boolean")
+
+# Relative weight of each column kind when the type mix is not given
+DEFAULT_TYPE_MIX = {"text": 3, "integer": 2, "decimal": 2, "date": 2, "boolean": 1}
+
+CUSTOMERS = ("Acme Ltd", "Globex Corp", "  Initech  ", "Zürich GmbH", "Umbrella plc", "Stark & Sons")
+
+def parse_type_mix(text):
+    """
+    Parse a type mix written as "text=3,integer=2,...".
+
+    Args:
+        text (str): Comma separated kind=weight pairs.
+
+    Returns:
+        dict: Dictionary mapping column kinds to weights.
+    """
+    type_mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in COLUMN_KINDS:
+            raise ValueError(f"Unknown column kind '{kind}', expected one of {COLUMN_KINDS}")
+        type_mix[kind] = float(weight or 1)
+    return type_mix
+
+def choose_column_kinds(columns, type_mix, rng):
+    """
+    Pick the kind of each column. The first column is always an integer
+    invoice number that is never blank, so no generated row is empty.
+
+    Returns:
+        list: Column kinds, one per column.
+    """
+    kinds = [kind for kind in COLUMN_KINDS if type_mix.get(kind, 0) > 0]
+    weights = [type_mix[kind] for kind in kinds]
+    return ["integer"] + rng.choices(kinds, weights, k=columns - 1)
+
+def make_value(kind, row_number, rng):
+    """Generate one cell value of the given kind."""
+    if kind == "text":
+        return rng.choice(CUSTOMERS)
+    if kind == "integer":
+        return rng.randint(-1000, 100000)
+    if kind == "decimal":
+        return round(rng.uniform(0, 10000), 2)
+    if kind == "date":
+        return datetime.datetime(2019, 1, 1) + datetime.timedelta(days=row_number % 1500, hours=row_number % 24)
+    return rng.random() < 0.5
+
+def generate_workbook(file_path, sheets=("2019", "2020", "2021"), rows=1000, columns=10, type_mix=None,
+                      sparsity=0.1, extra_sheets=("Summary",), seed=0):
+    """
+    Write a synthetic multi-sheet workbook shaped like our invoice files.
+
+    The year sheets share one header and column types, so they end up in
+    one schema group; each extra sheet gets its own key/value layout. The
+    workbook is written in write-only mode, so large files can be generated
+    without holding them in memory, and the same seed always gives the
+    same workbook.
+
+    Args:
+        file_path (str): Path of the workbook to write.
+        sheets (tuple): Names of the sheets sharing the invoice schema.
+        rows (int): Number of data rows per sheet.
+        columns (int): Number of columns of the invoice sheets.
+        type_mix (dict): Relative weight of each column kind (see COLUMN_KINDS).
+        sparsity (float): Fraction of cells left blank (never the first column).
+        extra_sheets (tuple): Names of small sheets with a different schema.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: Dictionary mapping sheet names to their number of data rows.
+    """
+    rng = random.Random(seed)
+    kinds = choose_column_kinds(max(1, columns), type_mix or DEFAULT_TYPE_MIX, rng)
+    headers = ["Invoice No"] + [f"{kind.title()} {index}" for index, kind in enumerate(kinds[1:], 1)]
+
+    workbook = openpyxl.Workbook(write_only=True)
+    row_counts = {}
+    for sheet_name in sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append(headers)
+        for row_number in range(1, rows + 1):
+            worksheet.append([row_number] + [None if rng.random() < sparsity else make_value(kind, row_number, rng)
+                                             for kind in kinds[1:]])
+        row_counts[sheet_name] = rows
+
+    for sheet_name in extra_sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append(["Key", "Value"])
+        for year in sheets:
+            worksheet.append([f"total {year}", round(rng.uniform(0, 1e6), 2)])
+        row_counts[sheet_name] = len(sheets)
+
+    workbook.save(file_path)
+    return row_counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic multi-sheet workbook.")
+    parser.add_argument("file_path", help="workbook to write")
+    parser.add_argument("--sheets", default="2019,2020,2021", help="invoice sheet names (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=1000, help="data rows per sheet (default: %(default)s)")
+    parser.add_argument("--columns", type=int, default=10, help="columns per sheet (default: %(default)s)")
+    parser.add_argument("--type-mix", type=parse_type_mix, help="weights such as text=3,integer=2,decimal=2,date=2,boolean=1")
+    parser.add_argument("--sparsity", type=float, default=0.1, help="fraction of blank cells (default: %(default)s)")
+    parser.add_argument("--extra-sheets", default="Summary", help="sheets with another schema (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    args = parser.parse_args()
+
+    row_counts = generate_workbook(args.file_path, sheets=tuple(filter(None, args.sheets.split(","))), rows=args.rows,
+                                   columns=args.columns, type_mix=args.type_mix, sparsity=args.sparsity,
+                                   extra_sheets=tuple(filter(None, args.extra_sheets.split(","))), seed=args.seed)
+    print(f"Wrote {sum(row_counts.values())} rows in {len(row_counts)} sheets to {args.file_path}")
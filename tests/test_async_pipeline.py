@@ -0,0 +1,101 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import async_pipeline
+from workbook_fixtures import build_workbook, invoice_rows
+
+
+class TestAsyncPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, "invoices.xlsx")
+        build_workbook(self.file_path, {"2019": invoice_rows(25), "2020": invoice_rows(25, start=25),
+                                        "Summary": [["Key", "Value"], ["total", 1]]})
+        self.connections = []
+        self.pool_size = 8
+        self.pool_slots = threading.BoundedSemaphore(self.pool_size)
+        for target, side_effect in (("pg_dbconnect.get_pooled_connection", self.new_connection),
+                                    ("pg_dbconnect.release_connection", self.release_connection),
+                                    ("pg_dbconnect.get_pool_size", lambda: self.pool_size)):
+            patcher = mock.patch(target, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def new_connection(self):
+        # Waits for a free slot like the real pool, but gives up instead of hanging the test
+        if not self.pool_slots.acquire(timeout=5):
+            raise RuntimeError("connection pool exhausted")
+        conn = mock.MagicMock()
+        conn.copied = []
+        conn.cursor.return_value.copy_expert.side_effect = lambda sql, data: conn.copied.append(data.read())
+        self.connections.append(conn)
+        return conn
+
+    def release_connection(self, conn):
+        self.pool_slots.release()
+
+    def run_pipeline(self, **kwargs):
+        sheet_tables = {"2019": "invoice_data", "2020": "invoice_data", "Summary": "summary_data"}
+        return asyncio.run(async_pipeline.run_pipeline(self.file_path, sheet_tables, chunk_size=10, queue_size=1,
+                                                       **kwargs))
+
+    def test_rows_reach_their_table_in_one_transaction(self):
+        summaries = self.run_pipeline()
+        self.assertEqual({table: summary['rows'] for table, summary in summaries.items()},
+                         {"invoice_data": 50, "summary_data": 1})
+        self.assertEqual(summaries["invoice_data"]['sheets'], ["2019", "2020"])
+        self.assertTrue(all(summary['success'] for summary in summaries.values()))
+        for conn in self.connections:
+            conn.commit.assert_called_once()
+            conn.rollback.assert_not_called()
+        copied = "".join("".join(conn.copied) for conn in self.connections)
+        self.assertEqual(copied.count('"2020"'), 25)
+
+    def test_reader_failure_rolls_back_every_table(self):
+        with mock.patch("async_pipeline.iter_sheet_rows", side_effect=OSError("unreadable workbook")):
+            summaries = self.run_pipeline()
+        self.assertFalse(any(summary['success'] for summary in summaries.values()))
+        for conn in self.connections:
+            conn.commit.assert_not_called()
+            conn.rollback.assert_called_once()
+
+    def test_clean_failure_rolls_back_every_table_without_hanging(self):
+        prepare_load_row = async_pipeline.pg_bulk_load.prepare_load_row
+
+        def fail_on_2020(sheet_name, raw_row):
+            if sheet_name == "2020":
+                raise ValueError("cannot clean row")
+            return prepare_load_row(sheet_name, raw_row)
+
+        with mock.patch("pg_bulk_load.prepare_load_row", side_effect=fail_on_2020):
+            summaries = self.run_pipeline()
+        self.assertFalse(any(summary['success'] for summary in summaries.values()))
+        for conn in self.connections:
+            conn.commit.assert_not_called()
+            conn.rollback.assert_called_once()
+
+    def test_more_tables_than_pool_connections(self):
+        self.pool_size = 2
+        self.pool_slots = threading.BoundedSemaphore(self.pool_size)
+        # Every table has more chunks than its queue holds, so a writer left without a connection blocks the others
+        file_path = os.path.join(self.temp_dir, "years.xlsx")
+        build_workbook(file_path, {year: invoice_rows(25) for year in ("2019", "2020", "2021")})
+        sheet_tables = {year: f"invoice_data_{year}" for year in ("2019", "2020", "2021")}
+        summaries = asyncio.run(async_pipeline.run_pipeline(file_path, sheet_tables, chunk_size=10, queue_size=1))
+        self.assertEqual({table: summary['rows'] for table, summary in summaries.items()},
+                         {"invoice_data_2019": 25, "invoice_data_2020": 25, "invoice_data_2021": 25})
+        self.assertTrue(all(summary['success'] for summary in summaries.values()))
+        self.assertEqual(len(self.connections), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import batch_ingest
+from workbook_fixtures import build_workbook, invoice_rows
+
+
+class TestBatchIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "2020"))
+        self.small = os.path.join(self.temp_dir, "small.xlsx")
+        self.large = os.path.join(self.temp_dir, "2020", "large.xlsx")
+        build_workbook(self.small, {"Sheet": invoice_rows(5)})
+        build_workbook(self.large, {"Sheet": invoice_rows(100)})
+        open(os.path.join(self.temp_dir, "~$small.xlsx"), "w").close()
+        open(os.path.join(self.temp_dir, "notes.txt"), "w").close()
+        self.state_file = os.path.join(self.temp_dir, "state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_collect_workbooks_from_directory_glob_and_manifest(self):
+        self.assertEqual(batch_ingest.collect_workbooks([self.temp_dir]), [self.large, self.small])
+        manifest = os.path.join(self.temp_dir, "workbooks.txt")
+        with open(manifest, "w", encoding="utf-8") as manifest_file:
+            manifest_file.write("# weekly files\nsmall.xlsx\n")
+        self.assertEqual(batch_ingest.collect_workbooks([manifest, os.path.join(self.temp_dir, "*", "*.xlsx")]),
+                         [self.small, self.large])
+
+    def test_largest_first_then_resume_and_retry_failed(self):
+        order = []
+
+        def fake_ingest(file_path, state, registry, *args):
+            order.append(file_path)
+            status = batch_ingest.FAILED if file_path == self.small else batch_ingest.DONE
+            stat = os.stat(file_path)
+            state.update(file_path, status=status, mtime_ns=stat.st_mtime_ns, file_size=stat.st_size)
+            return status
+
+        with mock.patch("batch_ingest.ingest_workbook", side_effect=fake_ingest):
+            statuses = batch_ingest.run_batch([self.temp_dir], state_file=self.state_file, workers=1)
+            self.assertEqual(order, [self.large, self.small])
+            self.assertEqual(statuses, {self.large: batch_ingest.DONE, self.small: batch_ingest.FAILED})
+
+            # A re-run skips the workbook that is done; --retry-failed runs only the failed one
+            order.clear()
+            batch_ingest.run_batch([self.temp_dir], state_file=self.state_file, workers=1)
+            batch_ingest.run_batch([], state_file=self.state_file, workers=1, retry_failed=True)
+            self.assertEqual(order, [self.small, self.small])
+
+    def test_retry_after_a_partial_failure_loads_the_failed_sheet(self):
+        file_path = os.path.join(self.temp_dir, "years.xlsx")
+        build_workbook(file_path, {"2019": invoice_rows(3), "2020": invoice_rows(3)})
+        manifest = {}
+        loads = []
+
+        def fake_replace(file_path, sheet, table_name, workbook_hash, sheet_hash, **kwargs):
+            loads.append(sheet)
+            success = not (sheet == "2020" and loads.count(sheet) == 1)
+            if success:
+                manifest[sheet] = {'workbook_hash': workbook_hash, 'sheet_hash': sheet_hash,
+                                   'target_table': table_name, 'row_count': 3}
+            return {'table': table_name, 'rows': 3 if success else 0, 'quarantined': 0,
+                    'seconds': 0.0, 'success': success}
+
+        with mock.patch("ingest_manifest.read_manifest", side_effect=lambda path: dict(manifest)), \
+                mock.patch("ingest_manifest.record_unchanged_sheets"), \
+                mock.patch("ingest_manifest.replace_sheet", side_effect=fake_replace), \
+                mock.patch("batch_ingest.create_table_in_db", return_value=True):
+            statuses = batch_ingest.run_batch([file_path], state_file=self.state_file, workers=1)
+            self.assertEqual(statuses, {file_path: batch_ingest.FAILED})
+
+            statuses = batch_ingest.run_batch([], state_file=self.state_file, workers=1, retry_failed=True)
+            self.assertEqual(statuses, {file_path: batch_ingest.DONE})
+            self.assertEqual(loads, ["2019", "2020", "2020"])
+
+            # A retry that finds nothing to load is not a success while a sheet has never been loaded
+            del manifest["2020"]
+            with mock.patch("batch_ingest.ingest_changed_sheets", return_value={}):
+                state = batch_ingest.BatchState(self.state_file)
+                status = batch_ingest.ingest_workbook(file_path, state, batch_ingest.SchemaRegistry(state, "t"))
+            self.assertEqual(status, batch_ingest.FAILED)
+            self.assertIn("2020", state.files[file_path]["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import openpyxl
+
+import benchmark
+from synthetic_workbook import generate_workbook
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_generated_workbook_has_the_requested_shape(self):
+        file_path = os.path.join(self.temp_dir, "synthetic.xlsx")
+        row_counts = generate_workbook(file_path, sheets=("2019", "2020"), rows=50, columns=6,
+                                       type_mix={"decimal": 1}, sparsity=0.5, seed=3)
+        self.assertEqual(row_counts, {"2019": 50, "2020": 50, "Summary": 2})
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        self.assertEqual(workbook.sheetnames, ["2019", "2020", "Summary"])
+        rows = list(workbook["2019"].iter_rows(values_only=True))
+        self.assertEqual(rows[0], ("Invoice No", "Decimal 1", "Decimal 2", "Decimal 3", "Decimal 4", "Decimal 5"))
+        self.assertEqual([row[0] for row in rows[1:]], list(range(1, 51)))
+        cells = [value for row in rows[1:] for value in row[1:]]
+        self.assertTrue(all(value is None or isinstance(value, (int, float)) for value in cells))
+        self.assertTrue(0.3 < cells.count(None) / len(cells) < 0.7)
+        workbook.close()
+
+    def test_stages_run_against_the_stand_in_database(self):
+        scenario = {"sheets": ("2020", "2021"), "rows": 30, "columns": 5, "sparsity": 0.2}
+        result = benchmark.run_benchmark(scenario, self.temp_dir)
+        self.assertEqual(result["rows"], 62)
+        self.assertEqual(tuple(result["stages"]), benchmark.STAGES)
+        self.assertTrue(all(timing["rows_per_sec"] > 0 for timing in result["stages"].values()))
+        self.assertEqual(result["database"], "stand-in")
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "benchmark.json")))
+
+    def test_slower_stage_is_a_regression(self):
+        baseline = {"stages": {"export_to_json": {"rows_per_sec": 1000.0}}, "peak_rss_mb": 100.0}
+        result = {"stages": {"export_to_json": {"rows_per_sec": 900.0}}, "peak_rss_mb": 105.0}
+        self.assertEqual(benchmark.compare_to_baseline(result, baseline), [])
+        result["stages"]["export_to_json"]["rows_per_sec"] = 500.0
+        result["peak_rss_mb"] = 150.0
+        self.assertEqual(len(benchmark.compare_to_baseline(result, baseline)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
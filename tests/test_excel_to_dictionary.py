@@ -0,0 +1,103 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from excel_to_dictionary import ENGINES, excel_to_dictionary, iter_sheet_rows, row_to_dict
+from test_xlsx_fast_reader import build_fixture
+from workbook_fixtures import build_workbook
+
+
+def set_dimension(file_path, ref):
+    """Rewrite the stored <dimension> of every sheet, as a writer that leaves it stale would."""
+    temp_path = file_path + ".tmp"
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(temp_path, "w") as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'<dimension ref="[^"]*" ?/>', f'<dimension ref="{ref}"/>'.encode(), data)
+            target.writestr(item, data)
+    os.replace(temp_path, file_path)
+
+
+class TestParallelParsing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.file_path = os.path.join(cls.temp_dir, "fixture.xlsx")
+        build_fixture(cls.file_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def test_parallel_matches_serial(self):
+        serial = excel_to_dictionary(self.file_path)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                parallel = excel_to_dictionary(self.file_path, parallel=True, workers=2, engine=engine)
+                self.assertEqual(list(parallel), list(serial))
+                self.assertEqual(parallel, serial)
+
+    def test_parallel_tables_match_serial_tables(self):
+        serial = excel_to_dictionary(self.file_path, as_table=True, infer_types=True)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                parallel = excel_to_dictionary(self.file_path, parallel=True, workers=2, engine=engine,
+                                               as_table=True, infer_types=True)
+                self.assertEqual(list(parallel), list(serial))
+                for sheet_name, table in serial.items():
+                    self.assertEqual(parallel[sheet_name], table)
+                    self.assertEqual(
+                        [(header, state.sql_type()) for header, state in parallel[sheet_name].column_types.column_types()],
+                        [(header, state.sql_type()) for header, state in table.column_types.column_types()])
+
+
+class TestStreamingRows(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.file_path = os.path.join(self.temp_dir.name, "ragged.xlsx")
+        build_workbook(self.file_path, {"2019": [["Invoice No", "Customer", "Amount"],
+                                                 [1, "Acme"],
+                                                 [None, None, None],
+                                                 [2],
+                                                 [3, "  ", 7.5]],
+                                        "2020": [["Invoice No"], [4]]})
+
+    def test_short_rows_are_padded_with_empty_strings(self):
+        self.assertEqual(row_to_dict(["a", "b", "c"], (1,)), {"a": 1, "b": "", "c": ""})
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(list(iter_sheet_rows(self.file_path, sheet="2019", engine=engine)), [
+                    ("2019", {"Invoice_No": 1, "Customer": "Acme", "Amount": ""}),
+                    ("2019", {"Invoice_No": 2, "Customer": "", "Amount": ""}),
+                    ("2019", {"Invoice_No": 3, "Customer": "  ", "Amount": 7.5}),
+                ])
+
+    def test_stream_matches_excel_to_dictionary(self):
+        expected = [(sheet_name, row) for sheet_name, rows in excel_to_dictionary(self.file_path).items()
+                    for row in rows]
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(list(iter_sheet_rows(self.file_path, engine=engine)), expected)
+                self.assertEqual(list(iter_sheet_rows(self.file_path, max_rows=1, engine=engine)),
+                                 [expected[0], expected[-1]])
+
+    def test_header_width_follows_the_stored_dimension(self):
+        set_dimension(self.file_path, "A1:E5")
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                rows = list(iter_sheet_rows(self.file_path, sheet="2020", engine=engine))
+                self.assertEqual(rows, [("2020", {"Invoice_No": 4, "Column_2": "", "Column_3": "",
+                                                  "Column_4": "", "Column_5": ""})])
+        # The full load sizes the header from the cells instead
+        self.assertEqual(excel_to_dictionary(self.file_path)["2020"], [{"Invoice_No": 4}])
+
+
+if __name__ == '__main__':
+    unittest.main()
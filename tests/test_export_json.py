@@ -0,0 +1,65 @@
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from export_dict_to_json_file import export_to_json, export_to_jsonl
+
+
+class TestJsonExport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data = {
+            "2019": [{"Invoice_No": 1, "Date": datetime.datetime(2019, 1, 2, 3, 4), "Due": datetime.date(2019, 2, 1)},
+                     {"Invoice_No": 2, "Date": datetime.datetime(2019, 1, 2, 3, 4), "Due": ""}],
+            "Sheet/2": [{"Time": datetime.time(13, 45, 30), "Note": "Zürich"}],
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read_lines(self, file_path, opener=open):
+        with opener(file_path, "rt", encoding="utf-8") as jsonl_file:
+            return [json.loads(line) for line in jsonl_file]
+
+    def test_jsonl_rows_carry_their_sheet(self):
+        output_file = os.path.join(self.temp_dir, "rows.jsonl.gz")
+        row_counts = export_to_json(self.data, output_file, format="jsonl", compression="gzip")
+        self.assertEqual(row_counts, {"2019": 2, "Sheet/2": 1})
+        rows = self.read_lines(output_file, gzip.open)
+        self.assertEqual(rows[0], {"Invoice_No": 1, "Date": "2019-01-02T03:04:00", "Due": "2019-02-01",
+                                   "source_sheet": "2019"})
+        self.assertEqual(rows[2], {"Time": "13:45:30", "Note": "Zürich", "source_sheet": "Sheet/2"})
+
+    def test_jsonl_per_sheet_files(self):
+        output_dir = os.path.join(self.temp_dir, "sheets")
+        export_to_jsonl(iter([("2019", row) for row in self.data["2019"]]), output_dir, per_sheet=True)
+        self.assertEqual(os.listdir(output_dir), ["2019.jsonl"])
+        self.assertEqual(self.read_lines(os.path.join(output_dir, "2019.jsonl"))[1],
+                         {"Invoice_No": 2, "Date": "2019-01-02T03:04:00", "Due": ""})
+
+    def test_jsonl_per_sheet_file_name_collision_is_rejected(self):
+        output_dir = os.path.join(self.temp_dir, "sheets")
+        records = [("Sheet/2", {"Note": "a"}), ("Sheet 2", {"Note": "b"}), ("Sheet/2", {"Note": "c"})]
+        with self.assertRaisesRegex(ValueError, "Sheet_2.jsonl"):
+            export_to_jsonl(iter(records), output_dir, per_sheet=True)
+        self.assertEqual(self.read_lines(os.path.join(output_dir, "Sheet_2.jsonl")), [{"Note": "a"}])
+
+    def test_pretty_format_is_unchanged(self):
+        output_file = os.path.join(self.temp_dir, "pretty.json")
+        export_to_json(self.data, output_file)
+        with open(output_file, encoding="utf-8") as json_file:
+            exported = json.load(json_file)
+        self.assertEqual(exported["Sheet/2"], [{"Time": "13:45:30", "Note": "Zürich"}])
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            export_to_json(self.data, os.path.join(self.temp_dir, "x.json"), format="xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
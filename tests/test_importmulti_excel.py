@@ -0,0 +1,59 @@
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import importmulti_excel
+from excel_to_dictionary import excel_to_dictionary
+from workbook_fixtures import build_workbook
+
+
+@unittest.skipIf(importmulti_excel.pa is None, "pyarrow is not installed")
+class TestImportMultiExcel(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, "orders.xlsx")
+        # The "Codes" column turns from numbers to text after 30 rows
+        orders = [["Order No", "Codes", "Amount", "Ordered", "Paid"]]
+        orders += [[i, i if i <= 30 else f"C-{i}", i * 1.5 if i % 2 else i, datetime.datetime(2020, 1, i % 28 + 1),
+                    i % 3 == 0] for i in range(1, 61)]
+        build_workbook(self.file_path, {"Orders 2020": orders, "Notes": [["Note"]]})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parquet_types_cover_every_row_group(self):
+        import pyarrow.parquet as pq
+        summaries = importmulti_excel.export_workbook(self.file_path, self.temp_dir, format="parquet",
+                                                      workers=1, row_group_size=25)
+        self.assertEqual([summary['rows'] for summary in summaries], [60, 0])
+        table = pq.read_table(summaries[0]['path'])
+        self.assertEqual([str(field.type) for field in table.schema],
+                         ["int64", "string", "double", "date32[day]", "bool"])
+        self.assertEqual(pq.ParquetFile(summaries[0]['path']).num_row_groups, 3)
+
+        expected = excel_to_dictionary(self.file_path)["Orders 2020"]
+        rows = table.to_pylist()
+        self.assertEqual(rows[0]["Codes"], "1")
+        self.assertEqual(rows[-1]["Codes"], expected[-1]["Codes"])
+        self.assertEqual([row["Amount"] for row in rows], [row["Amount"] for row in expected])
+
+    def test_csv_export_with_name_template(self):
+        summaries = importmulti_excel.export_workbook(self.file_path, self.temp_dir, sheets=["Orders 2020"],
+                                                      name_template="{workbook}_{index}_{sheet}.{ext}", workers=1)
+        self.assertEqual(os.path.basename(summaries[0]['path']), "orders_1_Orders_2020.csv")
+        with open(summaries[0]['path'], newline='', encoding='utf-8') as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows[0], ["Order No", "Codes", "Amount", "Ordered", "Paid"])
+        self.assertEqual(len(rows), 61)
+
+    def test_unknown_sheet_is_rejected(self):
+        with self.assertRaises(ValueError):
+            importmulti_excel.export_workbook(self.file_path, self.temp_dir, sheets=["Missing"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import contextlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import excel_to_database
+from ingest_manifest import hash_sheets, plan_ingest, schema_mismatch
+from test_xlsx_fast_reader import convert_to_shared_strings
+from workbook_fixtures import build_workbook
+
+
+class TestIngestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.rows_2019 = [["Invoice No", "Customer"], [1, "Acme"], [2, "Zeta"]]
+        self.rows_2020 = [["Invoice No", "Customer"], [3, "Beta"], [4, "Acme"]]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def build(self, name, sheets, shared_strings=True):
+        file_path = os.path.join(self.temp_dir, name)
+        build_workbook(file_path, sheets)
+        if shared_strings:
+            convert_to_shared_strings(file_path)
+        return file_path
+
+    def test_only_the_edited_sheet_changes_hash(self):
+        before = hash_sheets(self.build("before.xlsx", {"2019": self.rows_2019, "2020": self.rows_2020}))
+        edited_2019 = self.rows_2019 + [[5, "New customer"]]
+        after = hash_sheets(self.build("after.xlsx", {"2019": edited_2019, "2020": self.rows_2020}))
+        self.assertNotEqual(before["2019"], after["2019"])
+        self.assertEqual(before["2020"], after["2020"])
+
+    def test_hash_ignores_shared_string_numbering(self):
+        # The extra sheet comes first, so every string of "2020" gets another shared string index
+        plain = hash_sheets(self.build("plain.xlsx", {"2020": self.rows_2020}))
+        renumbered = hash_sheets(self.build("renumbered.xlsx", {"Notes": [["Zeta"], ["Gamma"]],
+                                                                "2020": self.rows_2020}))
+        self.assertEqual(plain["2020"], renumbered["2020"])
+
+    def test_plan_splits_changed_and_unchanged_sheets(self):
+        file_path = self.build("plan.xlsx", {"2019": self.rows_2019, "2020": self.rows_2020})
+        sheet_hashes = hash_sheets(file_path)
+        manifest = {"2019": {'workbook_hash': "old", 'sheet_hash': sheet_hashes["2019"],
+                             'target_table': "invoice_data_2019_2020", 'row_count': 2}}
+        workbook_hash, planned_hashes, changed, unchanged = plan_ingest(file_path, manifest)
+        self.assertEqual(planned_hashes, sheet_hashes)
+        self.assertEqual(changed, ["2020"])
+        self.assertEqual(unchanged, ["2019"])
+
+        manifest["2019"]['workbook_hash'] = workbook_hash
+        manifest["2020"] = dict(manifest["2019"], sheet_hash=sheet_hashes["2020"])
+        self.assertEqual(plan_ingest(file_path, manifest)[2:], ([], ["2019", "2020"]))
+
+    def test_sheet_without_entry_is_planned_though_the_workbook_is_unchanged(self):
+        file_path = self.build("partial.xlsx", {"2019": self.rows_2019, "2020": self.rows_2020})
+        workbook_hash, sheet_hashes, _, _ = plan_ingest(file_path, {})
+        manifest = {"2019": {'workbook_hash': workbook_hash, 'sheet_hash': sheet_hashes["2019"],
+                             'target_table': "invoice_data", 'row_count': 2}}
+        self.assertEqual(plan_ingest(file_path, manifest)[2:], (["2020"], ["2019"]))
+
+    def test_failed_sheet_is_reloaded_on_the_next_run(self):
+        file_path = self.build("retry.xlsx", {"2019": self.rows_2019, "2020": self.rows_2020,
+                                              "Notes": [["Note"]]})
+        manifest = {}
+        loads = []
+
+        def fake_record_without_rows(file_path, sheet_names, workbook_hash, sheet_hashes):
+            for sheet in sheet_names:
+                manifest[sheet] = {'workbook_hash': workbook_hash, 'sheet_hash': sheet_hashes[sheet],
+                                   'target_table': "", 'row_count': 0}
+
+        def fake_replace(file_path, sheet, table_name, workbook_hash, sheet_hash, **kwargs):
+            loads.append(sheet)
+            success = not (sheet == "2020" and loads.count(sheet) == 1)
+            if success:
+                manifest[sheet] = {'workbook_hash': workbook_hash, 'sheet_hash': sheet_hash,
+                                   'target_table': table_name, 'row_count': 2}
+            return {'table': table_name, 'rows': 2 if success else 0, 'quarantined': 0,
+                    'seconds': 0.0, 'success': success}
+
+        with mock.patch("ingest_manifest.read_manifest", side_effect=lambda path: dict(manifest)), \
+                mock.patch("ingest_manifest.record_unchanged_sheets"), \
+                mock.patch("ingest_manifest.replace_sheet", side_effect=fake_replace), \
+                mock.patch("ingest_manifest.record_sheets_without_rows", side_effect=fake_record_without_rows), \
+                mock.patch("excel_to_database.create_tables_for_schema_groups",
+                           side_effect=lambda groups, base, **kwargs: {key: base for key in groups}):
+            first = excel_to_database.ingest_changed_sheets(file_path, "invoice_data", max_workers=1)
+            self.assertFalse(first["invoice_data"]['success'])
+            self.assertEqual(sorted(manifest), ["2019", "Notes"])
+
+            second = excel_to_database.ingest_changed_sheets(file_path, "invoice_data", max_workers=1)
+            self.assertTrue(second["invoice_data"]['success'])
+            self.assertEqual(loads, ["2019", "2020", "2020"])
+
+            self.assertEqual(excel_to_database.ingest_changed_sheets(file_path, "invoice_data"), {})
+            self.assertEqual(loads, ["2019", "2020", "2020"])
+
+    def test_schema_mismatch_names_the_columns(self):
+        data_types = {"id": "integer", "source_sheet": "text", "invoice_no": "bigint", "customer": "text",
+                      "due": "date"}
+        self.assertIsNone(schema_mismatch((("invoice_no", "BIGINT"), ("customer", "DECIMAL"), ("due", "NULL")),
+                                          data_types))
+        self.assertEqual(schema_mismatch((("invoice_no", "DECIMAL"), ("customer", "TEXT"), ("amount", "DECIMAL")),
+                                         data_types),
+                         "columns not in the table: amount; incompatible columns: invoice_no (DECIMAL into bigint)")
+
+    def test_sheet_that_no_longer_fits_its_table_is_reported_not_loaded(self):
+        file_path = self.build("widened.xlsx", {"2019": [["Invoice No", "Customer", "Amount"], [1, "Acme", 2.5]]})
+        manifest = {"2019": {'workbook_hash': "old", 'sheet_hash': "old", 'target_table': "invoice_data",
+                             'row_count': 2}}
+        data_types = {"id": "integer", "source_sheet": "text", "invoice_no": "bigint", "customer": "text"}
+
+        with mock.patch("ingest_manifest.read_manifest", return_value=manifest), \
+                mock.patch("ingest_manifest.record_unchanged_sheets"), \
+                mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(mock.MagicMock())), \
+                mock.patch("ingest_manifest.table_data_types", return_value=data_types) as table_data_types, \
+                mock.patch("ingest_manifest.replace_sheet") as replace_sheet, \
+                self.assertLogs(level="ERROR") as logs:
+            summaries = excel_to_database.ingest_changed_sheets(file_path, "invoice_data", max_workers=1)
+
+        replace_sheet.assert_not_called()
+        self.assertEqual(table_data_types.call_args.args[1], "invoice_data")
+        self.assertFalse(summaries["invoice_data"]['success'])
+        self.assertEqual(summaries["invoice_data"]['sheets'], ["2019"])
+        self.assertIn("columns not in the table: amount", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import instrumentation
+import pg_bulk_load
+from excel_to_database import group_sheets_by_schema
+from excel_to_dictionary import excel_to_dictionary, iter_sheet_rows
+from test_xlsx_fast_reader import build_fixture
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        instrumentation.start_run()
+        shutil.rmtree(self.temp_dir)
+
+    def test_stages_and_counters_in_the_json_report(self):
+        metrics = instrumentation.start_run()
+        with instrumentation.stage("load", table="invoice_data") as stage_metrics:
+            stage_metrics.add(rows=100, bytes_read=2048)
+            time.sleep(0.01)
+        instrumentation.count("rows_loaded", 100, table="invoice_data")
+        instrumentation.count("rows_loaded", 20, table="invoice_data")
+        with self.assertRaises(ValueError):
+            with instrumentation.stage("parse", sheet="2020"):
+                raise ValueError("bad cell")
+
+        report_file = os.path.join(self.temp_dir, "report.json")
+        metrics.write_report(report_file)
+        with open(report_file, encoding="utf-8") as file:
+            report = json.load(file)
+        load, parse = report["stages"]
+        self.assertEqual((load["stage"], load["labels"], load["rows"], load["bytes_read"]),
+                         ("load", {"table": "invoice_data"}, 100, 2048))
+        self.assertTrue(0 < load["rows_per_sec"] < 100 / 0.01)
+        self.assertEqual(parse["error"], "ValueError: bad cell")
+        self.assertEqual(report["counters"], [{"name": "rows_loaded", "labels": {"table": "invoice_data"}, "value": 120}])
+
+    def test_prometheus_text_sums_runs_of_a_stage(self):
+        metrics = instrumentation.start_run()
+        for rows in (10, 32):
+            with metrics.stage("load", table='odd "name"') as stage_metrics:
+                stage_metrics.add(rows=rows)
+        metrics.count("rows_quarantined", 3, table="invoice_data")
+        text = metrics.prometheus_text()
+        self.assertIn('excel_ingest_stage_rows_total{stage="load",table="odd \\"name\\""} 42', text)
+        self.assertIn('excel_ingest_rows_quarantined_total{table="invoice_data"} 3', text)
+        self.assertIn("# TYPE excel_ingest_stage_seconds_total counter", text)
+
+    def test_parse_stages_per_sheet_and_profiles(self):
+        file_path = os.path.join(self.temp_dir, "fixture.xlsx")
+        build_fixture(file_path)
+        for profile, extension in (("cprofile", ".prof"), ("sampling", ".folded")):
+            profile_dir = os.path.join(self.temp_dir, profile)
+            metrics = instrumentation.start_run(profile=profile, profile_dir=profile_dir, sample_interval=0.001)
+            with metrics.stage("read"):
+                excel_to_dictionary(file_path, engine="xml")
+            parse_rows = {stage.labels["sheet"]: stage.rows for stage in metrics.stages if stage.name == "parse"}
+            self.assertEqual(parse_rows, {"2019": 40, "2020": 40, "Formats": 1, "Empty": 0})
+            # Only the outermost stage of the thread is profiled
+            self.assertEqual(os.listdir(profile_dir), ["read-0" + extension])
+
+    def test_memory_limit_stops_a_load_between_chunks(self):
+        instrumentation.start_run()
+        instrumentation.check_memory("no limit")
+        metrics = instrumentation.start_run(memory_limit_mb=1)
+        self.assertGreater(instrumentation.current_rss_mb(), 1)
+        with self.assertRaises(instrumentation.MemoryLimitExceeded):
+            instrumentation.check_memory("test")
+
+        conn = mock.MagicMock()
+        data = {"2019": [{"Invoice No": index} for index in range(10)]}
+        summary = pg_bulk_load.load_data_to_db(data, "invoice_data", chunk_size=4, conn=conn)
+        self.assertFalse(summary['success'])
+        conn.cursor.return_value.copy_expert.assert_not_called()
+        report = metrics.report()
+        self.assertEqual(report["memory_limit_mb"], 1)
+        self.assertEqual(report["counters"][0]["name"], "memory_limit_exceeded")
+        self.assertIn("excel_ingest_memory_limit_bytes 1048576", metrics.prometheus_text())
+
+    def test_streamed_schema_sample_is_taken_one_sheet_at_a_time(self):
+        file_path = os.path.join(self.temp_dir, "fixture.xlsx")
+        build_fixture(file_path)
+        sampled = []
+        with mock.patch("instrumentation.check_memory", side_effect=sampled.append):
+            schema_groups = group_sheets_by_schema(iter_sheet_rows(file_path, max_rows=5))
+        self.assertEqual(sampled, [f"Sampling sheet '{sheet}'" for sheet in ("2019", "2020", "Formats")])
+        year_group = next(group for group in schema_groups.values() if "2019" in group['sheets'])
+        self.assertEqual(year_group['sheets'], ["2019", "2020"])
+        self.assertEqual(len(year_group['sample_data']["2019"]), 5)
+        self.assertNotIn('data', year_group)
+
+
+if __name__ == '__main__':
+    unittest.main()
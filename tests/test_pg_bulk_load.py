@@ -0,0 +1,227 @@
+import contextlib
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import psycopg2
+
+import pg_bulk_load
+from excel_to_database import load_schema_groups
+
+
+class FakeCursor:
+    """Cursor that records statements and fails every load containing a row with a bad amount."""
+
+    def __init__(self):
+        self.statements = []
+        self.loaded = []
+        self.pending = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement)
+        if statement == "SAVEPOINT load_chunk":
+            self.pending.append([])
+        elif statement == "ROLLBACK TO SAVEPOINT load_chunk":
+            self.pending[-1] = []
+        elif statement == "RELEASE SAVEPOINT load_chunk":
+            rows = self.pending.pop()
+            (self.pending[-1] if self.pending else self.loaded).extend(rows)
+
+    def load_bucket(self, cursor, columns, rows):
+        if any(row.get("amount") == "bad" for row in rows):
+            raise psycopg2.DataError("invalid input syntax for type numeric: \"bad\"\n")
+        self.pending[-1].extend(rows)
+
+
+class TestCopyRows(unittest.TestCase):
+
+    def copied(self, rows):
+        """Run copy_rows on the buckets of rows and return (statement, CSV text) per COPY."""
+        cursor = mock.MagicMock()
+        cursor.copy_expert.side_effect = lambda statement, buffer: copies.append((statement, buffer.read()))
+        copies = []
+        for columns, bucket in pg_bulk_load.bucket_rows_by_signature(rows).values():
+            pg_bulk_load.copy_rows(cursor, "invoice_data", columns, bucket)
+        return copies
+
+    def test_empty_cells_are_left_out_so_they_get_null_or_default(self):
+        rows = [pg_bulk_load.prepare_load_row("2019", {"Invoice No": 1, "Customer": "  ", "Amount": None}),
+                pg_bulk_load.prepare_load_row("2019", {"Invoice No": 2, "Customer": "", "Amount": 0})]
+        self.assertEqual(self.copied(rows), [
+            ("COPY invoice_data (invoice_no, source_sheet) FROM STDIN WITH (FORMAT csv)", '"1","2019"\n'),
+            ("COPY invoice_data (invoice_no, amount, source_sheet) FROM STDIN WITH (FORMAT csv)", '"2","0","2019"\n'),
+        ])
+
+    def test_values_are_quoted_and_formatted(self):
+        rows = [{"customer": 'Acme, "Ltd"\nZürich', "paid": True, "due": datetime.date(2019, 2, 1),
+                 "invoice_date": datetime.datetime(2019, 1, 2, 3, 4, 5), "at": datetime.time(13, 45),
+                 "note": "", "source_sheet": "2019"}]
+        [(statement, text)] = self.copied(rows)
+        self.assertEqual(statement, "COPY invoice_data (customer, paid, due, invoice_date, at, note, source_sheet) "
+                                    "FROM STDIN WITH (FORMAT csv)")
+        # Every value is quoted, so an empty string is "" and never the unquoted NULL marker
+        self.assertEqual(text, '"Acme, ""Ltd""\nZürich","true","2019-02-01","2019-01-02 03:04:05","13:45:00","","2019"\n')
+
+    def test_rows_are_bucketed_by_column_set_in_first_seen_order(self):
+        rows = [{"a": 1, "b": 2}, {"a": 3}, {"b": 4, "a": 5}]
+        buckets = pg_bulk_load.bucket_rows_by_signature(rows)
+        self.assertEqual([columns for columns, _ in buckets.values()], [("a", "b"), ("a",)])
+        self.assertEqual(self.copied(rows)[0][1], '"1","2"\n"5","4"\n')
+
+
+class TestBatchInsert(unittest.TestCase):
+
+    def setUp(self):
+        self.cursor = mock.MagicMock()
+        self.cursor.connection.encoding = "UTF8"
+        self.cursor.mogrify.side_effect = lambda template, args: repr(tuple(args)).encode()
+
+    def test_rows_are_sent_page_size_rows_per_insert(self):
+        rows = [{"invoice_no": index, "customer": f"Customer {index}", "source_sheet": "2019"} for index in range(5)]
+        pg_bulk_load.insert_rows(self.cursor, "invoice_data", ("customer", "invoice_no", "source_sheet"), rows,
+                                 page_size=2)
+        statements = [call.args[0].decode() for call in self.cursor.execute.call_args_list]
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(statements[0], "INSERT INTO invoice_data (customer, invoice_no, source_sheet) VALUES "
+                                        "('Customer 0', 0, '2019'),('Customer 1', 1, '2019')")
+        self.assertEqual(statements[2], "INSERT INTO invoice_data (customer, invoice_no, source_sheet) VALUES "
+                                        "('Customer 4', 4, '2019')")
+
+    def test_each_signature_gets_its_own_insert(self):
+        load_bucket = pg_bulk_load.get_bucket_loader("invoice_data", method="batch", page_size=100)
+        chunk = [{"invoice_no": 1, "source_sheet": "2019"}, {"invoice_no": 2, "amount": 1.5, "source_sheet": "2019"},
+                 {"invoice_no": 3, "source_sheet": "2019"}]
+        loaded, quarantined = pg_bulk_load.load_chunk(self.cursor, "invoice_data", chunk, load_bucket)
+        self.assertEqual((loaded, quarantined), (3, 0))
+        statements = [call.args[0].decode() for call in self.cursor.execute.call_args_list]
+        self.assertEqual(statements, [
+            "INSERT INTO invoice_data (invoice_no, source_sheet) VALUES (1, '2019'),(3, '2019')",
+            "INSERT INTO invoice_data (invoice_no, amount, source_sheet) VALUES (2, 1.5, '2019')",
+        ])
+
+    def test_statement_cache_is_bounded(self):
+        pg_bulk_load.get_insert_statement.cache_clear()
+        for index in range(pg_bulk_load.INSERT_STATEMENT_CACHE_SIZE + 10):
+            pg_bulk_load.get_insert_statement(f"table_{index}", ("a", "b"))
+        self.assertEqual(pg_bulk_load.get_insert_statement.cache_info().currsize,
+                         pg_bulk_load.INSERT_STATEMENT_CACHE_SIZE)
+
+
+class TestIsolatingBadRows(unittest.TestCase):
+
+    def rows(self, bad_indexes, count=8):
+        return [{"invoice_no": index, "amount": "bad" if index in bad_indexes else index * 1.5,
+                 "source_sheet": "2019"} for index in range(count)]
+
+    def test_clean_chunk_is_loaded_in_one_savepoint(self):
+        cursor = FakeCursor()
+        loaded, bad_rows = pg_bulk_load.load_chunk_isolating_bad_rows(cursor, self.rows(()), cursor.load_bucket)
+        self.assertEqual((loaded, bad_rows), (8, []))
+        self.assertEqual(cursor.statements, ["SAVEPOINT load_chunk", "RELEASE SAVEPOINT load_chunk"])
+        self.assertEqual([row["invoice_no"] for row in cursor.loaded], list(range(8)))
+
+    def test_bad_rows_are_bisected_out(self):
+        cursor = FakeCursor()
+        chunk = self.rows({2, 7})
+        loaded, bad_rows = pg_bulk_load.load_chunk_isolating_bad_rows(cursor, chunk, cursor.load_bucket)
+
+        self.assertEqual(loaded, 6)
+        self.assertEqual([row["invoice_no"] for row, _ in bad_rows], [2, 7])
+        self.assertEqual(bad_rows[0][1], "invalid input syntax for type numeric: \"bad\"")
+        self.assertEqual(sorted(row["invoice_no"] for row in cursor.loaded), [0, 1, 3, 4, 5, 6])
+        self.assertEqual(cursor.statements.count("SAVEPOINT load_chunk"),
+                         cursor.statements.count("RELEASE SAVEPOINT load_chunk"))
+
+    def test_every_row_bad(self):
+        cursor = FakeCursor()
+        loaded, bad_rows = pg_bulk_load.load_chunk_isolating_bad_rows(cursor, self.rows(set(range(3)), 3),
+                                                                      cursor.load_bucket)
+        self.assertEqual(loaded, 0)
+        self.assertEqual(len(bad_rows), 3)
+        self.assertEqual(cursor.loaded, [])
+
+    def test_bad_rows_go_to_the_quarantine_table(self):
+        cursor = mock.MagicMock()
+        bad_rows = [({"invoice_no": 2, "amount": "bad", "source_sheet": "2019"}, "invalid input")]
+        with mock.patch("pg_bulk_load.execute_values") as execute_values:
+            pg_bulk_load.quarantine_rows(cursor, "invoice_data", bad_rows)
+        self.assertIn("CREATE TABLE IF NOT EXISTS invoice_data_quarantine", cursor.execute.call_args.args[0])
+        statement, values = execute_values.call_args.args[1:]
+        self.assertEqual(statement,
+                         "INSERT INTO invoice_data_quarantine (source_sheet, row_data, error) VALUES %s")
+        self.assertEqual(values, [("2019", json.dumps(bad_rows[0][0]), "invalid input")])
+
+
+class TestQuarantineTables(unittest.TestCase):
+
+    def test_quarantine_tables_are_created_once_in_one_transaction(self):
+        conn = mock.MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        with mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(conn)):
+            self.assertTrue(pg_bulk_load.create_quarantine_tables(["invoice_data", "notes", "invoice_data"]))
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(len(statements), 2)
+        self.assertIn("CREATE TABLE IF NOT EXISTS invoice_data_quarantine", statements[0])
+        self.assertIn("CREATE TABLE IF NOT EXISTS notes_quarantine", statements[1])
+        conn.commit.assert_called_once_with()
+
+    def test_per_sheet_loads_start_after_the_quarantine_tables_exist(self):
+        data = {"2019": [{"Invoice No": 1}], "2020": [{"Invoice No": 2}]}
+        schema_groups = {"key": {'sheets': ["2019", "2020"], 'data': data}}
+        calls = []
+
+        def fake_load(data, table_name, **kwargs):
+            calls.append(("load", table_name))
+            return {'table': table_name, 'rows': 1, 'quarantined': 0, 'seconds': 0.1, 'success': True}
+
+        with mock.patch("pg_bulk_load.load_data_to_db", side_effect=fake_load), \
+                mock.patch("pg_bulk_load.create_quarantine_tables",
+                           side_effect=lambda table_names: calls.append(("create", list(table_names)))):
+            load_schema_groups(schema_groups, {"key": "invoice_data"}, per_sheet=True, isolate_bad_rows=True)
+        self.assertEqual(calls[0], ("create", ["invoice_data", "invoice_data"]))
+        self.assertEqual(calls[1:], [("load", "invoice_data")] * 2)
+
+
+class TestQuarantineFile(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.quarantine_file = os.path.join(self.temp_dir.name, "quarantine.jsonl")
+        self.cursor = FakeCursor()
+        self.conn = mock.MagicMock()
+        self.conn.cursor.return_value = self.cursor
+        self.cursor.close = mock.MagicMock()
+        self.data = {"2019": [{"Invoice No": 1, "Amount": 1.5}, {"Invoice No": 2, "Amount": "bad"}]}
+
+    def load(self):
+        with mock.patch("pg_dbconnect.get_pooled_connection", return_value=self.conn), \
+                mock.patch("pg_dbconnect.release_connection"), \
+                mock.patch("pg_bulk_load.get_bucket_loader", return_value=self.cursor.load_bucket):
+            return pg_bulk_load.load_data_to_db(self.data, "invoice_data", isolate_bad_rows=True,
+                                                quarantine_file=self.quarantine_file)
+
+    def test_file_is_written_after_the_commit(self):
+        self.conn.commit.side_effect = lambda: self.assertFalse(os.path.exists(self.quarantine_file))
+        summary = self.load()
+        self.assertTrue(summary["success"])
+        self.assertEqual((summary["rows"], summary["quarantined"]), (1, 1))
+        with open(self.quarantine_file, encoding="utf-8") as quarantine:
+            records = [json.loads(line) for line in quarantine]
+        self.assertEqual(records, [{"table": "invoice_data", "source_sheet": "2019",
+                                    "row": {"invoice_no": 2, "amount": "bad", "source_sheet": "2019"},
+                                    "error": "invalid input syntax for type numeric: \"bad\""}])
+
+    def test_rolled_back_load_writes_nothing(self):
+        self.conn.commit.side_effect = psycopg2.OperationalError("server closed the connection")
+        summary = self.load()
+        self.assertFalse(summary["success"])
+        self.conn.rollback.assert_called_once_with()
+        self.assertFalse(os.path.exists(self.quarantine_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import psycopg2
+from psycopg2 import extensions
+
+import pg_dbconnect
+
+
+class TestPgDbconnect(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_class = mock.patch("psycopg2.pool.ThreadedConnectionPool").start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(pg_dbconnect.close_pool)
+
+    def test_concurrent_first_use_creates_one_pool(self):
+        def slow_pool(minconn, maxconn, **settings):
+            time.sleep(0.05)
+            return mock.MagicMock(maxconn=maxconn)
+        self.pool_class.side_effect = slow_pool
+
+        pools = []
+        threads = [threading.Thread(target=lambda: pools.append(pg_dbconnect.get_pool())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.pool_class.call_count, 1)
+        self.assertEqual(len({id(connection_pool) for connection_pool in pools}), 1)
+        pools[0].closeall.assert_not_called()
+
+    def test_connection_that_fails_to_roll_back_is_closed_and_its_slot_freed(self):
+        connection_pool = pg_dbconnect.create_pool(minconn=1, maxconn=1, health_check=False)
+        connection = connection_pool.getconn.return_value
+        connection.closed = 0
+        connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INERROR
+        connection.rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+
+        self.assertIs(pg_dbconnect.get_pooled_connection(), connection)
+        pg_dbconnect.release_connection(connection)
+
+        connection_pool.putconn.assert_called_once_with(connection, close=True)
+        # The only slot is free again
+        self.assertIs(pg_dbconnect.get_pooled_connection(), connection)
+
+    def test_rolled_back_connection_is_kept_in_the_pool(self):
+        connection_pool = pg_dbconnect.create_pool(minconn=1, maxconn=1, health_check=False)
+        connection = connection_pool.getconn.return_value
+        connection.closed = 0
+        connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+
+        pg_dbconnect.release_connection(pg_dbconnect.get_pooled_connection())
+
+        connection.rollback.assert_called_once_with()
+        connection_pool.putconn.assert_called_once_with(connection, close=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
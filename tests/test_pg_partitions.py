@@ -0,0 +1,84 @@
+import contextlib
+import datetime
+import unittest
+from unittest import mock
+
+import ingest_manifest
+import pg_partitions
+from excel_to_database import create_table_statement, load_schema_groups, sheet_table_mapping
+
+
+class TestPgPartitions(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {
+            "2019": [{"Invoice No": 1, "Invoice Date": datetime.date(2019, 5, 1)}],
+            "2020": [{"Invoice No": 2, "Invoice Date": datetime.date(2020, 5, 1)}],
+        }
+
+    def test_partitioned_parent_statement(self):
+        statement = create_table_statement(self.data, "invoice_data_2019_2020", partition_by_sheet=True)
+        self.assertIn("id SERIAL,", statement)
+        self.assertIn("source_sheet TEXT NOT NULL", statement)
+        self.assertIn("PRIMARY KEY (id, source_sheet)", statement)
+        self.assertTrue(statement.endswith(") PARTITION BY LIST (source_sheet);"))
+        self.assertIn("id SERIAL PRIMARY KEY", create_table_statement(self.data, "invoice_data_2019_2020"))
+
+    def test_partitioned_group_loads_each_sheet_into_its_partition(self):
+        schema_groups = {"key": {'sheets': ["2019", "2020"], 'data': self.data, 'partitioned': True}}
+        table_mapping = {"key": "invoice_data_2019_2020"}
+        self.assertEqual(sheet_table_mapping(schema_groups, table_mapping),
+                         {"2019": "invoice_data_2019_2020_p2019", "2020": "invoice_data_2019_2020_p2020"})
+
+        def fake_load(data, table_name, **kwargs):
+            return {'table': table_name, 'rows': len(next(iter(data.values()))), 'quarantined': 0,
+                    'seconds': 0.1, 'success': True}
+
+        with mock.patch("pg_bulk_load.load_data_to_db", side_effect=fake_load) as load:
+            summaries = load_schema_groups(schema_groups, table_mapping)
+        self.assertEqual(sorted(call.args[1] for call in load.call_args_list),
+                         ["invoice_data_2019_2020_p2019", "invoice_data_2019_2020_p2020"])
+        self.assertEqual(summaries["invoice_data_2019_2020_p2020"]['sheets'], ["2020"])
+
+    def test_swap_detaches_the_old_partition_and_attaches_the_staged_one(self):
+        cursor = mock.MagicMock()
+        cursor.fetchone.return_value = (1,)
+        staging = pg_partitions.create_staging_partition(cursor, "invoice_data", "FY 2020")
+        self.assertEqual(staging, "invoice_data_pfy_2020_staging")
+        pg_partitions.swap_partition(cursor, "invoice_data", "FY 2020", staging)
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements[-4:], [
+            "ALTER TABLE invoice_data DETACH PARTITION invoice_data_pfy_2020",
+            "DROP TABLE IF EXISTS invoice_data_pfy_2020",
+            "ALTER TABLE invoice_data_pfy_2020_staging RENAME TO invoice_data_pfy_2020",
+            "ALTER TABLE invoice_data ATTACH PARTITION invoice_data_pfy_2020 FOR VALUES IN (%s)",
+        ])
+        self.assertEqual(cursor.execute.call_args_list[-1].args[1], ("FY 2020",))
+
+    def test_staging_table_is_committed_before_the_load(self):
+        # CREATE TABLE ... LIKE locks the parent until commit; holding it through the load would
+        # deadlock against the DETACH of another sheet's swap
+        conn = mock.MagicMock()
+        events = []
+        conn.commit.side_effect = lambda: events.append("commit")
+        cursor = conn.cursor.return_value
+        cursor.execute.side_effect = lambda statement, *args: events.append(statement.split(" (")[0])
+        cursor.fetchone.side_effect = [('p',), None]
+
+        def fake_load(records, table_name, **kwargs):
+            events.append(f"load {table_name}")
+            return {'table': table_name, 'rows': 1, 'quarantined': 0, 'seconds': 0.0, 'success': True}
+
+        with mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(conn)), \
+                mock.patch("pg_bulk_load.load_data_to_db", side_effect=fake_load):
+            summary = ingest_manifest.replace_sheet("book.xlsx", "2020", "invoice_data", "w", "s")
+        self.assertTrue(summary['success'])
+        created = events.index("CREATE TABLE invoice_data_p2020_staging")
+        loaded = events.index("load invoice_data_p2020_staging")
+        self.assertIn("commit", events[created:loaded])
+        self.assertNotIn("commit", events[loaded:-1])
+        self.assertEqual(events[-1], "commit")
+
+
+if __name__ == '__main__':
+    unittest.main()
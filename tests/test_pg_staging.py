@@ -0,0 +1,77 @@
+import contextlib
+import unittest
+from unittest import mock
+
+import pg_staging
+from excel_to_database import create_table_statement, fast_load_schema_groups
+
+
+class TestPgStaging(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {"2019": [{"Invoice No": 1, "Customer": "Acme"}], "2020": [{"Invoice No": 2, "Customer": "Zeta"}]}
+        self.schema_groups = {"key": {'sheets': ["2019", "2020"], 'schema': (('invoice_no', 'BIGINT'), ('customer', 'TEXT')),
+                                      'sample_data': {"2019": self.data["2019"]}, 'data': self.data}}
+
+    def test_staging_table_is_unlogged_without_primary_key(self):
+        statement = create_table_statement(self.data, "invoice_data_staging", staging=True)
+        self.assertTrue(statement.startswith("CREATE UNLOGGED TABLE invoice_data_staging ("))
+        self.assertIn("id SERIAL,", statement)
+        self.assertNotIn("PRIMARY KEY", statement)
+
+    def test_finalize_builds_indexes_then_swaps(self):
+        conn = mock.MagicMock()
+        cursor = conn.cursor.return_value
+        with mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(conn)):
+            self.assertTrue(pg_staging.finalize_staging_table("invoice_data", ["id", "source_sheet", "customer"],
+                                                              indexes=["source_sheet", ("customer", "missing")]))
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements, [
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            "ALTER TABLE invoice_data_staging ADD PRIMARY KEY (id)",
+            "CREATE INDEX invoice_data_staging_source_sheet_idx ON invoice_data_staging (source_sheet)",
+            "ALTER TABLE invoice_data_staging SET LOGGED",
+            "ANALYZE invoice_data_staging",
+            "DROP TABLE IF EXISTS invoice_data",
+            "ALTER TABLE invoice_data_staging RENAME TO invoice_data",
+            "ALTER TABLE invoice_data RENAME CONSTRAINT invoice_data_staging_pkey TO invoice_data_pkey",
+            "ALTER SEQUENCE IF EXISTS invoice_data_staging_id_seq RENAME TO invoice_data_id_seq",
+            "ALTER INDEX invoice_data_staging_source_sheet_idx RENAME TO invoice_data_source_sheet_idx",
+        ])
+        self.assertEqual(conn.commit.call_count, 2)
+
+    def test_fast_load_swaps_only_successful_loads(self):
+        for success, finalized in ((True, True), (False, False)):
+            summary = {'table': "invoice_data_2019_2020_staging", 'rows': 2 if success else 0, 'quarantined': 0,
+                       'seconds': 0.1, 'success': success}
+            with mock.patch("excel_to_database.create_table_in_db", return_value=True) as create, \
+                    mock.patch("pg_bulk_load.load_data_to_db", return_value=summary) as load, \
+                    mock.patch("pg_staging.finalize_staging_table", return_value=True) as finalize, \
+                    mock.patch("pg_staging.drop_staging_table") as drop:
+                summaries = fast_load_schema_groups(self.schema_groups, "invoice_data", indexes=["source_sheet"])
+            self.assertEqual(create.call_args.args[1], "invoice_data_2019_2020_staging")
+            self.assertTrue(create.call_args.kwargs['staging'])
+            self.assertEqual(load.call_args.args[1], "invoice_data_2019_2020_staging")
+            self.assertEqual(list(summaries), ["invoice_data_2019_2020"])
+            self.assertEqual(finalize.called, finalized)
+            self.assertEqual(drop.called, not finalized)
+            if finalized:
+                self.assertEqual(finalize.call_args.args[:3], ("invoice_data_2019_2020",
+                                                              ["id", "source_sheet", "invoice_no", "customer"],
+                                                              ["source_sheet"]))
+
+    def test_partitioned_tables_are_not_replaced(self):
+        conn = mock.MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchone.return_value = ('p',)
+        with mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(conn)):
+            self.assertFalse(pg_staging.finalize_staging_table("invoice_data", indexes=["source_sheet"]))
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements[1:], ["DROP TABLE IF EXISTS invoice_data_staging"])
+
+        with self.assertRaises(ValueError):
+            fast_load_schema_groups(self.schema_groups, "invoice_data", partition_by_sheet=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
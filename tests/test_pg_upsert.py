@@ -0,0 +1,93 @@
+import contextlib
+import unittest
+from unittest import mock
+
+import pg_upsert
+from excel_to_database import sync_schema_groups
+
+
+class TestPgUpsert(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {"2019": [{"Invoice No": 1, "Customer": "Acme"}], "2020": [{"Invoice No": 1, "Customer": "Zeta"}]}
+        self.schema_groups = {"key": {'sheets': ["2019", "2020"], 'schema': (('invoice_no', 'BIGINT'), ('customer', 'TEXT')),
+                                      'sample_data': {"2019": self.data["2019"]}, 'data': self.data}}
+
+    def test_merge_statement_only_updates_changed_rows(self):
+        statement = pg_upsert.merge_statement("invoice_data", "invoice_data_sync", ("invoice_no", "source_sheet"),
+                                              ["source_sheet", "invoice_no", "customer"])
+        self.assertIn("SELECT DISTINCT ON (invoice_no, source_sheet) source_sheet, invoice_no, customer "
+                      "FROM invoice_data_sync ORDER BY invoice_no, source_sheet, sync_row DESC", statement)
+        self.assertIn("ON CONFLICT (invoice_no, source_sheet) DO UPDATE SET customer = EXCLUDED.customer", statement)
+        self.assertIn("WHERE ROW(target.customer) IS DISTINCT FROM ROW(EXCLUDED.customer)", statement)
+        self.assertIn("RETURNING (xmax = 0) AS inserted", statement)
+        key_only = pg_upsert.merge_statement("t", "t_sync", ("invoice_no",), ["invoice_no"])
+        self.assertIn("ON CONFLICT (invoice_no) DO NOTHING", key_only)
+
+    def test_sync_table_stages_then_upserts_in_one_transaction(self):
+        conn = mock.MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchone.return_value = (3, 2, 10)
+        cursor.rowcount = 4
+        load_summary = {'table': "invoice_data_sync", 'rows': 11, 'quarantined': 1, 'success': True}
+        with mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(conn)), \
+                mock.patch("pg_bulk_load.load_data_to_db", return_value=load_summary) as load:
+            summary = pg_upsert.sync_table(self.data, "invoice_data", ["invoice_no", "source_sheet"],
+                                           ["source_sheet", "invoice_no", "customer"], sheets=["2019", "2020"],
+                                           delete_missing=True)
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements[:4], [
+            "CREATE UNIQUE INDEX IF NOT EXISTS invoice_data_invoice_no_source_sheet_key "
+            "ON invoice_data (invoice_no, source_sheet)",
+            "CREATE TEMP TABLE invoice_data_sync (LIKE invoice_data INCLUDING DEFAULTS) ON COMMIT DROP",
+            "ALTER TABLE invoice_data_sync DROP COLUMN id",
+            "ALTER TABLE invoice_data_sync ADD COLUMN sync_row BIGINT",
+        ])
+        self.assertTrue(statements[4].startswith("WITH staged AS"))
+        self.assertTrue(statements[5].startswith("DELETE FROM invoice_data AS target"))
+        self.assertEqual(cursor.execute.call_args_list[5].args[1], (["2019", "2020"],))
+        self.assertEqual(len(statements), 6)
+        self.assertEqual(load.call_args.args[1], "invoice_data_sync")
+        self.assertIs(load.call_args.kwargs['conn'], conn)
+        conn.commit.assert_called_once()
+        self.assertEqual((summary['inserted'], summary['updated'], summary['unchanged'], summary['deleted']),
+                         (3, 2, 5, 4))
+        self.assertEqual((summary['rows'], summary['quarantined']), (11, 1))
+        self.assertTrue(summary['success'])
+
+    def test_staged_rows_carry_their_workbook_position(self):
+        data = {"2019": [{"Invoice No": 1, "Customer": "Acme"}, {"Invoice No": "", "Customer": " "},
+                         {"Invoice No": 1, "Customer": ""}],
+                "2020": [{"Invoice No": 1, "Customer": "Zeta"}]}
+        self.assertEqual(list(pg_upsert.number_rows(data)), [
+            ("2019", {"Invoice No": 1, "Customer": "Acme", "sync_row": 0}),
+            ("2019", {"Invoice No": 1, "sync_row": 1}),
+            ("2020", {"Invoice No": 1, "Customer": "Zeta", "sync_row": 2}),
+        ])
+
+    def test_failed_staging_rolls_back(self):
+        conn = mock.MagicMock()
+        with mock.patch("pg_dbconnect.pooled_connection", return_value=contextlib.nullcontext(conn)), \
+                mock.patch("pg_bulk_load.load_data_to_db", return_value={'rows': 0, 'quarantined': 0, 'success': False}):
+            summary = pg_upsert.sync_table(self.data, "invoice_data", ["invoice_no"], ["source_sheet", "invoice_no"])
+        self.assertFalse(summary['success'])
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+
+    def test_groups_without_the_key_columns_are_not_synced(self):
+        summary = {'table': "invoice_data_2019_2020", 'rows': 2, 'inserted': 2, 'success': True}
+        with mock.patch("excel_to_database.create_table_in_db", return_value=True), \
+                mock.patch("pg_upsert.sync_table", return_value=dict(summary)) as sync:
+            summaries = sync_schema_groups(self.schema_groups, "invoice_data", ["invoice_no", "source_sheet"])
+            self.assertEqual(sync.call_args.args[1:4], ("invoice_data_2019_2020", ["invoice_no", "source_sheet"],
+                                                        ["source_sheet", "invoice_no", "customer"]))
+            self.assertEqual(summaries["invoice_data_2019_2020"]['sheets'], ["2019", "2020"])
+
+            sync.reset_mock()
+            summaries = sync_schema_groups(self.schema_groups, "invoice_data", {"other_table": ["order_id"]})
+            sync.assert_not_called()
+            self.assertFalse(summaries["invoice_data_2019_2020"]['success'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from sheet_table import SheetTable
+
+
+class TestSheetTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = SheetTable.from_rows(
+            ["Invoice_No", "Customer", "Amount"],
+            [(1, "Acme", 10.5), (2, None, 3), (3, "   ", None), (4,)] + [(i, "x", i) for i in range(5, 20)],
+        )
+
+    def test_row_views_match_excel_to_dictionary_rows(self):
+        self.assertEqual(len(self.table), 19)
+        self.assertEqual(self.table[0], {"Invoice_No": 1, "Customer": "Acme", "Amount": 10.5})
+        self.assertEqual(self.table[1], {"Invoice_No": 2, "Customer": "", "Amount": 3})
+        self.assertEqual(self.table[3], {"Invoice_No": 4, "Customer": "", "Amount": ""})
+        self.assertEqual(self.table[-1], {"Invoice_No": 19, "Customer": "x", "Amount": 19})
+
+    def test_null_bitmap_replaces_placeholders(self):
+        self.assertTrue(self.table.is_null(1, 1))
+        self.assertFalse(self.table.is_null(1, 2))
+        self.assertTrue(self.table.is_null(2, 3))
+        self.assertEqual(self.table.column("Customer")[1], None)
+
+    def test_cleaned_masks_blank_values_without_copying_columns(self):
+        cleaned = self.table.cleaned()
+        self.assertIs(cleaned.columns, self.table.columns)
+        self.assertEqual(cleaned.row_dict(2, skip_nulls=True), {"Invoice_No": 3})
+        self.assertEqual(self.table.row_dict(2, skip_nulls=True), {"Invoice_No": 3, "Customer": "   "})
+
+
+if __name__ == '__main__':
+    unittest.main()
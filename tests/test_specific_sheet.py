@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import xlsx_fast_reader
+from excel_to_dictionary import excel_to_dictionary
+from specific_sheet import single_sheet_to_dictionary
+from test_xlsx_fast_reader import build_fixture
+
+
+class TestSpecificSheet(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.file_path = os.path.join(cls.temp_dir.name, "fixture.xlsx")
+        build_fixture(cls.file_path)
+        cls.expected = excel_to_dictionary(cls.file_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_whole_sheet_matches_excel_to_dictionary(self):
+        self.assertEqual(single_sheet_to_dictionary(self.file_path, "2020"), self.expected["2020"])
+        self.assertEqual(single_sheet_to_dictionary(self.file_path), self.expected["2019"])
+        self.assertEqual(single_sheet_to_dictionary(self.file_path, "Empty"), [])
+
+    def test_row_range(self):
+        self.assertEqual(single_sheet_to_dictionary(self.file_path, "2019", min_row=1, max_row=11),
+                         self.expected["2019"][:10])
+        self.assertEqual(single_sheet_to_dictionary(self.file_path, "2019", min_row=30, max_row=45),
+                         self.expected["2019"][28:39])
+
+    def test_column_projection_only_decodes_selected_cells(self):
+        columns = ["Amount", "Invoice_No"]
+        with mock.patch.object(xlsx_fast_reader.XlsxReader, "_cell_value",
+                               autospec=True, side_effect=xlsx_fast_reader.XlsxReader._cell_value) as cell_value:
+            rows = single_sheet_to_dictionary(self.file_path, "2019", max_row=4, columns=columns)
+        self.assertEqual(rows, [{column: row[column] for column in columns} for row in self.expected["2019"][:3]])
+        self.assertEqual(list(rows[0]), columns)
+        # The six written header cells and two cells in each of the three data rows
+        self.assertEqual(cell_value.call_count, 6 + 2 * 3)
+
+        with self.assertRaises(ValueError):
+            single_sheet_to_dictionary(self.file_path, "2019", columns=["Missing"])
+
+
+if __name__ == '__main__':
+    unittest.main()
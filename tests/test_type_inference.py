@@ -0,0 +1,57 @@
+import datetime
+import unittest
+
+from sheet_table import SheetTable
+from type_inference import TypeInferencer, infer_sheet_types
+
+
+class TestTypeInference(unittest.TestCase):
+
+    def test_later_rows_widen_the_first_row_type(self):
+        rows = [{"Qty": 1, "Price": 2, "When": datetime.datetime(2020, 1, 1), "Note": 5}]
+        rows += [{"Qty": 2, "Price": 12.125, "When": datetime.datetime(2020, 1, 1, 9, 30), "Note": "n/a"}]
+        types = dict(infer_sheet_types(rows).column_types())
+        self.assertEqual(types["Qty"].sql_type(), "BIGINT")
+        self.assertEqual(types["Price"].sql_type(), "NUMERIC(5,3)")
+        self.assertEqual(types["When"].sql_type(), "TIMESTAMP")
+        self.assertEqual(types["Note"].sql_type(), "TEXT")
+
+    def test_blank_values_count_as_nulls(self):
+        types = dict(infer_sheet_types([{"Amount": ""}, {"Amount": 3}, {"Amount": "  "}]).column_types())
+        self.assertEqual(types["Amount"].sql_type(), "BIGINT")
+        self.assertEqual(types["Amount"].null_count, 2)
+
+    def test_sheet_table_infers_while_appending(self):
+        table = SheetTable.from_rows(["A", "B"], [(1, True), (2.5,), (None, False)], TypeInferencer(["A", "B"]))
+        types = dict(infer_sheet_types(table).column_types())
+        self.assertIs(infer_sheet_types(table), table.column_types)
+        self.assertEqual(types["A"].schema_type, "DECIMAL")
+        self.assertEqual(types["B"].schema_type, "BOOLEAN")
+        self.assertEqual(types["B"].null_count, 1)
+
+    def test_sampling_leaves_numeric_columns_unconstrained(self):
+        rows = [{"Amount": 1.5}] * 10 + [{"Amount": 123456.75}]
+        types = infer_sheet_types(rows, sample_size=5)
+        self.assertFalse(types.exact)
+        self.assertEqual(types.rows_sampled, 5)
+        self.assertEqual(types.states["Amount"].sql_type(exact=types.exact), "NUMERIC")
+
+    def test_strings_that_read_as_the_column_type_keep_it(self):
+        rows = [{"Amount": 3, "Code": 5, "Ref": "12", "Due": datetime.date(2020, 1, 4), "Paid": True},
+                {"Amount": " 12.5", "Code": "00123", "Ref": "13", "Due": "2020-01-05", "Paid": "no"},
+                {"Amount": "-1e2", "Code": 6, "Ref": "", "Due": "2020-01-06 10:30", "Paid": "Yes"}]
+        types = dict(infer_sheet_types(rows).column_types())
+        self.assertEqual(types["Amount"].sql_type(), "NUMERIC(4,1)")
+        self.assertEqual(types["Code"].schema_type, "TEXT")
+        self.assertEqual(types["Ref"].schema_type, "TEXT")
+        self.assertEqual(types["Due"].schema_type, "TIMESTAMP")
+        self.assertEqual(types["Paid"].schema_type, "BOOLEAN")
+        # The join of every value, strings as text, is unchanged
+        self.assertEqual(types["Amount"].base_type, "TEXT")
+
+        types = dict(infer_sheet_types(rows + [{"Amount": "n/a"}]).column_types())
+        self.assertEqual(types["Amount"].schema_type, "TEXT")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import datetime
+from decimal import Decimal
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import pg_bulk_load
+import vectorized_clean
+from excel_to_database import clean_data_for_insert, group_sheets_by_schema
+from excel_to_dictionary import excel_to_dictionary
+from sheet_table import SheetTable
+from type_inference import TypeInferencer
+from workbook_fixtures import build_workbook
+
+
+class TestVectorizedClean(unittest.TestCase):
+
+    def test_blank_strings_become_nulls_and_values_are_trimmed(self):
+        values, nulls = vectorized_clean.clean_column_chunk([" Acme ", "   ", None, 3, float("inf")],
+                                                            np.zeros(5, dtype=bool))
+        self.assertEqual(values.tolist(), ["Acme", None, None, 3, float("inf")])
+        self.assertEqual(nulls.tolist(), [False, True, True, False, False])
+
+    def test_strings_are_coerced_to_the_column_type(self):
+        nulls = np.zeros(4, dtype=bool)
+        values, _ = vectorized_clean.clean_column_chunk([" 12", 4, "2.5", "n/a"], nulls, "BIGINT")
+        self.assertEqual(values.tolist(), [12, 4, "2.5", "n/a"])
+        self.assertIs(type(values[0]), int)
+        values, _ = vectorized_clean.clean_column_chunk([" 12", 4, "2.5", "n/a"], nulls, "DECIMAL")
+        self.assertEqual(values.tolist(), [12, 4, 2.5, "n/a"])
+        values, _ = vectorized_clean.clean_column_chunk(["2020-01-05 ", datetime.date(2020, 1, 6), "soon", None],
+                                                        nulls, "DATE")
+        self.assertEqual(values.tolist(), [datetime.date(2020, 1, 5), datetime.date(2020, 1, 6), "soon", None])
+        values, _ = vectorized_clean.clean_column_chunk(["Yes", True, "no", "maybe"], nulls, "BOOLEAN")
+        self.assertEqual(values.tolist(), [True, True, False, "maybe"])
+
+    def test_numeric_strings_keep_every_digit(self):
+        nulls = np.zeros(3, dtype=bool)
+        values, _ = vectorized_clean.clean_column_chunk([" 12345678901234567.89", 1.5, "-0.000000000000000001"],
+                                                        nulls, "DECIMAL")
+        self.assertEqual(values.tolist(), [Decimal("12345678901234567.89"), 1.5, Decimal("-1E-18")])
+        self.assertEqual(str(values[0]), "12345678901234567.89")
+        values, _ = vectorized_clean.clean_column_chunk(["9007199254740993", "9223372036854775808", 1],
+                                                        nulls, "BIGINT")
+        self.assertEqual(values.tolist(), [9007199254740993, "9223372036854775808", 1])
+
+    def test_clean_table_updates_columns_and_masks_in_place(self):
+        headers = ("Invoice No", "Customer")
+        rows = [(index, " Acme " if index % 3 else "  ") for index in range(21)]
+        table = SheetTable.from_rows(headers, rows, TypeInferencer(headers))
+        customers = table.columns[1]
+        cleaned = clean_data_for_insert({"2019": table})["2019"]
+        self.assertIs(cleaned, table)
+        self.assertIs(table.columns[1], customers)
+        for index in range(21):
+            self.assertEqual(table.is_null(1, index), index % 3 == 0)
+        self.assertEqual(table[1], {"Invoice No": 1, "Customer": "Acme"})
+
+        small_chunks = SheetTable.from_rows(headers, rows)
+        vectorized_clean.clean_table(small_chunks, chunk_size=8)
+        self.assertEqual(list(small_chunks), list(table))
+
+    def test_load_chunks_match_row_by_row_cleaning(self):
+        headers = ("Invoice No", "Customer", "Amount")
+        rows = [(1, "Acme", 10.5), (2, " ", 3.0), (None, "", None), (4, "Zeta ", None), (5, None, 7.25)]
+        table = SheetTable.from_rows(headers, rows)
+        chunks = list(pg_bulk_load.iter_load_chunks({"2019": table}, chunk_size=8, source_file="a.xlsx"))
+        expected = [pg_bulk_load.prepare_load_row("2019", {"Invoice No": 1, "Customer": "Acme", "Amount": 10.5}, "a.xlsx"),
+                    pg_bulk_load.prepare_load_row("2019", {"Invoice No": 2, "Amount": 3.0}, "a.xlsx"),
+                    pg_bulk_load.prepare_load_row("2019", {"Invoice No": 4, "Customer": "Zeta"}, "a.xlsx"),
+                    pg_bulk_load.prepare_load_row("2019", {"Invoice No": 5, "Amount": 7.25}, "a.xlsx")]
+        self.assertEqual(len(chunks), 1)
+        self.assertCountEqual(chunks[0], expected)
+
+        lists = {"2019": [dict(zip(headers, row)) for row in rows]}
+        self.assertEqual(sum(len(chunk) for chunk in pg_bulk_load.iter_load_chunks(lists, chunk_size=2)), 4)
+
+    def test_inferred_types_coerce_string_cells_end_to_end(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "invoices.xlsx")
+            build_workbook(file_path, {"2019": [["Invoice No", "Amount", "Due"],
+                                                [1, 10.5, datetime.datetime(2019, 1, 4)],
+                                                [2, " 12.25", "2019-01-05"],
+                                                [" 3 ", 7, " 2019-01-06"]]})
+            data = excel_to_dictionary(file_path, as_table=True, infer_types=True)
+
+        schema = next(iter(group_sheets_by_schema(data)))
+        self.assertEqual(schema, str((("invoice_no", "BIGINT"), ("amount", "DECIMAL"), ("due", "DATE"))))
+        table = clean_data_for_insert(data)["2019"]
+        self.assertEqual(list(table), [
+            {"Invoice_No": 1, "Amount": 10.5, "Due": datetime.datetime(2019, 1, 4)},
+            {"Invoice_No": 2, "Amount": 12.25, "Due": datetime.date(2019, 1, 5)},
+            {"Invoice_No": 3, "Amount": 7, "Due": datetime.date(2019, 1, 6)},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
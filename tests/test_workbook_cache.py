@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import workbook_cache
+from excel_to_dictionary import excel_to_dictionary
+from test_xlsx_fast_reader import build_fixture
+
+
+@unittest.skipUnless(workbook_cache.is_available(), "pyarrow is not installed")
+class TestWorkbookCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+        self.file_path = os.path.join(self.temp_dir, "fixture.xlsx")
+        build_fixture(self.file_path)
+        patcher = mock.patch.dict(os.environ, {"EXCEL_CACHE_DIR": self.cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cached_result_matches_parsed_result(self):
+        expected = excel_to_dictionary(self.file_path)
+        self.assertEqual(excel_to_dictionary(self.file_path, cache=True), expected)
+        self.assertEqual(len(workbook_cache.list_entries()), 1)
+
+        with mock.patch("excel_to_dictionary.read_sheet_batch") as read_sheet_batch:
+            cached = excel_to_dictionary(self.file_path, cache=True)
+        read_sheet_batch.assert_not_called()
+        self.assertEqual(cached, expected)
+        for sheet_name, rows in expected.items():
+            for expected_row, cached_row in zip(rows, cached[sheet_name]):
+                self.assertEqual([type(value) for value in cached_row.values()],
+                                 [type(value) for value in expected_row.values()])
+
+    def test_sheet_is_read_back_batch_by_batch(self):
+        rows = [(i, "text" if i % 3 else i * 0.5) for i in range(10)] + [(None,)]
+        path = os.path.join(self.temp_dir, "sheet.arrow")
+        workbook_cache.write_sheet(path, ["A", "B"], rows)
+        with mock.patch("workbook_cache.READ_BATCH_ROWS", 4):
+            headers, cached_rows = workbook_cache.read_sheet(path)
+        self.assertEqual(headers, ["A", "B"])
+        self.assertEqual(cached_rows, rows[:-1] + [(None, None)])
+        self.assertEqual([type(value) for value in cached_rows[1]], [int, str])
+
+    def test_changed_file_misses_the_cache(self):
+        excel_to_dictionary(self.file_path, cache=True)
+        build_fixture(self.file_path, epoch=None)
+        os.utime(self.file_path, ns=(0, 0))
+        self.assertIsNone(workbook_cache.load_workbook(self.file_path))
+
+    def test_eviction_keeps_the_cache_under_the_cap(self):
+        batches = [("Sheet", ["A"], [(i,) for i in range(1000)])]
+        other_path = os.path.join(self.temp_dir, "other.xlsx")
+        shutil.copy(self.file_path, other_path)
+        workbook_cache.store_workbook(self.file_path, batches)
+        entry_size = workbook_cache.list_entries()[0][2]
+        workbook_cache.store_workbook(other_path, batches, max_bytes=entry_size)
+        self.assertIsNone(workbook_cache.load_workbook(self.file_path))
+        self.assertEqual(workbook_cache.load_workbook(other_path), batches)
+
+        workbook_cache.clear_cache()
+        self.assertEqual(workbook_cache.list_entries(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import openpyxl
+
+import workbook_inspector
+from excel_to_dictionary import iter_sheet_rows
+from synthetic_workbook import generate_workbook
+
+
+class TestWorkbookInspector(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_dimension_sizes_and_headers(self):
+        file_path = os.path.join(self.temp_dir.name, "dimension.xlsx")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "2019"
+        sheet.append(["Invoice No", "Customer", None])
+        for index in range(30):
+            sheet.append([index, "Acme", None])
+        sheet.cell(row=31, column=4, value="note")
+        workbook.create_sheet("Empty")
+        workbook.save(file_path)
+
+        info = workbook_inspector.inspect_workbook(file_path)
+        sheets = {sheet['name']: sheet for sheet in info['sheets']}
+        self.assertEqual(list(sheets), ["2019", "Empty"])
+        self.assertEqual((sheets["2019"]['rows'], sheets["2019"]['columns']), (30, 4))
+        self.assertEqual(sheets["2019"]['rows_estimated_from'], "dimension")
+        self.assertEqual(sheets["2019"]['headers'], ["Invoice_No", "Customer", "Column_3", "Column_4"])
+        _, first_row = next(iter_sheet_rows(file_path, sheet="2019", engine="xml"))
+        self.assertEqual(sheets["2019"]['headers'], list(first_row))
+        self.assertEqual((sheets["Empty"]['rows'], sheets["Empty"]['headers']), (0, []))
+        self.assertGreater(sheets["2019"]['uncompressed_size'], sheets["2019"]['compressed_size'])
+        self.assertEqual(workbook_inspector.sheets_with_rows(info), ["2019"])
+
+    def test_rows_are_counted_or_sampled_without_a_dimension(self):
+        file_path = os.path.join(self.temp_dir.name, "synthetic.xlsx")
+        generate_workbook(file_path, sheets=("2019", "2020"), rows=100, columns=5, extra_sheets=("Summary",))
+
+        info = workbook_inspector.inspect_workbook(file_path)
+        sheets = {sheet['name']: sheet for sheet in info['sheets']}
+        self.assertEqual(sheets["2019"]['rows_estimated_from'], "exact")
+        self.assertEqual(sheets["2019"]['rows'], 100)
+        self.assertEqual(workbook_inspector.header_groups(info)[sheets["2019"]['header_fingerprint']], ["2019", "2020"])
+        self.assertNotEqual(sheets["Summary"]['header_fingerprint'], sheets["2019"]['header_fingerprint'])
+
+        with mock.patch("workbook_inspector.SAMPLE_BYTES", 2048):
+            sampled = workbook_inspector.inspect_workbook(file_path, read_headers=False)['sheets'][0]
+        self.assertEqual(sampled['rows_estimated_from'], "sample")
+        self.assertAlmostEqual(sampled['rows'], 100, delta=25)
+        self.assertNotIn('headers', sampled)
+
+        self.assertGreaterEqual(workbook_inspector.parse_size(file_path), info['uncompressed_size'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import datetime
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import openpyxl
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+from excel_to_dictionary import excel_to_dictionary, iter_sheet_rows
+
+
+def build_fixture(file_path, epoch=None):
+    """Write a workbook with year sheets, mixed types, gaps and number formats."""
+    workbook = openpyxl.Workbook()
+    if epoch is not None:
+        workbook.epoch = epoch
+    workbook.remove(workbook.active)
+
+    for year in ("2019", "2020"):
+        worksheet = workbook.create_sheet(year)
+        worksheet.append(["Invoice No", "Customer-Name", "Amount", "Invoice Date", "Paid", None, 2021])
+        for i in range(1, 40):
+            worksheet.append([
+                i,
+                ["Acme Ltd", "  padded  ", "Zürich GmbH", None][i % 4],
+                i * 10.25 if i % 5 else i * 10,
+                datetime.datetime(int(year), 1, 1) + datetime.timedelta(days=i, hours=i % 3),
+                i % 2 == 0,
+                None,
+                -i if i % 7 else None,
+            ])
+        # Leave a gap of missing rows before the last one
+        worksheet.cell(row=50, column=1, value=999)
+        worksheet.cell(row=50, column=3, value=1.5e-7)
+
+    worksheet = workbook.create_sheet("Formats")
+    worksheet.append(["date only", "time", "duration", "percent", "text number", "rich text"])
+    worksheet.append([datetime.date(2023, 3, 31), datetime.time(13, 45, 30), datetime.timedelta(hours=30),
+                      0.125, "00123", "Rich text"])
+    worksheet["A2"].number_format = "dd/mm/yyyy"
+    worksheet["C2"].number_format = "[h]:mm:ss"
+    worksheet["D2"].number_format = "0.0%"
+
+    workbook.create_sheet("Empty")
+    workbook.save(file_path)
+
+
+def convert_to_shared_strings(file_path):
+    """Rewrite the inline strings openpyxl writes as a shared string table, as Excel does."""
+    # Item 0 is written as rich text runs with a phonetic hint; it must still read as plain "Rich text"
+    strings = ["Rich text"]
+
+    def to_shared(match):
+        text = match.group(2)
+        if text not in strings:
+            strings.append(text)
+        return f'<c r="{match.group(1)}" t="s"><v>{strings.index(text)}</v></c>'
+
+    temp_path = file_path + ".tmp"
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(temp_path, "w") as target:
+        for item in source.infolist():
+            data = source.read(item.filename).decode("utf-8")
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(r'<c r="([A-Z]+\d+)" t="inlineStr"><is><t[^>]*>(.*?)</t></is></c>', to_shared, data)
+            elif item.filename == "[Content_Types].xml":
+                data = data.replace("</Types>", '<Override PartName="/xl/sharedStrings.xml" ContentType='
+                                    '"application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+            elif item.filename == "xl/_rels/workbook.xml.rels":
+                data = data.replace("</Relationships>", '<Relationship Type="http://schemas.openxmlformats.org/'
+                                    'officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml" '
+                                    'Id="rIdStrings"/></Relationships>')
+            target.writestr(item, data)
+
+        items = '<si><r><t>Rich</t></r><r><rPr><b/></rPr><t xml:space="preserve"> text</t></r><rPh sb="0" eb="4"><t>x</t></rPh></si>'
+        items += "".join(f'<si><t xml:space="preserve">{text}</t></si>' for text in strings[1:])
+        target.writestr("xl/sharedStrings.xml",
+                        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">' + items + '</sst>')
+    shutil.move(temp_path, file_path)
+
+
+class TestXlsxFastReader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.inline_path = os.path.join(cls.temp_dir, "inline.xlsx")
+        cls.shared_path = os.path.join(cls.temp_dir, "shared.xlsx")
+        cls.mac_path = os.path.join(cls.temp_dir, "mac_1904.xlsx")
+        build_fixture(cls.inline_path)
+        build_fixture(cls.shared_path)
+        convert_to_shared_strings(cls.shared_path)
+        build_fixture(cls.mac_path, epoch=CALENDAR_MAC_1904)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir)
+
+    def fixtures(self):
+        return [self.inline_path, self.shared_path, self.mac_path]
+
+    def test_xml_engine_matches_openpyxl(self):
+        for file_path in self.fixtures():
+            with self.subTest(file_path=os.path.basename(file_path)):
+                expected = excel_to_dictionary(file_path)
+                actual = excel_to_dictionary(file_path, engine="xml")
+                self.assertEqual(list(actual), list(expected))
+                self.assertEqual(actual, expected)
+
+    def test_xml_engine_preserves_value_types(self):
+        for file_path in self.fixtures():
+            expected = excel_to_dictionary(file_path)
+            actual = excel_to_dictionary(file_path, engine="xml")
+            for sheet_name, rows in expected.items():
+                for expected_row, actual_row in zip(rows, actual[sheet_name]):
+                    self.assertEqual([type(value) for value in actual_row.values()],
+                                     [type(value) for value in expected_row.values()])
+
+    def test_xml_streaming_matches_openpyxl_streaming(self):
+        for file_path in self.fixtures():
+            with self.subTest(file_path=os.path.basename(file_path)):
+                expected = list(iter_sheet_rows(file_path, sheet=["2020", "Formats"]))
+                actual = list(iter_sheet_rows(file_path, sheet=["2020", "Formats"], engine="xml"))
+                self.assertEqual(actual, expected)
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ValueError):
+            excel_to_dictionary(self.inline_path, engine="pandas")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,17 @@
+import openpyxl
+
+
+def build_workbook(file_path, sheets):
+    """Write a workbook with one sheet per name -> rows item, header row first, in order."""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name, rows in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(file_path)
+
+
+def invoice_rows(count, start=0):
+    """Header row and count invoice rows of (Invoice No, Customer)."""
+    return [["Invoice No", "Customer"]] + [[i, f"Customer {i}"] for i in range(start, start + count)]
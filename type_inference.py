@@ -0,0 +1,330 @@
+# File: type_inference.py
+import datetime
+import itertools
+import math
+import re
+from decimal import Decimal
+
+from sheet_table import SheetTable
+
+# Base SQL types used in schema signatures
+NULL = "NULL"
+BOOLEAN = "BOOLEAN"
+BIGINT = "BIGINT"
+DECIMAL = "DECIMAL"
+DATE = "DATE"
+TIMESTAMP = "TIMESTAMP"
+TIME = "TIME"
+TEXT = "TEXT"
+
+BIGINT_MIN = -2 ** 63
+BIGINT_MAX = 2 ** 63 - 1
+# Wider numbers are stored as DOUBLE PRECISION instead of NUMERIC(p,s)
+MAX_NUMERIC_PRECISION = 38
+
+# Strings that read as numbers; leading zeros ("00123") mark codes, which stay text
+INTEGER_STRING_RE = re.compile(r"[+-]?(?:0|[1-9][0-9]*)")
+DECIMAL_STRING_RE = re.compile(r"[+-]?(?:0|[1-9][0-9]*)?(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+BOOLEAN_STRINGS = frozenset(("true", "false", "yes", "no"))
+
+# Pairs of different types that widen to something other than TEXT
+WIDENING = {
+    frozenset((BIGINT, DECIMAL)): DECIMAL,
+    frozenset((DATE, TIMESTAMP)): TIMESTAMP,
+}
+
+def join_types(first, second):
+    """
+    Return the narrowest base type that can hold values of both types.
+
+    NULL joins to anything, BIGINT widens to DECIMAL, DATE widens to
+    TIMESTAMP and every other mix falls back to TEXT.
+    """
+    if first == second or second == NULL:
+        return first
+    if first == NULL:
+        return second
+    return WIDENING.get(frozenset((first, second)), TEXT)
+
+def string_value_type(text):
+    """
+    Get the base type a stripped string reads as: a number, an ISO date or
+    timestamp, or a boolean word; anything else is TEXT.
+    """
+    if INTEGER_STRING_RE.fullmatch(text):
+        return BIGINT if BIGINT_MIN <= int(text) <= BIGINT_MAX else DECIMAL
+    if any(char.isdigit() for char in text) and DECIMAL_STRING_RE.fullmatch(text):
+        return DECIMAL
+    if text.lower() in BOOLEAN_STRINGS:
+        return BOOLEAN
+    if len(text) >= 10 and text[4] == "-" and text[:4].isdigit():
+        try:
+            value = datetime.datetime.fromisoformat(text)
+        except ValueError:
+            return TEXT
+        if value.tzinfo is not None:
+            return TEXT
+        return TIMESTAMP if value.time() != datetime.time() else DATE
+    return TEXT
+
+class ColumnTypeState:
+    """
+    Running type state of one column, updated one value at a time.
+
+    Tracks the row and null counts, the joined base type, the longest
+    text value and the integer digits and scale of numeric values.
+
+    Strings are also joined on their own by what they read as (see
+    string_value_type), so a column of typed cells with a few strings such
+    as " 12.5" or "2020-01-05" keeps the type of its cells; the strings are
+    coerced when the column is cleaned (see vectorized_clean).
+    """
+
+    __slots__ = ('count', 'null_count', 'base_type', 'value_type', 'string_type', 'max_length',
+                 'integer_digits', 'scale', 'finite')
+
+    def __init__(self):
+        self.count = 0
+        self.null_count = 0
+        self.base_type = NULL
+        # Joined type of the non-string values, and of what the strings read as
+        self.value_type = NULL
+        self.string_type = NULL
+        self.max_length = 0
+        self.integer_digits = 0
+        self.scale = 0
+        self.finite = True
+
+    def _update_digits(self, number):
+        sign, digits, exponent = number.as_tuple()
+        self.integer_digits = max(self.integer_digits, len(digits) + exponent, 1)
+        self.scale = max(self.scale, -exponent)
+
+    def update(self, value):
+        """
+        Add one value to the state. None and blank strings count as nulls,
+        as they are left to the column DEFAULT when loading.
+        """
+        self.count += 1
+        value_class = value.__class__
+
+        if value is None:
+            self.null_count += 1
+            return
+        if value_class is str:
+            if not value.strip():
+                self.null_count += 1
+                return
+            self.max_length = max(self.max_length, len(value))
+            value_type = TEXT
+            # Once a string reads as text the column is text, so later strings need no parsing
+            if self.string_type != TEXT:
+                text = value.strip()
+                string_type = string_value_type(text)
+                if string_type in (BIGINT, DECIMAL):
+                    self._update_digits(Decimal(text))
+                self.string_type = join_types(self.string_type, string_type)
+        elif value_class is bool:
+            value_type = BOOLEAN
+        elif value_class is int:
+            if BIGINT_MIN <= value <= BIGINT_MAX:
+                value_type = BIGINT
+            else:
+                value_type = DECIMAL
+            self.integer_digits = max(self.integer_digits, len(str(abs(value))))
+        elif value_class is float:
+            value_type = DECIMAL
+            if math.isfinite(value):
+                self._update_digits(Decimal(repr(value)))
+            else:
+                self.finite = False
+        elif value_class is datetime.datetime:
+            value_type = TIMESTAMP if value.time() != datetime.time() else DATE
+        elif value_class is datetime.date:
+            value_type = DATE
+        elif value_class is datetime.time:
+            value_type = TIME
+        else:
+            value_type = TEXT
+
+        if value_class is not str and value_type != self.value_type:
+            self.value_type = join_types(self.value_type, value_type)
+        if value_type != self.base_type:
+            self.base_type = join_types(self.base_type, value_type)
+        if self.base_type == TEXT and value_class is not str:
+            self.max_length = max(self.max_length, len(str(value)))
+
+    def merge(self, other):
+        """Combine the state of another ColumnTypeState into this one."""
+        self.count += other.count
+        self.null_count += other.null_count
+        self.base_type = join_types(self.base_type, other.base_type)
+        self.value_type = join_types(self.value_type, other.value_type)
+        self.string_type = join_types(self.string_type, other.string_type)
+        self.max_length = max(self.max_length, other.max_length)
+        self.integer_digits = max(self.integer_digits, other.integer_digits)
+        self.scale = max(self.scale, other.scale)
+        self.finite = self.finite and other.finite
+
+    @property
+    def schema_type(self):
+        """
+        Base type for schema signatures; columns without values are TEXT.
+        A column mixing typed values with strings that all read as that type
+        (e.g. numbers and numeric strings) keeps the type; a column of
+        strings only stays TEXT.
+        """
+        if self.value_type != NULL and self.string_type != NULL:
+            return join_types(self.value_type, self.string_type)
+        return TEXT if self.base_type == NULL else self.base_type
+
+    @property
+    def precision(self):
+        """Total number of digits needed by the numeric values seen."""
+        return max(self.integer_digits + self.scale, 1)
+
+    def sql_type(self, exact=True):
+        """
+        Get the PostgreSQL column type for the values seen.
+
+        Args:
+            exact (bool): False when only a sample of the column was seen;
+                numeric columns are then left unconstrained (NUMERIC) so
+                unseen wider values still fit.
+
+        Returns:
+            str: e.g. "BIGINT", "NUMERIC(12,2)" or "TIMESTAMP".
+        """
+        if self.schema_type == DECIMAL:
+            if not self.finite or self.precision > MAX_NUMERIC_PRECISION:
+                return "DOUBLE PRECISION"
+            if not exact:
+                return "NUMERIC"
+            return f"NUMERIC({self.precision},{self.scale})"
+        return self.schema_type
+
+    def __repr__(self):
+        return (f"ColumnTypeState({self.sql_type()}, count={self.count}, nulls={self.null_count}, "
+                f"max_length={self.max_length})")
+
+class TypeInferencer:
+    """
+    Incremental type inference for the columns of a sheet.
+
+    Feed it rows as they stream past; every column keeps a ColumnTypeState.
+    With sample_size set, only the first sample_size rows are inspected,
+    then (if sample_every is set) every sample_every-th row after that.
+    Set sampled when the rows fed in are known to be only part of the sheet.
+    """
+
+    def __init__(self, headers=(), sample_size=None, sample_every=None, sampled=False):
+        self.states = {header: ColumnTypeState() for header in headers}
+        self.sample_size = sample_size
+        self.sample_every = sample_every
+        self.rows_seen = 0
+        self.rows_sampled = 0
+        self.sampled = sampled
+
+    @property
+    def exact(self):
+        """True if every row of the data went through the column states."""
+        return not self.sampled and self.rows_sampled == self.rows_seen
+
+    def _should_sample(self):
+        row_number = self.rows_seen
+        self.rows_seen += 1
+        if self.sample_size is None or row_number < self.sample_size:
+            return True
+        return bool(self.sample_every) and (row_number - self.sample_size) % self.sample_every == 0
+
+    def update(self, row):
+        """
+        Add one row dictionary to the column states.
+
+        Args:
+            row (dict): Row dictionary keyed by header.
+        """
+        if not self._should_sample():
+            return
+        self.rows_sampled += 1
+        states = self.states
+        for header, value in row.items():
+            state = states.get(header)
+            if state is None:
+                state = states[header] = ColumnTypeState()
+            state.update(value)
+
+    def update_values(self, headers, values):
+        """
+        Add one row of values aligned with headers to the column states.
+
+        Args:
+            headers (tuple): Column headers.
+            values (tuple): Row values; missing trailing values count as nulls.
+        """
+        if not self._should_sample():
+            return
+        self.rows_sampled += 1
+        states = self.states
+        value_count = len(values)
+        for col_index, header in enumerate(headers):
+            state = states.get(header)
+            if state is None:
+                state = states[header] = ColumnTypeState()
+            state.update(values[col_index] if col_index < value_count else None)
+
+    def merge(self, other):
+        """Combine the column states of another TypeInferencer into this one."""
+        for header, other_state in other.states.items():
+            state = self.states.get(header)
+            if state is None:
+                state = self.states[header] = ColumnTypeState()
+            state.merge(other_state)
+        self.rows_seen += other.rows_seen
+        self.rows_sampled += other.rows_sampled
+        self.sampled = self.sampled or not other.exact
+
+    def column_types(self):
+        """
+        Get the column states in header order.
+
+        Returns:
+            list: List of (header, ColumnTypeState) tuples.
+        """
+        return list(self.states.items())
+
+def infer_sheet_types(sheet_data, sample_size=None, sample_every=None):
+    """
+    Infer the column types of one sheet.
+
+    A SheetTable built with type inference already carries its types, so no
+    extra pass is needed; otherwise the rows are scanned (or sampled) once.
+
+    Args:
+        sheet_data (list or SheetTable): Rows of the sheet.
+        sample_size (int): Only inspect the first sample_size rows (if None, inspects every row).
+        sample_every (int): After the sample, also inspect every sample_every-th row.
+
+    Returns:
+        TypeInferencer: The inferred column states.
+    """
+    if isinstance(sheet_data, SheetTable):
+        if sheet_data.column_types is not None:
+            return sheet_data.column_types
+        inferencer = TypeInferencer(sheet_data.headers, sample_size, sample_every)
+        rows = zip(*sheet_data.columns)
+        if sample_size is not None and not sample_every:
+            rows = itertools.islice(rows, sample_size)
+            inferencer.sampled = len(sheet_data) > sample_size
+        for values in rows:
+            inferencer.update_values(sheet_data.headers, values)
+        return inferencer
+
+    inferencer = TypeInferencer((), sample_size, sample_every)
+    rows = sheet_data
+    if sample_size is not None and not sample_every:
+        rows = itertools.islice(rows, sample_size)
+        inferencer.sampled = len(sheet_data) > sample_size
+    for row in rows:
+        inferencer.update(row)
+    return inferencer
@@ -0,0 +1,203 @@
+# File: vectorized_clean.py
+from decimal import Decimal
+
+try:
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import infer_dtype
+except ImportError:  # Vectorized cleaning is optional; callers fall back to cleaning row by row
+    np = pd = None
+
+import type_inference
+
+# Rows per column chunk; a multiple of 8 so each chunk starts on a whole byte of the null masks
+DEFAULT_CHUNK_SIZE = 65536
+
+# infer_dtype results of columns that contain strings
+STRING_KINDS = ("string", "mixed", "mixed-integer")
+
+# Strings pandas and Decimal both read the same way as a plain number
+NUMBER_STRING_PATTERN = r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+
+BOOLEAN_STRINGS = {"true": True, "false": False, "yes": True, "no": False, "1": True, "0": False}
+
+def is_available():
+    """True if NumPy and pandas are installed and vectorized cleaning can be used."""
+    return pd is not None
+
+def schema_types(table):
+    """
+    Get the inferred base type of each column of a table.
+
+    Args:
+        table (SheetTable): The table.
+
+    Returns:
+        list: One type_inference type per column, or None where no type is known.
+    """
+    if table.column_types is None:
+        return [None] * len(table.headers)
+    states = table.column_types.states
+    return [states[header].schema_type if header in states else None for header in table.headers]
+
+def unpack_mask(mask, start, stop):
+    """
+    Read the null bits of rows start..stop of a SheetTable null mask.
+
+    Args:
+        mask (bytearray): Null mask of one column, one bit per row.
+        start (int): First row, a multiple of 8.
+        stop (int): Row after the last one.
+
+    Returns:
+        numpy.ndarray: Boolean array, True where the cell is null.
+    """
+    bits = np.frombuffer(mask, dtype=np.uint8, count=(stop - start + 7) // 8, offset=start // 8)
+    return np.unpackbits(bits, bitorder="little", count=stop - start).astype(bool)
+
+def coerce_strings(values, positions, schema_type):
+    """
+    Convert the string cells of a non-text column to the column's type,
+    e.g. " 12.5" in a DECIMAL column. Numbers become int or
+    decimal.Decimal, so no digits are lost on the way to NUMERIC(p,s).
+    Strings that do not parse are left as they are, for the database (or
+    the quarantine) to reject.
+
+    Args:
+        values (numpy.ndarray): Object array of the cleaned cell values, changed in place.
+        positions (numpy.ndarray): Indices of the string cells.
+        schema_type (str): type_inference type of the column.
+    """
+    strings = pd.Series(values[positions], dtype=object)
+    if schema_type in (type_inference.BIGINT, type_inference.DECIMAL):
+        # Parsed with Decimal, not as floats, so NUMERIC(p,s) values keep every digit
+        parsed = strings.str.fullmatch(NUMBER_STRING_PATTERN).to_numpy(dtype=bool, copy=True)
+        converted = [Decimal(text) for text in strings[parsed]]
+        if schema_type == type_inference.BIGINT:
+            # Only whole numbers in range fit a BIGINT column
+            whole = [number == number.to_integral_value()
+                     and type_inference.BIGINT_MIN <= number <= type_inference.BIGINT_MAX
+                     for number in converted]
+            parsed[parsed] = whole
+            converted = [int(number) for number, keep in zip(converted, whole) if keep]
+        values[positions[parsed]] = converted
+    elif schema_type in (type_inference.DATE, type_inference.TIMESTAMP):
+        converted = pd.to_datetime(strings, errors="coerce", format="mixed")
+        parsed = converted.notna().to_numpy()
+        timestamps = converted[parsed].dt.to_pydatetime()
+        if schema_type == type_inference.DATE:
+            timestamps = [timestamp.date() for timestamp in timestamps]
+        values[positions[parsed]] = list(timestamps)
+    elif schema_type == type_inference.BOOLEAN:
+        converted = strings.str.lower().map(BOOLEAN_STRINGS)
+        parsed = converted.notna().to_numpy()
+        values[positions[parsed]] = converted[parsed].astype(bool).tolist()
+
+def clean_column_chunk(values, nulls, schema_type=None):
+    """
+    Clean one chunk of a column in bulk: strings are trimmed, blank strings
+    become nulls and string cells of non-text columns are coerced to the
+    column type.
+
+    Args:
+        values (list): Cell values of the chunk.
+        nulls (numpy.ndarray): Boolean array, True where the cell is already null.
+        schema_type (str): type_inference type of the column, if known.
+
+    Returns:
+        tuple: (object array of cleaned values with None for nulls, boolean null array)
+    """
+    series = pd.Series(values, dtype=object)
+    cleaned = series.to_numpy(dtype=object, copy=True)
+    # Only None is null; NaN is a value, as it is when rows are cleaned one by one
+    nulls = nulls | np.equal(cleaned, None)
+
+    if infer_dtype(series, skipna=True) in STRING_KINDS:
+        stripped = series.str.strip()
+        is_string = stripped.notna().to_numpy()
+        blank = is_string & (stripped == "").to_numpy()
+        trimmed = is_string & ~blank
+        cleaned[trimmed] = stripped[trimmed].tolist()
+        nulls |= blank
+        if schema_type not in (None, type_inference.TEXT) and trimmed.any():
+            coerce_strings(cleaned, np.flatnonzero(trimmed), schema_type)
+
+    cleaned[nulls] = None
+    return cleaned, nulls
+
+def clean_table(table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Clean a SheetTable in place, one column chunk at a time: values are
+    trimmed and coerced, and blank cells are added to the null masks.
+
+    Nothing is copied beyond the chunk being cleaned: the cleaned values
+    replace the old ones in the table's column lists, so the cleaned data
+    takes no extra memory.
+
+    Args:
+        table (SheetTable): The table to clean.
+        chunk_size (int): Rows per column chunk (a multiple of 8).
+
+    Returns:
+        SheetTable: The same table.
+    """
+    chunk_size = max(8, chunk_size - chunk_size % 8)
+    row_count = len(table)
+    for column, mask, schema_type in zip(table.columns, table.null_masks, schema_types(table)):
+        for start in range(0, row_count, chunk_size):
+            stop = min(start + chunk_size, row_count)
+            cleaned, nulls = clean_column_chunk(column[start:stop], unpack_mask(mask, start, stop), schema_type)
+            column[start:stop] = cleaned.tolist()
+            mask[start // 8:start // 8 + (stop - start + 7) // 8] = np.packbits(nulls, bitorder="little").tobytes()
+    return table
+
+def iter_table_load_chunks(sheet_name, table, column_names, chunk_size, source_file=None):
+    """
+    Turn a SheetTable into load chunks for pg_bulk_load, cleaning each
+    column chunk in bulk on the way.
+
+    Rows are grouped by the set of columns they have values in, with
+    NumPy, so each chunk comes out ordered by column signature; rows with
+    no values are dropped. Row dictionaries are only built for the rows of
+    the current chunk.
+
+    Args:
+        sheet_name (str): Name of the sheet, the source_sheet value.
+        table (SheetTable): Rows of the sheet.
+        column_names (list): SQL column name of each header.
+        chunk_size (int): Rows per chunk (a multiple of 8).
+        source_file (str): Value of the source_file column, if the table has one.
+
+    Yields:
+        list: List of row dictionaries with SQL column names.
+    """
+    chunk_size = max(8, chunk_size - chunk_size % 8)
+    extra_names = ("source_sheet",) if source_file is None else ("source_sheet", "source_file")
+    extra_values = (sheet_name,) if source_file is None else (sheet_name, source_file)
+    types = schema_types(table)
+    row_count = len(table)
+
+    for start in range(0, row_count, chunk_size):
+        stop = min(start + chunk_size, row_count)
+        cleaned = [clean_column_chunk(column[start:stop], unpack_mask(mask, start, stop), schema_type)
+                   for column, mask, schema_type in zip(table.columns, table.null_masks, types)]
+        if not cleaned:
+            continue
+        present = ~np.vstack([nulls for _, nulls in cleaned])
+        # One byte string per row describing which columns have a value
+        signatures = np.packbits(present, axis=0).T
+        _, row_groups = np.unique(signatures, axis=0, return_inverse=True)
+        row_groups = row_groups.ravel()
+        # Row indices ordered by group, keeping the sheet order within each group
+        order = np.argsort(row_groups, kind="stable")
+
+        chunk = []
+        for rows in np.split(order, np.cumsum(np.bincount(row_groups))[:-1]):
+            columns = np.flatnonzero(present[:, rows[0]])
+            if not columns.size:
+                continue
+            names = tuple(column_names[index] for index in columns) + extra_names
+            column_values = [cleaned[index][0][rows] for index in columns]
+            chunk.extend(dict(zip(names, values + extra_values)) for values in zip(*column_values))
+        if chunk:
+            yield chunk
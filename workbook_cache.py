@@ -0,0 +1,315 @@
+# File: workbook_cache.py
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # The cache is optional; without pyarrow every lookup is a miss
+    pa = None
+
+# Bump when the on-disk layout changes so old entries are no longer matched
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "multiexcel")
+DEFAULT_MAX_CACHE_MB = 1024
+
+ENTRY_INDEX_FILE = "workbook.json"
+
+# Rows converted back to Python values at a time when reading a sheet
+READ_BATCH_ROWS = 64 * 1024
+
+def get_cache_dir():
+    """Cache directory, from EXCEL_CACHE_DIR or ~/.cache/multiexcel."""
+    return os.environ.get("EXCEL_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+def get_max_cache_bytes():
+    """Cache size cap in bytes, from EXCEL_CACHE_MAX_MB (default 1024 MB)."""
+    return int(os.environ.get("EXCEL_CACHE_MAX_MB", DEFAULT_MAX_CACHE_MB)) * 1024 * 1024
+
+def is_available():
+    """True if pyarrow is installed and the cache can be used."""
+    return pa is not None
+
+def cache_key(file_path):
+    """
+    Build the cache key of a workbook from its path, mtime, size and content hash.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        str: Hex digest identifying this version of the file.
+    """
+    # Imported here: ingest_manifest imports excel_to_dictionary, which imports this module
+    from ingest_manifest import hash_workbook
+
+    stat = os.stat(file_path)
+    content_hash = hash_workbook(file_path)
+    key_source = f"{CACHE_FORMAT_VERSION}|{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{content_hash}"
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+def arrow_types():
+    """Arrow type used for each Python cell value class."""
+    return {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        datetime.datetime: pa.timestamp("us"),
+        datetime.date: pa.date32(),
+        datetime.time: pa.time64("us"),
+        datetime.timedelta: pa.duration("us"),
+    }
+
+def column_to_array(values):
+    """
+    Convert the values of one column to an Arrow array.
+
+    Columns holding a single value type (plus empty cells) become a plain
+    typed array. Mixed columns become a dense union with one child per
+    value type, so every value comes back with its original type.
+
+    Args:
+        values (list): Column values, None for empty cells.
+
+    Returns:
+        pyarrow.Array: The column array.
+
+    Raises:
+        TypeError: If a value has no Arrow equivalent.
+    """
+    type_map = arrow_types()
+    value_classes = []
+    for value in values:
+        if value is not None and value.__class__ not in value_classes:
+            if value.__class__ not in type_map:
+                raise TypeError(f"Cannot cache values of type {value.__class__.__name__}")
+            value_classes.append(value.__class__)
+
+    if not value_classes:
+        return pa.nulls(len(values))
+    if len(value_classes) == 1:
+        return pa.array(values, type=type_map[value_classes[0]])
+
+    # Child 0 holds the empty cells, the others one value type each
+    child_values = [[] for _ in range(len(value_classes) + 1)]
+    type_ids = []
+    offsets = []
+    for value in values:
+        child_id = 0 if value is None else value_classes.index(value.__class__) + 1
+        type_ids.append(child_id)
+        offsets.append(len(child_values[child_id]))
+        child_values[child_id].append(value)
+
+    children = [pa.nulls(len(child_values[0]))]
+    children += [pa.array(child, type=type_map[value_class])
+                 for value_class, child in zip(value_classes, child_values[1:])]
+    field_names = ["null"] + [value_class.__name__ for value_class in value_classes]
+    return pa.UnionArray.from_dense(pa.array(type_ids, type=pa.int8()), pa.array(offsets, type=pa.int32()),
+                                    children, field_names)
+
+def write_sheet(path, headers, rows):
+    """
+    Write the headers and row tuples of one sheet as an Arrow IPC file.
+
+    Args:
+        path (str): Target file path.
+        headers (list): Column headers.
+        rows (list): Row value tuples; short rows are padded with None.
+    """
+    column_count = len(headers)
+    columns = [[] for _ in range(column_count)]
+    for row in rows:
+        row_length = len(row)
+        for col_index, column in enumerate(columns):
+            column.append(row[col_index] if col_index < row_length else None)
+
+    arrays = [column_to_array(column) for column in columns]
+    table = pa.Table.from_arrays(arrays, names=[f"c{col_index}" for col_index in range(column_count)],
+                                 metadata={"headers": json.dumps(list(headers)), "rows": str(len(rows))})
+    with pa_ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+def read_sheet(path):
+    """
+    Read a sheet written by write_sheet through a memory map. The columns
+    are converted to Python values one batch of READ_BATCH_ROWS rows at a
+    time, so only that slice is held twice while the rows are built.
+
+    Args:
+        path (str): Arrow IPC file path.
+
+    Returns:
+        tuple: (list of headers, list of row tuples)
+    """
+    with pa.memory_map(path) as source:
+        table = pa_ipc.open_file(source).read_all()
+    metadata = table.schema.metadata
+    headers = json.loads(metadata[b"headers"])
+    row_count = int(metadata[b"rows"])
+    if not table.num_columns:
+        return headers, [()] * row_count
+    rows = []
+    for batch in table.to_batches(max_chunksize=READ_BATCH_ROWS):
+        rows.extend(zip(*[column.to_pylist() for column in batch.columns]))
+    return headers, rows
+
+def load_workbook(file_path, cache_dir=None):
+    """
+    Load the parsed sheets of a workbook from the cache.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        cache_dir (str): Cache directory (if None, uses get_cache_dir()).
+
+    Returns:
+        list: List of (sheet_name, headers, rows) tuples, or None on a cache miss.
+    """
+    if not is_available():
+        return None
+    entry_dir = os.path.join(cache_dir or get_cache_dir(), cache_key(file_path))
+    index_path = os.path.join(entry_dir, ENTRY_INDEX_FILE)
+    if not os.path.exists(index_path):
+        logging.info("Workbook cache miss for %s", file_path)
+        return None
+
+    try:
+        with open(index_path, encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        batches = []
+        for sheet_number, sheet_name in enumerate(index["sheets"]):
+            headers, rows = read_sheet(os.path.join(entry_dir, f"{sheet_number}.arrow"))
+            batches.append((sheet_name, headers, rows))
+    except Exception as e:
+        logging.warning("Discarding unreadable workbook cache entry %s: %s", entry_dir, e)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        return None
+
+    # Touch the entry so eviction treats it as recently used
+    os.utime(index_path)
+    logging.info("Loaded %s sheets of %s from the workbook cache", len(batches), file_path)
+    return batches
+
+def store_workbook(file_path, batches, cache_dir=None, max_bytes=None):
+    """
+    Store the parsed sheets of a workbook in the cache, then evict the least
+    recently used entries beyond the size cap.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        batches (list): List of (sheet_name, headers, rows) tuples.
+        cache_dir (str): Cache directory (if None, uses get_cache_dir()).
+        max_bytes (int): Cache size cap (if None, uses get_max_cache_bytes()).
+
+    Returns:
+        bool: True if the workbook was stored.
+    """
+    if not is_available():
+        logging.warning("pyarrow is not installed, the workbook cache is disabled")
+        return False
+    cache_dir = cache_dir or get_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_dir = os.path.join(cache_dir, cache_key(file_path))
+
+    # Write into a temporary directory first so readers never see a partial entry
+    temp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    try:
+        for sheet_number, (sheet_name, headers, rows) in enumerate(batches):
+            write_sheet(os.path.join(temp_dir, f"{sheet_number}.arrow"), headers, rows)
+        with open(os.path.join(temp_dir, ENTRY_INDEX_FILE), "w", encoding="utf-8") as index_file:
+            json.dump({"source_file": os.path.abspath(file_path),
+                       "sheets": [sheet_name for sheet_name, _, _ in batches]}, index_file)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(temp_dir, entry_dir)
+    except Exception as e:
+        logging.warning("Could not cache workbook %s: %s", file_path, e)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return False
+
+    logging.info("Stored %s sheets of %s in the workbook cache", len(batches), file_path)
+    evict(cache_dir, get_max_cache_bytes() if max_bytes is None else max_bytes)
+    return True
+
+def list_entries(cache_dir=None):
+    """
+    List the cache entries, least recently used first.
+
+    Args:
+        cache_dir (str): Cache directory (if None, uses get_cache_dir()).
+
+    Returns:
+        list: List of (entry directory, last used timestamp, size in bytes) tuples.
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        index_path = os.path.join(entry_dir, ENTRY_INDEX_FILE)
+        if name.startswith(".") or not os.path.exists(index_path):
+            continue
+        size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+        entries.append((entry_dir, os.path.getmtime(index_path), size))
+    entries.sort(key=lambda entry: entry[1])
+    return entries
+
+def evict(cache_dir=None, max_bytes=None):
+    """
+    Delete least recently used entries until the cache fits in max_bytes.
+
+    Args:
+        cache_dir (str): Cache directory (if None, uses get_cache_dir()).
+        max_bytes (int): Cache size cap (if None, uses get_max_cache_bytes()).
+
+    Returns:
+        int: Number of entries deleted.
+    """
+    max_bytes = get_max_cache_bytes() if max_bytes is None else max_bytes
+    entries = list_entries(cache_dir)
+    total_bytes = sum(size for _, _, size in entries)
+    evicted = 0
+    for entry_dir, _, size in entries:
+        if total_bytes <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total_bytes -= size
+        evicted += 1
+        logging.info("Evicted workbook cache entry %s (%s bytes)", entry_dir, size)
+    return evicted
+
+def clear_cache(cache_dir=None):
+    """
+    Delete every entry of the cache.
+
+    Args:
+        cache_dir (str): Cache directory (if None, uses get_cache_dir()).
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    logging.info("Cleared the workbook cache in %s", cache_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the parsed workbook cache.")
+    parser.add_argument("--clear", action="store_true", help="delete every cache entry")
+    parser.add_argument("--cache-dir", help="cache directory (default: $EXCEL_CACHE_DIR or ~/.cache/multiexcel)")
+    args = parser.parse_args()
+
+    if args.clear:
+        clear_cache(args.cache_dir)
+        print("Workbook cache cleared.")
+    else:
+        entries = list_entries(args.cache_dir)
+        for entry_dir, last_used, size in entries:
+            print(f"{os.path.basename(entry_dir)[:16]}  {datetime.datetime.fromtimestamp(last_used):%Y-%m-%d %H:%M}  "
+                  f"{size / 1024 / 1024:.1f} MB")
+        print(f"{len(entries)} entries, {sum(size for _, _, size in entries) / 1024 / 1024:.1f} MB")
@@ -0,0 +1,185 @@
+# File: workbook_inspector.py
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+
+import xlsx_fast_reader
+from excel_to_dictionary import build_headers
+from print_sheet_summary import print_workbook_summary
+
+# Decompressed bytes read from the start of a sheet to estimate its row count
+SAMPLE_BYTES = 64 * 1024
+
+ROW_START_RE = re.compile(rb"<(?:\w+:)?row[\s>/]")
+
+def header_fingerprint(headers):
+    """
+    Fingerprint a header row, so sheets with the same columns can be found
+    without comparing their headers one by one.
+
+    Args:
+        headers (list): Column headers, as built by excel_to_dictionary.
+
+    Returns:
+        str: Short hex digest of the headers, or None if there are none.
+    """
+    if not headers:
+        return None
+    return hashlib.sha256("\x1f".join(headers).encode("utf-8")).hexdigest()[:16]
+
+def estimate_rows(reader, sheet_path, uncompressed_size, dimension):
+    """
+    Estimate the number of data rows of a sheet (the header row excluded).
+
+    The stored <dimension> is used when it spans more than one cell. Some
+    writers always store "A1", so otherwise the rows in the first
+    SAMPLE_BYTES of the sheet are counted and scaled to its size; a sheet
+    that fits in the sample is counted exactly.
+
+    Args:
+        reader (XlsxReader): Open reader of the workbook.
+        sheet_path (str): Path of the worksheet part in the zip.
+        uncompressed_size (int): Uncompressed size of the worksheet part.
+        dimension (tuple): (min_row, min_col, max_row, max_col), or None.
+
+    Returns:
+        tuple: (estimated data rows, "dimension", "exact" or "sample")
+    """
+    if dimension is not None and dimension[:2] != dimension[2:]:
+        return max(dimension[2] - 1, 0), "dimension"
+
+    with reader.zip_file.open(sheet_path) as sheet_file:
+        sample = sheet_file.read(SAMPLE_BYTES)
+    rows = len(ROW_START_RE.findall(sample))
+    if len(sample) >= uncompressed_size:
+        return max(rows - 1, 0), "exact"
+    return max(round(rows * uncompressed_size / len(sample)) - 1, 0), "sample"
+
+def inspect_workbook(file_path, read_headers=True):
+    """
+    Describe a workbook without parsing its rows: only the zip directory,
+    workbook.xml, the <dimension> and header row of each sheet and a small
+    sample of each sheet are read.
+
+    Args:
+        file_path (str): Path to the Excel file.
+        read_headers (bool): Also read the header row of each sheet.
+
+    Returns:
+        dict: Workbook information with the file, compressed and uncompressed
+            sizes, shared strings size, seconds taken and a list of sheets.
+            Each sheet has its name, estimated rows and columns, how the rows
+            were estimated, its compressed and uncompressed sizes and, with
+            read_headers, its headers and header fingerprint.
+    """
+    start_time = time.perf_counter()
+    with xlsx_fast_reader.XlsxReader(file_path) as reader:
+        members = {item.filename: item for item in reader.zip_file.infolist()}
+        shared_strings = members.get(reader.shared_strings_path)
+
+        sheets = []
+        for sheet_name, sheet_path in reader.sheet_paths.items():
+            member = members.get(sheet_path)
+            if member is None:
+                logging.warning("Sheet '%s' has no part '%s' in %s", sheet_name, sheet_path, file_path)
+                continue
+            dimension = reader.dimension(sheet_name)
+            rows, estimated_from = estimate_rows(reader, sheet_path, member.file_size, dimension)
+            sheet = {
+                'name': sheet_name,
+                'rows': rows,
+                'columns': dimension[3] if dimension is not None else 0,
+                'rows_estimated_from': estimated_from,
+                'compressed_size': member.compress_size,
+                'uncompressed_size': member.file_size,
+            }
+            if read_headers:
+                # Built like the headers of iter_sheet_rows(engine="xml"): as wide as the dimension
+                header_row = next(reader.iter_rows(sheet_name, max_row=1), None)
+                if header_row is None:
+                    sheet['headers'] = []
+                else:
+                    header_row = tuple(header_row) + (None,) * (sheet['columns'] - len(header_row))
+                    sheet['headers'] = build_headers(header_row)
+                sheet['header_fingerprint'] = header_fingerprint(sheet['headers'])
+                sheet['columns'] = max(sheet['columns'], len(sheet['headers']))
+            sheets.append(sheet)
+
+    info = {
+        'file': file_path,
+        'file_size': os.path.getsize(file_path),
+        'compressed_size': sum(sheet['compressed_size'] for sheet in sheets),
+        'uncompressed_size': sum(sheet['uncompressed_size'] for sheet in sheets),
+        'shared_strings_size': shared_strings.file_size if shared_strings is not None else 0,
+        'sheets': sheets,
+        'seconds': time.perf_counter() - start_time,
+    }
+    logging.debug("Inspected %s in %.3fs: %s sheets", file_path, info['seconds'], len(sheets))
+    return info
+
+def parse_size(file_path):
+    """
+    Estimate the parsing work of a workbook from its zip directory, without
+    decompressing anything: the uncompressed size of its worksheets and
+    shared strings.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        int: Estimated size in bytes (the file size if it is not a valid zip).
+    """
+    try:
+        with zipfile.ZipFile(file_path) as zip_file:
+            return sum(item.file_size for item in zip_file.infolist()
+                       if item.filename.startswith("xl/worksheets/") or item.filename == "xl/sharedStrings.xml")
+    except zipfile.BadZipFile:
+        return os.path.getsize(file_path)
+
+def sheets_with_rows(info):
+    """
+    Get the names of the sheets that have data rows.
+
+    Args:
+        info (dict): Workbook information from inspect_workbook.
+
+    Returns:
+        list: Sheet names in workbook order.
+    """
+    return [sheet['name'] for sheet in info['sheets'] if sheet['rows'] > 0]
+
+def header_groups(info):
+    """
+    Group the sheets of a workbook by header fingerprint.
+
+    Args:
+        info (dict): Workbook information from inspect_workbook.
+
+    Returns:
+        dict: Header fingerprint -> list of sheet names, in workbook order.
+    """
+    groups = {}
+    for sheet in info['sheets']:
+        if sheet.get('header_fingerprint') is not None:
+            groups.setdefault(sheet['header_fingerprint'], []).append(sheet['name'])
+    return groups
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the sheets of workbooks with their size, "
+                                                 "estimated rows and headers, without parsing the rows.")
+    parser.add_argument("files", nargs="+", help="workbooks to inspect")
+    parser.add_argument("--json", action="store_true", help="print the information as JSON")
+    parser.add_argument("--no-headers", action="store_true", help="do not read the header rows")
+    args = parser.parse_args()
+
+    inspections = [inspect_workbook(file_path, read_headers=not args.no_headers) for file_path in args.files]
+    if args.json:
+        print(json.dumps(inspections, indent=2, default=str))
+    else:
+        for info in inspections:
+            print_workbook_summary(info, header_groups(info))
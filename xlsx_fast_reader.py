@@ -0,0 +1,325 @@
+# File: xlsx_fast_reader.py
+import logging
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse, parse
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+DOC_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+ROW_TAG = MAIN_NS + "row"
+CELL_TAG = MAIN_NS + "c"
+VALUE_TAG = MAIN_NS + "v"
+TEXT_TAG = MAIN_NS + "t"
+RUN_TAG = MAIN_NS + "r"
+INLINE_STRING_TAG = MAIN_NS + "is"
+STRING_ITEM_TAG = MAIN_NS + "si"
+SHEET_DATA_TAG = MAIN_NS + "sheetData"
+DIMENSION_TAG = MAIN_NS + "dimension"
+
+COORDINATE_RE = re.compile(r"([A-Z]+)(\d+)")
+
+def column_index(letters):
+    """
+    Convert column letters to a 1-based column index ("A" -> 1, "AA" -> 27).
+    """
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+def split_coordinate(coordinate):
+    """
+    Split a cell reference such as "B12" into (row, column) indexes.
+    """
+    match = COORDINATE_RE.match(coordinate)
+    return int(match.group(2)), column_index(match.group(1))
+
+def cast_number(value):
+    """
+    Convert a number stored as text to an int or a float, like openpyxl does.
+    """
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+def string_item_text(element):
+    """
+    Get the plain text of a shared or inline string item.
+    Rich text runs are concatenated; phonetic hints are ignored.
+    """
+    snippets = []
+    for child in element:
+        if child.tag == TEXT_TAG:
+            snippets.append(child.text or "")
+        elif child.tag == RUN_TAG:
+            text = child.find(TEXT_TAG)
+            if text is not None:
+                snippets.append(text.text or "")
+    return "".join(snippets)
+
+class XlsxReader:
+    """
+    Minimal values-only reader for .xlsx files.
+
+    Reads the worksheet XML parts straight from the zip with iterparse and
+    decodes numbers, booleans, shared and inline strings and date serials
+    into plain tuples, without creating openpyxl cell or style objects.
+    Values match openpyxl's load_workbook(data_only=True).
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.zip_file = zipfile.ZipFile(file_path)
+        self.sheet_paths = {}
+        self.epoch = CALENDAR_WINDOWS_1900
+        self.date_styles = set()
+        self.timedelta_styles = set()
+        self._shared_strings = []
+        self._shared_string_items = None
+        self._shared_strings_path = None
+
+        workbook_path = self._find_workbook_path()
+        relationships = self._read_relationships(workbook_path)
+        self._read_workbook(workbook_path, relationships)
+
+        for target, rel_type in relationships.values():
+            if rel_type.endswith("/sharedStrings"):
+                self._shared_strings_path = target
+            elif rel_type.endswith("/styles"):
+                self._read_styles(target)
+
+    @property
+    def sheetnames(self):
+        """List of sheet names in workbook order."""
+        return list(self.sheet_paths)
+
+    @property
+    def shared_strings_path(self):
+        """Path of the shared string table in the zip, or None if the workbook has none."""
+        return self._shared_strings_path
+
+    def close(self):
+        """Close the underlying zip file."""
+        self.zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _find_workbook_path(self):
+        """Find the workbook part from the package relationships."""
+        try:
+            with self.zip_file.open("_rels/.rels") as rels_file:
+                for relationship in parse(rels_file).getroot().iter(REL_NS + "Relationship"):
+                    if relationship.get("Type", "").endswith("/officeDocument"):
+                        return relationship.get("Target").lstrip("/")
+        except KeyError:
+            pass
+        return "xl/workbook.xml"
+
+    def _read_relationships(self, part_path):
+        """Read a part's relationships as {id: (target path, type)}."""
+        folder, name = posixpath.split(part_path)
+        rels_path = posixpath.join(folder, "_rels", name + ".rels")
+        relationships = {}
+        with self.zip_file.open(rels_path) as rels_file:
+            for relationship in parse(rels_file).getroot().iter(REL_NS + "Relationship"):
+                target = relationship.get("Target")
+                if target.startswith("/"):
+                    target = target.lstrip("/")
+                else:
+                    target = posixpath.normpath(posixpath.join(folder, target))
+                relationships[relationship.get("Id")] = (target, relationship.get("Type", ""))
+        return relationships
+
+    def _read_workbook(self, workbook_path, relationships):
+        """Read the sheet list and the date system from workbook.xml."""
+        with self.zip_file.open(workbook_path) as workbook_file:
+            root = parse(workbook_file).getroot()
+
+        properties = root.find(MAIN_NS + "workbookPr")
+        if properties is not None and properties.get("date1904", "").lower() in ("1", "true"):
+            self.epoch = CALENDAR_MAC_1904
+
+        for sheet in root.iter(MAIN_NS + "sheet"):
+            relationship = relationships.get(sheet.get(DOC_REL_NS + "id"))
+            if relationship is None:
+                logging.warning("Sheet '%s' has no worksheet part, skipping", sheet.get("name"))
+                continue
+            self.sheet_paths[sheet.get("name")] = relationship[0]
+
+    def _read_styles(self, styles_path):
+        """Index the cell styles whose number format is a date or a duration."""
+        with self.zip_file.open(styles_path) as styles_file:
+            root = parse(styles_file).getroot()
+
+        custom_formats = {}
+        number_formats = root.find(MAIN_NS + "numFmts")
+        if number_formats is not None:
+            for number_format in number_formats:
+                custom_formats[int(number_format.get("numFmtId"))] = number_format.get("formatCode")
+
+        cell_formats = root.find(MAIN_NS + "cellXfs")
+        if cell_formats is None:
+            return
+        for style_index, cell_format in enumerate(cell_formats):
+            format_id = int(cell_format.get("numFmtId", 0))
+            format_code = custom_formats.get(format_id, BUILTIN_FORMATS.get(format_id))
+            if is_date_format(format_code):
+                self.date_styles.add(style_index)
+            if is_timedelta_format(format_code):
+                self.timedelta_styles.add(style_index)
+
+    def shared_string(self, index):
+        """
+        Get a shared string by index. The shared string table is parsed
+        lazily, only as far as the highest index requested so far.
+        """
+        if self._shared_string_items is None:
+            self._shared_string_items = self._iter_shared_strings()
+        while len(self._shared_strings) <= index:
+            text = next(self._shared_string_items, None)
+            if text is None:
+                raise IndexError(f"Shared string {index} not found in {self.file_path}")
+            self._shared_strings.append(text)
+        return self._shared_strings[index]
+
+    def _iter_shared_strings(self):
+        """Stream the shared string table one item at a time."""
+        if self._shared_strings_path is None:
+            return
+        with self.zip_file.open(self._shared_strings_path) as strings_file:
+            for _, element in iterparse(strings_file):
+                if element.tag == STRING_ITEM_TAG:
+                    yield string_item_text(element).replace("x005F_", "")
+                    element.clear()
+
+    def dimension(self, sheet_name):
+        """
+        Read the <dimension> of a sheet without parsing its rows.
+
+        Returns:
+            tuple: (min_row, min_col, max_row, max_col), or None if the sheet has no dimension
+        """
+        with self.zip_file.open(self.sheet_paths[sheet_name]) as sheet_file:
+            for _, element in iterparse(sheet_file):
+                if element.tag == DIMENSION_TAG:
+                    bounds = element.get("ref", "").split(":")
+                    min_row, min_col = split_coordinate(bounds[0])
+                    max_row, max_col = split_coordinate(bounds[-1])
+                    return min_row, min_col, max_row, max_col
+                if element.tag in (ROW_TAG, SHEET_DATA_TAG):
+                    return None
+        return None
+
+    def iter_rows(self, sheet_name, min_row=1, max_row=None, columns=None):
+        """
+        Stream the values of a sheet row by row.
+
+        Every row from min_row onwards is yielded, with missing rows as empty
+        tuples. A row's tuple ends at its last cell, with None for gaps.
+        Rows before min_row are skipped without decoding their cells and
+        parsing stops once max_row has been passed. With columns, only the
+        cells of those columns are decoded; the others read as None.
+
+        Args:
+            sheet_name (str): Name of the sheet to read
+            min_row (int): First row to yield (1-based)
+            max_row (int): Last row to yield (if None, reads to the end of the sheet)
+            columns (set): 1-based indices of the columns to decode (if None, decodes every cell)
+
+        Yields:
+            tuple: Cell values of one row
+        """
+        next_row = min_row
+        row_counter = 0
+        sheet_data = None
+
+        with self.zip_file.open(self.sheet_paths[sheet_name]) as sheet_file:
+            for event, element in iterparse(sheet_file, events=("start", "end")):
+                if event == "start":
+                    if element.tag == SHEET_DATA_TAG:
+                        sheet_data = element
+                    continue
+                if element.tag != ROW_TAG:
+                    continue
+
+                row_number = element.get("r")
+                row_counter = int(row_number) if row_number else row_counter + 1
+
+                if max_row is not None and row_counter > max_row:
+                    break
+                if row_counter >= min_row:
+                    while next_row < row_counter:
+                        yield ()
+                        next_row += 1
+                    yield self._row_values(element, row_counter, columns)
+                    next_row = row_counter + 1
+
+                # Drop parsed rows so memory stays bounded by a single row
+                if sheet_data is not None:
+                    sheet_data.clear()
+                else:
+                    element.clear()
+
+    def _row_values(self, row_element, row_number, columns=None):
+        """Decode the cells of one <row> element (or of the given columns) into a tuple."""
+        values = []
+        column_counter = 0
+
+        for cell in row_element:
+            if cell.tag != CELL_TAG:
+                continue
+            coordinate = cell.get("r")
+            if coordinate:
+                _, column_counter = split_coordinate(coordinate)
+            else:
+                column_counter += 1
+
+            if columns is not None and column_counter not in columns:
+                continue
+            if column_counter > len(values) + 1:
+                values.extend([None] * (column_counter - len(values) - 1))
+            values.append(self._cell_value(cell, coordinate or f"row {row_number}"))
+
+        return tuple(values)
+
+    def _cell_value(self, cell, coordinate):
+        """Decode the value of one <c> element."""
+        data_type = cell.get("t", "n")
+
+        if data_type == "inlineStr":
+            inline_string = cell.find(INLINE_STRING_TAG)
+            return string_item_text(inline_string) if inline_string is not None else None
+
+        value = cell.findtext(VALUE_TAG) or None
+        if value is None:
+            return None
+
+        if data_type == "n":
+            value = cast_number(value)
+            style_id = int(cell.get("s", 0))
+            if style_id in self.date_styles:
+                try:
+                    return from_excel(value, self.epoch, timedelta=style_id in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    logging.warning("Cell %s is marked as a date but the serial value %s is outside the "
+                                    "limits for dates. The cell will be treated as an error.", coordinate, value)
+                    return "#VALUE!"
+            return value
+        if data_type == "s":
+            return self.shared_string(int(value))
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        # "str" (formula result) and "e" (error) values are kept as text
+        return value